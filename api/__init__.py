@@ -2,14 +2,14 @@ from flask import Blueprint
 
 api = Blueprint('api', __name__)
 
-from . import auth, predict
-
 #basic blueprint for all api routes
 
 #api endpoint
+import hmac
 from functools import wraps
-from flask import request, jsonify
-from models import User
+from flask import request, jsonify, g
+from config import Config
+from .api_key_cache import api_key_cache
 
 def require_api_key(f):
     @wraps(f)
@@ -18,9 +18,26 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'No API key provided'}), 401
         
-        user = User.query.filter_by(api_key=api_key, api_enabled=True).first()
-        if not user:
+        user_id = api_key_cache.lookup(api_key)
+        if user_id is None:
             return jsonify({'error': 'Invalid API key'}), 401
-            
+
+        g.api_user_id = user_id
+        return f(*args, **kwargs)
+    return decorated
+
+def require_admin_token(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not Config.MODEL_ADMIN_TOKEN:
+            return jsonify({'error': 'Admin endpoints are disabled'}), 403
+
+        token = request.headers.get('X-Admin-Token', '')
+        if not hmac.compare_digest(token, Config.MODEL_ADMIN_TOKEN):
+            return jsonify({'error': 'Invalid admin token'}), 401
+
         return f(*args, **kwargs)
     return decorated
+
+# route modules import the decorators above, so load them last
+from . import auth, predict, metrics
@@ -0,0 +1,211 @@
+import os
+import mmap
+import time
+import struct
+import logging
+import threading
+from collections import OrderedDict
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from models import db, User, ApiKeyState, hash_api_key
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class VersionSignal:
+    """A counter in an 8-byte file every worker maps into memory.
+
+    ``bump`` adds one under an ``flock``; ``read`` is a memory load, so
+    checking it on every request is free. Workers that see the value
+    change drop what they cached.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._map = None
+        self._lock = threading.Lock()
+
+    def _mapped(self):
+        if self._map is None:
+            with self._lock:
+                if self._map is None:
+                    directory = os.path.dirname(self.path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+                    try:
+                        if os.fstat(fd).st_size < 8:
+                            os.ftruncate(fd, 8)
+                        self._map = mmap.mmap(fd, 8)
+                    finally:
+                        os.close(fd)
+        return self._map
+
+    def read(self):
+        try:
+            return struct.unpack_from('<Q', self._mapped())[0]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read the API key signal {self.path}: {str(e)}")
+            return None
+
+    def bump(self):
+        try:
+            with open(self.path, 'r+b') as f:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                shared = self._mapped()
+                struct.pack_into('<Q', shared, 0, struct.unpack_from('<Q', shared)[0] + 1)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not signal an API key change through {self.path}: {str(e)}")
+
+class ApiKeyCache:
+    """Bounded LRU of API key lookups, keyed by the key's hash.
+
+    Valid keys map to their user id for ``ttl`` seconds; unknown and
+    disabled keys are remembered as ``None`` for ``negative_ttl`` in a
+    separate LRU, so a flood of made-up keys can't evict real ones. The
+    whole cache is dropped when this process changes a key (see
+    ``_after_commit``), when another process bumps ``signal`` and when
+    the database key version moves, checked every ``db_check_interval``
+    seconds.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300, negative_entries=10000, negative_ttl=30,
+                 signal=None, db_check_interval=5.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.negative_entries = negative_entries
+        self.negative_ttl = negative_ttl
+        self.signal = signal
+        self.db_check_interval = db_check_interval
+        self._valid = OrderedDict()
+        self._invalid = OrderedDict()
+        self._lock = threading.Lock()
+        self._signal_seen = None
+        self._db_version = None
+        self._db_checked = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def _sync(self):
+        """Drop everything if another process changed a key; returns the signal value seen"""
+        seen = self.signal.read() if self.signal is not None else None
+        if seen != self._signal_seen:
+            self.clear()
+            self._signal_seen = seen
+        now = time.monotonic()
+        if self.db_check_interval is not None and now - self._db_checked >= self.db_check_interval:
+            self._db_checked = now
+            version = db.session.execute(select(ApiKeyState.version)).scalar()
+            if version != self._db_version:
+                self.clear()
+                self._db_version = version
+        return seen
+
+    def lookup(self, api_key):
+        """Id of the enabled user owning ``api_key``, or None"""
+        digest = hash_api_key(api_key)
+        if not self.enabled:
+            return self._query(digest)
+
+        seen = self._sync()
+        now = time.monotonic()
+        with self._lock:
+            for entries in (self._valid, self._invalid):
+                entry = entries.get(digest)
+                if entry is None:
+                    continue
+                user_id, expires = entry
+                if expires < now:
+                    del entries[digest]
+                    break
+                entries.move_to_end(digest)
+                self.hits += 1
+                return user_id
+            self.misses += 1
+
+        user_id = self._query(digest)
+        # a key changed while we queried: what we read may already be stale
+        if self.signal is not None and self.signal.read() != seen:
+            return user_id
+        self.put(digest, user_id)
+        return user_id
+
+    @staticmethod
+    def _query(digest):
+        return db.session.execute(select(User.id).where(User.api_key_hash == digest,
+                                                        User.api_enabled == True)).scalar()
+
+    def put(self, digest, user_id):
+        if user_id is None:
+            entries, limit, ttl = self._invalid, self.negative_entries, self.negative_ttl
+        else:
+            entries, limit, ttl = self._valid, self.max_entries, self.ttl
+        if limit <= 0 or ttl <= 0:
+            return
+        with self._lock:
+            entries[digest] = (user_id, time.monotonic() + ttl)
+            entries.move_to_end(digest)
+            while len(entries) > limit:
+                entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._valid.clear()
+            self._invalid.clear()
+            self.invalidations += 1
+
+    def invalidate(self):
+        """Forget every key here and tell the other workers to do the same"""
+        self.clear()
+        if self.signal is not None:
+            self.signal.bump()
+            self._signal_seen = self.signal.read()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'valid': len(self._valid),
+                'invalid': len(self._invalid),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'negative_ttl': self.negative_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+# this process's API key lookups (see Config.API_KEY_CACHE_*)
+api_key_cache = ApiKeyCache(
+    max_entries=Config.API_KEY_CACHE_SIZE,
+    ttl=Config.API_KEY_CACHE_TTL,
+    negative_entries=Config.API_KEY_CACHE_NEGATIVE_SIZE,
+    negative_ttl=Config.API_KEY_CACHE_NEGATIVE_TTL,
+    signal=VersionSignal(Config.API_KEY_SIGNAL_PATH) if Config.API_KEY_SIGNAL_PATH else None,
+    db_check_interval=Config.API_KEY_CACHE_DB_CHECK
+)
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session):
+    # models bumps the database version in the transaction that changed a key
+    if session.info.pop('api_keys_changed', False):
+        api_key_cache.invalidate()
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session):
+    session.info.pop('api_keys_changed', None)
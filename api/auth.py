@@ -5,14 +5,14 @@ from models import db, User
 from . import api
 from .data_manager import DataManager
 from .user_manager import UserManager
+from .api_key_cache import api_key_cache
+from .password_hasher import PasswordHasherBusy
 from flask_mail import Message
 import random
 import string
 import logging
 import time
 
-# Configure logger
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @api.route('/auth/login', methods=['POST'])
@@ -55,7 +55,10 @@ def login():
             return jsonify({'redirect': '/'})
             
         return jsonify({'error': 'Invalid credentials'}), 401
-        
+
+    except PasswordHasherBusy as e:
+        logger.warning(f"Login rejected: {str(e)}")
+        return jsonify({'error': str(e)}), e.status_code, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         logger.error(f"Login error: {str(e)}")
         return jsonify({'error': 'Login failed'}), 500
@@ -86,7 +89,11 @@ def signup():
         session['last_active'] = datetime.utcnow().isoformat()
         print(f"Signup successful for user: {user.email}")
         return jsonify({'message': 'Registration successful', 'redirect': '/'})
-        
+
+    except PasswordHasherBusy as e:
+        db.session.rollback()
+        logger.warning(f"Signup rejected: {str(e)}")
+        return jsonify({'error': str(e)}), e.status_code, {'Retry-After': str(e.retry_after)}
     except Exception as e:
         db.session.rollback()
         print(f"Signup error: {str(e)}")
@@ -153,10 +160,9 @@ def verify_login():
     stored_code = session.get('verification_code')
     temp_user_id = session.get('temp_user_id')
     
-    logger.info(f"Received verification code: {code}")
-    logger.info(f"Stored verification code: {stored_code}")
-    logger.info(f"Temporary user ID: {temp_user_id}")
-    logger.info(f"Current session data: {dict(session)}")
+    # codes and session contents stay out of the log
+    logger.debug("Verification for temporary user %s, code %s", temp_user_id,
+                 'provided' if code else 'missing')
 
     if code == stored_code and temp_user_id:
         user = User.query.get(temp_user_id)
@@ -188,12 +194,22 @@ def generate_api_key():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@api.route('/user/disable-key', methods=['POST'])
+@login_required
+def disable_api_key():
+    try:
+        current_user.disable_api_key()
+        db.session.commit()
+        return jsonify({'message': 'API key disabled'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @api.route('/auth/api-key', methods=['POST'])
 def api_authenticate():
     api_key = request.headers.get('X-API-Key')
     if not api_key:
         return jsonify({'error': 'No API key provided'}), 401
-    user = User.query.filter_by(api_key=api_key, api_enabled=True).first()
-    if not user:
+    if api_key_cache.lookup(api_key) is None:
         return jsonify({'error': 'Invalid API key'}), 401
     return jsonify({'authenticated': True})
\ No newline at end of file
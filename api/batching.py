@@ -0,0 +1,75 @@
+import os
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """Collects concurrent single-record predictions into small batches.
+
+    Requests wait at most ``max_wait_ms`` for company before the batch is
+    handed to ``ModelPredictor.predict_batch``, which makes one model call
+    per (subject, gender) key.
+    """
+
+    def __init__(self, predictor, max_batch_size=64, max_wait_ms=5):
+        self.predictor = predictor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # threads don't survive fork, so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                threading.Thread(target=self._run, args=(self._queue,), name='predict-batcher', daemon=True).start()
+                self._pid = os.getpid()
+
+    def submit(self, data):
+        """Queue one record and return a Future for its prediction"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((data, future))
+        return future
+
+    def predict(self, data, timeout=None):
+        """Blocking single-record predict with the same contract as ModelPredictor.predict"""
+        result = self.submit(data).result(timeout=timeout)
+        if 'error' in result:
+            raise ValueError(result['error'])
+        return result
+
+    def _collect(self, pending):
+        # Block for the first item, then gather more until the window closes
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        try:
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                batch.append(pending.get(timeout=remaining))
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self, pending):
+        while True:
+            batch = self._collect(pending)
+            records = [data for data, _ in batch]
+            try:
+                results = self.predictor.predict_batch(records)
+            except Exception as e:
+                logger.error(f"Micro-batch failed: {str(e)}")
+                results = [{'error': f"Prediction error: {str(e)}"}] * len(batch)
+
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,113 @@
+import os
+import json
+import threading
+import numpy as np
+
+from .forest_engine import FlatForest
+
+# pandas-free inference for the linear G3 models
+
+FORMAT_VERSION = 1
+
+class CompiledLinearModel:
+    """NumPy copy of a fitted LinearRegression that scores processed feature dicts.
+
+    Uses the same ``X @ coef + intercept`` expression as sklearn on a float64
+    row in the model's own feature order, so results match the sklearn path
+    bit for bit.
+    """
+
+    def __init__(self, coef, intercept, feature_names, meta=None):
+        self.coef = np.ascontiguousarray(coef, dtype=np.float64)
+        self.intercept = np.float64(intercept)
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.meta = meta or {}
+        # row buffers are reused per thread to avoid an allocation per request
+        self._local = threading.local()
+
+    @classmethod
+    def from_estimator(cls, model, feature_names=None):
+        """Compile a fitted LinearRegression; ``feature_names`` is used if the model has none"""
+        coef = np.asarray(model.coef_, dtype=np.float64)
+        if coef.ndim != 1:
+            raise ValueError("Only single-target linear models can be compiled")
+        names = getattr(model, 'feature_names_in_', None)
+        if names is None:
+            if feature_names is None or len(feature_names) != coef.shape[0]:
+                raise ValueError("Feature names are required to compile this model")
+            names = feature_names
+        return cls(coef, model.intercept_, names)
+
+    def save(self, path, **meta):
+        """Write coef.npy plus a meta.json with the intercept and feature order into ``path``"""
+        os.makedirs(path, exist_ok=True)
+        # each file is replaced whole so a serving process never reads a partial one
+        coef_path = os.path.join(path, 'coef.npy')
+        with open(f"{coef_path}.tmp", 'wb') as f:
+            np.save(f, self.coef)
+        os.replace(f"{coef_path}.tmp", coef_path)
+        self.meta = dict(meta,
+                         format='linear_model',
+                         format_version=FORMAT_VERSION,
+                         feature_names=self.feature_names,
+                         # repr round-trips float64 exactly through JSON
+                         intercept=float(self.intercept))
+        meta_path = os.path.join(path, 'meta.json')
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, path):
+        """Load a model written by ``save``"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != 'linear_model' or meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported linear model format in {path}")
+        coef = np.load(os.path.join(path, 'coef.npy'))
+        return cls(coef, meta['intercept'], meta['feature_names'], meta)
+
+    def _row_buffer(self):
+        buffer = getattr(self._local, 'row', None)
+        if buffer is None:
+            buffer = np.empty((1, self.n_features), dtype=np.float64)
+            self._local.row = buffer
+        return buffer
+
+    def predict_row(self, processed_data):
+        """Predict from one processed feature dict"""
+        x = self._row_buffer()
+        row = x[0]
+        for index, name in enumerate(self.feature_names):
+            row[index] = processed_data[name]
+        return float((x @ self.coef + self.intercept)[0])
+
+    def to_matrix(self, rows):
+        """Stack processed feature dicts into a float64 matrix in model order.
+
+        Column-major like the array sklearn builds from a DataFrame, so the
+        matrix product reduces in the same order.
+        """
+        X = np.empty((len(rows), self.n_features), dtype=np.float64, order='F')
+        for i, processed_data in enumerate(rows):
+            X[i] = [processed_data[name] for name in self.feature_names]
+        return X
+
+    def predict_matrix(self, X):
+        """Predict from a float64 matrix already in model feature order"""
+        return X @ self.coef + self.intercept
+
+    def predict_rows(self, rows):
+        """Predict from a list of processed feature dicts"""
+        return self.predict_matrix(self.to_matrix(rows))
+
+def load_exported_model(path, mmap_mode='r'):
+    """Load an exported model directory (written by export_models.py) with NumPy only"""
+    with open(os.path.join(path, 'meta.json')) as f:
+        model_format = json.load(f).get('format')
+    if model_format == 'linear_model':
+        return CompiledLinearModel.load(path)
+    if model_format == 'flat_forest':
+        return FlatForest.load(path, mmap_mode=mmap_mode)
+    raise ValueError(f"Unknown exported model format in {path}: {model_format}")
@@ -2,56 +2,52 @@ import re
 import logging
 from datetime import datetime
 import bcrypt
-import pandas as pd
-import os
 from flask import request, jsonify
-import logging
 from . import api  # Import the api Blueprint
+from .feature_transformer import FeatureTransformer
+from .feedback_writer import FeedbackWriter, FeedbackCsv, FeedbackQueueFull
+from .feedback_store import FeedbackStore
+from .incremental_g3 import IncrementalG3Trainer
+from .model_registry import ModelRegistry
+from config import Config
 
 logger = logging.getLogger(__name__)
 
-class DataManager:
-    # Define constants for data validation and normalization
-    NUMERIC_RANGES = {
-        'age': (15, 22),
-        'Medu': (0, 4),
-        'Fedu': (0, 4),
-        'traveltime': (1, 4),
-        'studytime': (1, 4),
-        'failures': (0, 4),
-        'famrel': (1, 5),
-        'freetime': (1, 5),
-        'goout': (1, 5),
-        'Dalc': (1, 5),
-        'Walc': (1, 5),
-        'health': (1, 5),
-        'absences': (0, 93)
-    }
-
-    BINARY_FIELDS = [
-        'schoolsup', 'famsup', 'paid', 'activities', 'nursery',
-        'higher', 'internet', 'romantic'
-    ]
-
-    ONE_HOT_FIELDS = {
-        'Mjob': ['at_home', 'health', 'other', 'services', 'teacher'],
-        'Fjob': ['at_home', 'health', 'other', 'services', 'teacher'],
-        'reason': ['course', 'home', 'other', 'reputation'],
-        'guardian': ['father', 'mother', 'other']
-    }
+FEEDBACK_COLUMNS = FeatureTransformer.FEATURES + ['G1', 'G2', 'G3']
+
+def open_feedback_sink():
+    """Where /api/new-data rows end up, per Config.FEEDBACK_FORMAT"""
+    if Config.FEEDBACK_FORMAT == 'store':
+        return FeedbackStore(Config.FEEDBACK_STORE_PATH, FEEDBACK_COLUMNS,
+                             segment_rows=Config.FEEDBACK_SEGMENT_ROWS,
+                             compact_segments=Config.FEEDBACK_COMPACT_SEGMENTS)
+    if Config.FEEDBACK_FORMAT == 'csv':
+        return FeedbackCsv(Config.FEEDBACK_PATH, FEEDBACK_COLUMNS)
+    raise ValueError(f"Unknown feedback format: {Config.FEEDBACK_FORMAT}")
+
+# /api/new-data rows, written in batches by a background thread
+feedback_writer = FeedbackWriter(
+    open_feedback_sink(),
+    max_rows=Config.FEEDBACK_FLUSH_ROWS,
+    max_wait=Config.FEEDBACK_FLUSH_INTERVAL,
+    max_pending=Config.FEEDBACK_MAX_PENDING
+)
+
+# folds /api/new-data rows into the G3 models when incremental training is on
+g3_trainer = IncrementalG3Trainer(
+    Config.G3_STATS_PATH,
+    backend=Config.MODEL_BACKEND,
+    min_rows=Config.G3_UPDATE_MIN_ROWS,
+    interval=Config.G3_UPDATE_INTERVAL,
+    registry=ModelRegistry(Config.MODEL_REGISTRY_PATH)
+) if Config.G3_INCREMENTAL else None
 
-    EXPECTED_COLUMNS = [
-        'school', 'sex', 'age', 'address', 'famsize', 'Pstatus',
-        'Medu', 'Fedu', 'traveltime', 'studytime', 'failures',
-        'schoolsup', 'famsup', 'paid', 'activities', 'nursery',
-        'higher', 'internet', 'romantic', 'famrel', 'freetime',
-        'goout', 'Dalc', 'Walc', 'health', 'absences',
-        'Mjob_at_home', 'Mjob_health', 'Mjob_other', 'Mjob_services',
-        'Mjob_teacher', 'Fjob_at_home', 'Fjob_health', 'Fjob_other',
-        'Fjob_services', 'Fjob_teacher', 'reason_course', 'reason_home',
-        'reason_other', 'reason_reputation', 'guardian_father',
-        'guardian_mother', 'guardian_other', 'Gvg', 'Avgalc', 'Bum'
-    ]
+class DataManager:
+    # Field definitions live on FeatureTransformer so training and serving share them
+    NUMERIC_RANGES = FeatureTransformer.DEFAULT_RANGES
+    BINARY_FIELDS = FeatureTransformer.BINARY_FIELDS
+    ONE_HOT_FIELDS = FeatureTransformer.ONE_HOT_FIELDS
+    EXPECTED_COLUMNS = FeatureTransformer.FEATURES
 
     @staticmethod
     def normalize_value(value, min_val, max_val):
@@ -59,49 +55,22 @@ class DataManager:
         return (float(value) - min_val) / (max_val - min_val)
 
     @staticmethod
-    def process_prediction_data(data):
-        """Process and validate all prediction data"""
-        processed = {}
-        
-        # Handle basic fields
-        processed['school'] = int(data.get('school', 0))
-        processed['sex'] = int(data.get('gender') == 'male')
-        processed['address'] = int(data.get('address', 0))
-        processed['famsize'] = int(data.get('famsize', 0))
-        processed['Pstatus'] = int(data.get('Pstatus', 0))
-        
-        # Normalize numeric fields
-        for field, (min_val, max_val) in DataManager.NUMERIC_RANGES.items():
-            value = float(data.get(field, min_val))
-            processed[field] = DataManager.normalize_value(value, min_val, max_val)
-        
-        # Process binary fields
-        for field in DataManager.BINARY_FIELDS:
-            processed[field] = int(data.get(field) in ['yes', '1', True])
-        
-        # Process one-hot encoded fields
-        for field, options in DataManager.ONE_HOT_FIELDS.items():
-            selected = data.get(field)
-            for option in options:
-                processed[f'{field}_{option}'] = int(selected == option)
-        
-        # Calculate engineered features
-        processed['Avgalc'] = (processed['Dalc'] + processed['Walc']) / 2.0
-        processed['Bum'] = (
-            2.0 * processed['failures'] +
-            1.5 * processed['absences'] +
-            processed['Dalc'] +
-            processed['Walc'] +
-            (1.0 - processed['studytime']) +
-            0.5 * processed['freetime']
-        ) / 6.0
-        
-        # Initialize grades and averages
-        processed['G1'] = float(data.get('G1', 0))
-        processed['G2'] = float(data.get('G2', 0))
-        processed['Gvg'] = (processed['G1'] + processed['G2']) / 2.0 if 'G1' in data and 'G2' in data else 0.0
-        
-        return processed
+    def process_prediction_data(data, transformer=None):
+        """Process and validate all prediction data.
+
+        Uses the fitted ``transformer`` of the model that will score the
+        record, or the default scaling if none is given.
+        """
+        return (transformer or FeatureTransformer.default()).transform_record(data)
+
+    @staticmethod
+    def process_prediction_frame(frame, normalized=False, transformer=None):
+        """Vectorized process_prediction_data over a DataFrame of request-shaped rows.
+
+        See ``FeatureTransformer.transform``: rows with unparseable values
+        come back as NaN in the affected columns.
+        """
+        return (transformer or FeatureTransformer.default()).transform(frame, normalized)
 
     @staticmethod
     def sanitize_repository_url(url):
@@ -196,46 +165,57 @@ class DataManager:
     def verify_password(password, hashed):
         return bcrypt.checkpw(DataManager.validate_password(password), hashed)
 
+    @staticmethod
+    def feedback_split_key(data):
+        """Subject/gender split such as 'math_female' a feedback record belongs to, if any"""
+        if not data.get('subject') or data.get('gender') not in ['female', 'male']:
+            return None
+        return f"{'math' if data['subject'] == 'mathematics' else 'por'}_{data['gender']}"
+
+    @staticmethod
+    def feedback_transformer(data):
+        """Scaling of the model a feedback record belongs to, as served right now (for g3_trainer)"""
+        split_key = DataManager.feedback_split_key(data)
+        if split_key is None:
+            return None
+        from . import predict
+        if predict.predictor is not None:
+            return predict.predictor.transformer_for(split_key)
+        return FeatureTransformer.load_for(split_key)
+
     @staticmethod
     def save_feedback_data(data):
-        """Save new training data to feedback CSV"""
+        """Validate new training data and queue it for the feedback CSV or store.
+
+        Returns the number of rows waiting to be written; the background
+        ``feedback_writer`` stores them (see ``open_feedback_sink``). With
+        Config.G3_INCREMENTAL the row is also added to ``g3_trainer``.
+        """
+        split_key = DataManager.feedback_split_key(data)
         try:
-            # Ensure all required columns are present
-            required_columns = DataManager.EXPECTED_COLUMNS + ['G1', 'G2', 'G3']
-            
-            # Process the input data
-            processed_data = DataManager.process_prediction_data(data)
-            
-            # Add G1, G2, G3 values
-            processed_data['G1'] = float(data.get('G1', 0))
-            processed_data['G2'] = float(data.get('G2', 0))
-            processed_data['G3'] = float(data.get('G3', 0))
-            
-            # Create DataFrame with single row
-            df_new = pd.DataFrame([processed_data])
-            
-            # Ensure all columns match training data format
-            for col in required_columns:
-                if col not in df_new.columns:
-                    df_new[col] = 0
-            
-            # Reorder columns to match training data
-            df_new = df_new[required_columns]
-            
-            # Create feedback_data directory if it doesn't exist
-            os.makedirs('feedback_data', exist_ok=True)
-            
-            # Append to existing file or create new one
-            feedback_file = 'feedback_data/feedback_data.csv'
-            if os.path.exists(feedback_file):
-                df_new.to_csv(feedback_file, mode='a', header=False, index=False)
-            else:
-                df_new.to_csv(feedback_file, index=False)
-                
-            return True
+            # The file holds rows of every subject/gender, so they all get the fixed default scaling
+            processed_data = DataManager.with_grades(DataManager.process_prediction_data(data), data)
+            # the G3 statistics feed one split's model and need that model's scaling
+            model_row = None
+            if g3_trainer is not None and split_key is not None:
+                model_row = DataManager.with_grades(
+                    DataManager.process_prediction_data(data, DataManager.feedback_transformer(data)), data)
         except Exception as e:
-            logging.error(f"Error saving feedback data: {str(e)}")
+            logger.error(f"Error saving feedback data: {str(e)}")
             raise ValueError(f"Failed to save feedback data: {str(e)}")
+
+        # columns missing from processed_data are written as 0
+        queued = feedback_writer.submit(processed_data)
+        if model_row is not None:
+            g3_trainer.observe(split_key, model_row)
+        return queued
+
+    @staticmethod
+    def with_grades(processed_data, data):
+        """Add the record's G1, G2, G3 values to a processed row"""
+        for period in ['G1', 'G2', 'G3']:
+            processed_data[period] = float(data.get(period, 0))
+        return processed_data
     
     @staticmethod
     @api.route('/new-data', methods=['POST'])
@@ -246,7 +226,7 @@ class DataManager:
 
         try:
             data = request.get_json()
-            logger.info(f"New data submission: {data}")
+            logger.debug("New data submission: %s", data)
             
             # Validate required fields
             required_fields = ['G1', 'G2', 'G3']
@@ -254,14 +234,13 @@ class DataManager:
                 if field not in data or not isinstance(data.get(field), (int, float)):
                     return jsonify({'error': f'Missing or invalid {field} value'}), 400
             
-            # Save the data using existing method
-            success = DataManager.save_feedback_data(data)
-            
-            if success:
-                return jsonify({'message': 'Data saved successfully'})
-            else:
-                raise ValueError('Failed to save data')
-                
+            # Queue the row; the background writer appends it to the feedback CSV (or store)
+            queued = DataManager.save_feedback_data(data)
+            return jsonify({'message': 'Data accepted', 'queued': queued}), 202
+
+        except FeedbackQueueFull as e:
+            logger.error(f"New data submission rejected: {str(e)}")
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             logger.error(f"New data submission failed: {str(e)}")
             return jsonify({'error': str(e)}), 400
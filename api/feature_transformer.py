@@ -0,0 +1,336 @@
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+class FeatureTransformer:
+    """Turns student records into model features with the scaling fitted at training time.
+
+    Holds the min/max ranges the notebooks fit with ``MinMaxScaler``: one set
+    for the numeric fields (fitted on the cleaned subject data in
+    0.1_Task2ML_datawrngle) and one for the engineered features (fitted per
+    training split in 0.2_Task2ML_feature). ``transform`` encodes a whole
+    DataFrame into one float64 matrix; ``transform_record`` does the same
+    arithmetic for a single dict, so both give identical values.
+
+    Records may use the API's 0/1 form values or the raw dataset codes
+    ('GP'/'MS', 'yes'/'no', Mjob labels and so on).
+    """
+
+    NUMERIC_FIELDS = [
+        'age', 'Medu', 'Fedu', 'traveltime', 'studytime', 'failures',
+        'famrel', 'freetime', 'goout', 'Dalc', 'Walc', 'health', 'absences'
+    ]
+
+    # Scaling used when no fitted transformer is available
+    DEFAULT_RANGES = {
+        'age': (15, 22),
+        'Medu': (0, 4),
+        'Fedu': (0, 4),
+        'traveltime': (1, 4),
+        'studytime': (1, 4),
+        'failures': (0, 4),
+        'famrel': (1, 5),
+        'freetime': (1, 5),
+        'goout': (1, 5),
+        'Dalc': (1, 5),
+        'Walc': (1, 5),
+        'health': (1, 5),
+        'absences': (0, 93)
+    }
+
+    # 0/1 fields and the dataset codes they stand for (binary_mapping in 0.2_Task2ML_feature)
+    CODED_FIELDS = {
+        'school': {'GP': 0, 'MS': 1},
+        'address': {'U': 0, 'R': 1},
+        'famsize': {'LE3': 0, 'GT3': 1},
+        'Pstatus': {'T': 0, 'A': 1}
+    }
+
+    SEX_CODES = {'female': 0, 'male': 1, 'f': 0, 'm': 1, 'F': 0, 'M': 1}
+
+    BINARY_FIELDS = [
+        'schoolsup', 'famsup', 'paid', 'activities', 'nursery',
+        'higher', 'internet', 'romantic'
+    ]
+
+    ONE_HOT_FIELDS = {
+        'Mjob': ['at_home', 'health', 'other', 'services', 'teacher'],
+        'Fjob': ['at_home', 'health', 'other', 'services', 'teacher'],
+        'reason': ['course', 'home', 'other', 'reputation'],
+        'guardian': ['father', 'mother', 'other']
+    }
+
+    ENGINEERED_FIELDS = ['Gvg', 'Avgalc', 'Bum']
+
+    # Model input order: the G1/G2 forests take FEATURES, the G3 models add G1 and G2
+    FEATURES = [
+        'school', 'sex', 'age', 'address', 'famsize', 'Pstatus',
+        'Medu', 'Fedu', 'traveltime', 'studytime', 'failures',
+        'schoolsup', 'famsup', 'paid', 'activities', 'nursery',
+        'higher', 'internet', 'romantic', 'famrel', 'freetime',
+        'goout', 'Dalc', 'Walc', 'health', 'absences',
+        'Mjob_at_home', 'Mjob_health', 'Mjob_other', 'Mjob_services',
+        'Mjob_teacher', 'Fjob_at_home', 'Fjob_health', 'Fjob_other',
+        'Fjob_services', 'Fjob_teacher', 'reason_course', 'reason_home',
+        'reason_other', 'reason_reputation', 'guardian_father',
+        'guardian_mother', 'guardian_other', 'Gvg', 'Avgalc', 'Bum'
+    ]
+    G3_FEATURES = FEATURES + ['G1', 'G2']
+
+    def __init__(self, numeric_ranges, engineered_ranges=None, meta=None):
+        self.numeric_ranges = {field: (float(numeric_ranges[field][0]), float(numeric_ranges[field][1]))
+                               for field in self.NUMERIC_FIELDS}
+        engineered_ranges = engineered_ranges or {}
+        # None leaves an engineered feature unscaled
+        self.engineered_ranges = {
+            field: (float(engineered_ranges[field][0]), float(engineered_ranges[field][1]))
+            if engineered_ranges.get(field) is not None else None
+            for field in self.ENGINEERED_FIELDS
+        }
+        self.meta = meta or {}
+
+        # a constant column scales by 1, as in MinMaxScaler
+        self.lows = np.array([self.numeric_ranges[field][0] for field in self.NUMERIC_FIELDS])
+        self.spans = np.array([self.span(self.numeric_ranges[field]) for field in self.NUMERIC_FIELDS])
+        self.scaling = [(field, float(low), float(span))
+                        for field, low, span in zip(self.NUMERIC_FIELDS, self.lows, self.spans)]
+        self.positions = {name: index for index, name in enumerate(self.G3_FEATURES)}
+        self.numeric_positions = [self.positions[field] for field in self.NUMERIC_FIELDS]
+
+    @staticmethod
+    def span(value_range):
+        low, high = value_range
+        return high - low if high != low else 1.0
+
+    @classmethod
+    def default(cls):
+        """Transformer with the fixed DEFAULT_RANGES and unscaled engineered features"""
+        return cls(cls.DEFAULT_RANGES, meta={'fitted': False})
+
+    @classmethod
+    def fit(cls, data, numeric_data=None, **meta):
+        """Fit on cleaned, unscaled records.
+
+        Numeric ranges come from ``numeric_data`` (the whole subject in the
+        notebooks) or ``data``; the engineered feature ranges come from
+        ``data``, the training split, after the numeric scaling.
+        """
+        numeric_data = data if numeric_data is None else numeric_data
+        numeric_ranges = {}
+        for field in cls.NUMERIC_FIELDS:
+            values = pd.to_numeric(numeric_data[field])
+            numeric_ranges[field] = (float(values.min()), float(values.max()))
+
+        unscaled = cls(numeric_ranges).transform(data)
+        engineered_ranges = {field: (float(unscaled[field].min()), float(unscaled[field].max()))
+                             for field in cls.ENGINEERED_FIELDS}
+        return cls(numeric_ranges, engineered_ranges, dict(meta, fitted=True, rows=len(data)))
+
+    @staticmethod
+    def path_for(split_key, model_path='models'):
+        """Where the transformer for a subject/gender split ('math_female') is saved"""
+        return os.path.join(model_path, f"{split_key}_features.json")
+
+    @classmethod
+    def load_for(cls, split_key, model_path='models'):
+        """Fitted transformer for a split, or the default one if none was saved"""
+        path = cls.path_for(split_key, model_path)
+        if not os.path.exists(path):
+            logger.warning(f"No feature transformer at {path}, using default scaling; run fit_transformers.py")
+            return cls.default()
+        return cls.load(path)
+
+    def save(self, path, **meta):
+        """Write the fitted ranges as JSON"""
+        self.meta = dict(self.meta, **meta)
+        state = {
+            'format': 'feature_transformer',
+            'format_version': FORMAT_VERSION,
+            'numeric_ranges': self.numeric_ranges,
+            'engineered_ranges': self.engineered_ranges,
+            'features': self.G3_FEATURES,
+            'meta': self.meta
+        }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(state, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        """Load a transformer written by ``save``"""
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('format') != 'feature_transformer' or state.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feature transformer format in {path}")
+        if state['features'] != cls.G3_FEATURES:
+            raise ValueError(f"Feature list in {path} does not match this version of the app")
+        return cls(state['numeric_ranges'], state['engineered_ranges'], state.get('meta'))
+
+    def rescale(self, field, values):
+        """Apply the fitted scaling of an engineered feature"""
+        value_range = self.engineered_ranges[field]
+        if value_range is None:
+            return values
+        return (values - value_range[0]) / self.span(value_range)
+
+    def grade_average(self, g1, g2):
+        """Scaled Gvg for raw G1/G2 grades (scalars or arrays)"""
+        return self.rescale('Gvg', (g1 + g2) / 2.0)
+
+    def known_grade_average(self, g1, g2, has_g1, has_g2):
+        """Scaled Gvg from whichever of G1/G2 are known (scalars or arrays).
+
+        One known grade stands in for the average; with neither, Gvg is the
+        middle of its fitted range instead of the floor a grade of 0 gives.
+        """
+        known = np.asarray(has_g1, dtype=np.float64) + np.asarray(has_g2, dtype=np.float64)
+        total = np.where(has_g1, g1, 0.0) + np.where(has_g2, g2, 0.0)
+        value_range = self.engineered_ranges['Gvg']
+        middle = (value_range[0] + value_range[1]) / 2.0 if value_range is not None else 10.0
+        return self.rescale('Gvg', np.where(known > 0, total / np.maximum(known, 1.0), middle))
+
+    def alcohol_and_risk(self, dalc, walc, failures, absences, studytime, freetime):
+        """Scaled Avgalc and Bum from scaled numeric values (scalars or arrays)"""
+        avgalc = (dalc + walc) / 2.0
+        bum = (
+            2.0 * failures +
+            1.5 * absences +
+            dalc +
+            walc +
+            (1.0 - studytime) +
+            0.5 * freetime
+        ) / 6.0
+        return self.rescale('Avgalc', avgalc), self.rescale('Bum', bum)
+
+    def transform_record(self, data, normalized=False):
+        """Feature dict (G3_FEATURES) for one record; bad values raise ValueError"""
+        processed = {}
+
+        for field, codes in self.CODED_FIELDS.items():
+            value = data.get(field, 0)
+            processed[field] = codes[value] if isinstance(value, str) and value in codes else int(value)
+        if 'gender' in data:
+            processed['sex'] = int(data.get('gender') == 'male')
+        else:
+            sex = data.get('sex', 0)
+            processed['sex'] = self.SEX_CODES[sex] if isinstance(sex, str) and sex in self.SEX_CODES else int(sex)
+
+        for field, low, span in self.scaling:
+            if normalized:
+                processed[field] = float(data.get(field, 0.0))
+            else:
+                processed[field] = (float(data.get(field, low)) - low) / span
+
+        for field in self.BINARY_FIELDS:
+            processed[field] = int(data.get(field) in ['yes', '1', True])
+
+        for field, options in self.ONE_HOT_FIELDS.items():
+            selected = data.get(field)
+            for option in options:
+                name = f'{field}_{option}'
+                if field not in data and name in data:
+                    processed[name] = int(data[name])
+                else:
+                    processed[name] = int(selected == option)
+
+        avgalc, bum = self.alcohol_and_risk(processed['Dalc'], processed['Walc'], processed['failures'],
+                                            processed['absences'], processed['studytime'], processed['freetime'])
+        processed['Avgalc'] = float(avgalc)
+        processed['Bum'] = float(bum)
+
+        # a missing grade is 0 as a G3 input, but Gvg uses only the grades given
+        processed['G1'] = float(data.get('G1', 0))
+        processed['G2'] = float(data.get('G2', 0))
+        processed['Gvg'] = float(self.known_grade_average(processed['G1'], processed['G2'],
+                                                          'G1' in data, 'G2' in data))
+        return processed
+
+    def transform(self, frame, normalized=False):
+        """Feature DataFrame (G3_FEATURES columns) for a DataFrame of records.
+
+        Every column is written into one float64 matrix; the numeric fields
+        are scaled in a single affine step. Missing columns and empty cells
+        take the same defaults as missing keys in ``transform_record``.
+        With ``normalized`` the numeric fields are taken as already scaled,
+        and one-hot columns already present are kept. Unparseable values
+        come back as NaN.
+        """
+        n_rows = len(frame)
+        out = np.empty((n_rows, len(self.G3_FEATURES)), dtype=np.float64)
+        positions = self.positions
+
+        def column(name, default, codes=None):
+            if name not in frame.columns:
+                return np.full(n_rows, default, dtype=np.float64)
+            values = frame[name]
+            empty = values.isna().to_numpy()
+            if not pd.api.types.is_numeric_dtype(values):
+                parsed = pd.to_numeric(values, errors='coerce')
+                if codes:
+                    coded = values.map(codes)
+                    parsed = coded.where(coded.notna(), parsed)
+                values = parsed
+            return np.where(empty, default, values.to_numpy(dtype=np.float64, na_value=np.nan))
+
+        def labels(name):
+            if name not in frame.columns:
+                return np.full(n_rows, None, dtype=object)
+            return frame[name].to_numpy(dtype=object)
+
+        # 0/1 coded fields (int() truncates like np.trunc on the parsed floats)
+        for field, codes in self.CODED_FIELDS.items():
+            out[:, positions[field]] = np.trunc(column(field, 0, codes))
+        if 'gender' in frame.columns:
+            out[:, positions['sex']] = labels('gender') == 'male'
+        else:
+            out[:, positions['sex']] = np.trunc(column('sex', 0, self.SEX_CODES))
+
+        # Numeric fields, scaled in one step
+        if normalized:
+            numeric = np.column_stack([column(field, 0.0) for field in self.NUMERIC_FIELDS])
+        else:
+            numeric = np.column_stack([column(field, low) for field, low in zip(self.NUMERIC_FIELDS, self.lows)])
+            numeric = (numeric - self.lows) / self.spans
+        out[:, self.numeric_positions] = numeric
+
+        # Binary fields ('yes', '1' or anything equal to True)
+        for field in self.BINARY_FIELDS:
+            if field not in frame.columns:
+                out[:, positions[field]] = 0.0
+                continue
+            out[:, positions[field]] = frame[field].isin(['yes', '1']).to_numpy() | (column(field, 0) == 1)
+
+        # One-hot fields (already encoded columns pass through)
+        for field, options in self.ONE_HOT_FIELDS.items():
+            selected = labels(field)
+            for option in options:
+                name = f'{field}_{option}'
+                if field not in frame.columns and name in frame.columns:
+                    out[:, positions[name]] = frame[name].to_numpy().astype(int)
+                else:
+                    out[:, positions[name]] = selected == option
+
+        # Engineered features from the scaled numeric columns
+        numeric_index = {field: index for index, field in enumerate(self.NUMERIC_FIELDS)}
+        avgalc, bum = self.alcohol_and_risk(*(numeric[:, numeric_index[field]] for field in
+                                              ['Dalc', 'Walc', 'failures', 'absences', 'studytime', 'freetime']))
+        out[:, positions['Avgalc']] = avgalc
+        out[:, positions['Bum']] = bum
+
+        g1 = column('G1', 0.0)
+        g2 = column('G2', 0.0)
+        out[:, positions['G1']] = g1
+        out[:, positions['G2']] = g2
+        known = {period: frame[period].notna().to_numpy() if period in frame.columns else np.zeros(n_rows, dtype=bool)
+                 for period in ['G1', 'G2']}
+        out[:, positions['Gvg']] = self.known_grade_average(g1, g2, known['G1'], known['G2'])
+
+        return pd.DataFrame(out, index=frame.index, columns=self.G3_FEATURES, copy=False)
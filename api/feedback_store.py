@@ -0,0 +1,270 @@
+import os
+import json
+import glob
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+from row_hash import row_hashes
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single writer
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = 'MANIFEST.json'
+LOCK_FILE = 'LOCK'
+
+class FeedbackStore:
+    """Feedback rows kept as immutable, memory-mappable NumPy segments.
+
+    Each ``append`` writes one segment: a column-major float64 matrix
+    (``seg-<n>.npy``, one contiguous array per column) plus the 16-byte
+    content hash of every row (``seg-<n>.hash.npy``). ``MANIFEST.json``
+    lists the live segments and is replaced atomically, so readers see a
+    segment either completely or not at all. Rows whose hash is already
+    stored are dropped. Segments below ``segment_rows`` are grouped in size
+    tiers (powers of ``compact_segments``); once a tier holds
+    ``compact_segments`` of them they are merged into one in a background
+    thread, so each row is rewritten only a few times.
+    Appends and compactions from different processes are serialized with
+    ``flock`` on ``LOCK``.
+    """
+
+    def __init__(self, path, columns, segment_rows=100000, compact_segments=8):
+        self.path = path
+        self.columns = list(columns)
+        self.segment_rows = segment_rows
+        self.compact_segments = compact_segments
+        self.duplicates = 0
+        # hashes of every stored row, refreshed when another process changes the manifest
+        self._hashes = set()
+        self._hashed_segments = set()
+        self._lock = threading.Lock()
+        self._compacting = False
+        self._compacting_lock = threading.Lock()
+
+    @contextmanager
+    def locked(self):
+        """Hold the store lock across threads and processes"""
+        with self._lock:
+            os.makedirs(self.path, exist_ok=True)
+            fd = os.open(os.path.join(self.path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def read_manifest(self):
+        path = os.path.join(self.path, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {
+                'format': 'feedback_store',
+                'format_version': FORMAT_VERSION,
+                'columns': self.columns,
+                'next_segment': 1,
+                'segments': [],
+                'imported': []
+            }
+        with open(path) as f:
+            manifest = json.load(f)
+        if manifest.get('format') != 'feedback_store' or manifest.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported feedback store format in {self.path}")
+        if manifest['columns'] != self.columns:
+            raise ValueError(f"Feedback store {self.path} has different columns")
+        return manifest
+
+    def write_manifest(self, manifest):
+        path = os.path.join(self.path, MANIFEST_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def segment_path(self, name, suffix='.npy'):
+        return os.path.join(self.path, f"{name}{suffix}")
+
+    row_hashes = staticmethod(row_hashes)
+
+    def _refresh_hashes(self, manifest):
+        live = {segment['name'] for segment in manifest['segments']}
+        if live == self._hashed_segments:
+            return
+        if not self._hashed_segments <= live:
+            # segments were compacted away; their rows live on in the merged one
+            self._hashes = set()
+            self._hashed_segments = set()
+        for name in sorted(live - self._hashed_segments):
+            self._hashes.update(h.tobytes() for h in np.load(self.segment_path(name, '.hash.npy')))
+        self._hashed_segments = live
+
+    def _write_segment(self, manifest, matrix, hashes):
+        """Write a segment and return its manifest entry (not yet listed)"""
+        name = f"seg-{manifest['next_segment']:08d}"
+        manifest['next_segment'] += 1
+        for suffix, array in [('.hash.npy', hashes), ('.npy', np.asfortranarray(matrix))]:
+            path = self.segment_path(name, suffix)
+            with open(f"{path}.tmp", 'wb') as f:
+                np.save(f, array)
+            os.replace(f"{path}.tmp", path)
+        return {'name': name, 'rows': int(matrix.shape[0])}
+
+    def append(self, rows):
+        """Store rows (sequences in ``columns`` order) as a new segment; returns rows added"""
+        matrix = np.asarray(rows, dtype=np.float64).reshape(-1, len(self.columns))
+        hashes = self.row_hashes(matrix)
+        with self.locked():
+            manifest = self.read_manifest()
+            self._refresh_hashes(manifest)
+            keep = np.zeros(len(matrix), dtype=bool)
+            for index, digest in enumerate(hashes):
+                key = digest.tobytes()
+                if key not in self._hashes:
+                    self._hashes.add(key)
+                    keep[index] = True
+            self.duplicates += int((~keep).sum())
+            if not keep.any():
+                return 0
+            entry = self._write_segment(manifest, matrix[keep], hashes[keep])
+            manifest['segments'].append(entry)
+            self.write_manifest(manifest)
+            self._hashed_segments.add(entry['name'])
+        logger.info(f"Stored {entry['rows']} feedback rows in {entry['name']} ({len(matrix) - entry['rows']} duplicates)")
+        if self.needs_compaction(manifest):
+            self.compact_in_background()
+        return entry['rows']
+
+    def tier(self, rows):
+        tier = 0
+        while rows >= self.compact_segments:
+            rows //= self.compact_segments
+            tier += 1
+        return tier
+
+    def compaction_candidates(self, manifest, force=False):
+        """Segments the next compaction merges: a full tier, or with ``force`` every small one"""
+        small = [segment for segment in manifest['segments'] if segment['rows'] < self.segment_rows]
+        if force:
+            return small if len(small) >= 2 else []
+        tiers = {}
+        for segment in small:
+            tiers.setdefault(self.tier(segment['rows']), []).append(segment)
+        for tier in sorted(tiers):
+            if len(tiers[tier]) >= self.compact_segments:
+                return tiers[tier]
+        return []
+
+    def needs_compaction(self, manifest):
+        return bool(self.compaction_candidates(manifest))
+
+    def compact_in_background(self):
+        with self._compacting_lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                # keep going while merging fills the next tier up
+                while self.compact():
+                    pass
+            except Exception as e:
+                logger.error(f"Feedback store compaction failed: {str(e)}")
+            finally:
+                self._compacting = False
+
+        threading.Thread(target=run, name='feedback-compaction', daemon=True).start()
+
+    def compact(self, force=False):
+        """Merge a tier of small segments (every small one with ``force``); returns the number merged"""
+        with self.locked():
+            manifest = self.read_manifest()
+            small = self.compaction_candidates(manifest, force)
+            if not small:
+                return 0
+            # every input must be hashed here before it is folded into one new segment
+            self._refresh_hashes(manifest)
+            matrix = np.concatenate([np.load(self.segment_path(segment['name'])) for segment in small])
+            hashes = np.concatenate([np.load(self.segment_path(segment['name'], '.hash.npy')) for segment in small])
+            entry = self._write_segment(manifest, matrix, hashes)
+            merged = {segment['name'] for segment in small}
+            # the merged segment goes where the first of its inputs was
+            position = next(index for index, segment in enumerate(manifest['segments']) if segment['name'] in merged)
+            remaining = [segment for segment in manifest['segments'] if segment['name'] not in merged]
+            remaining.insert(position, entry)
+            manifest['segments'] = remaining
+            self.write_manifest(manifest)
+            # open memory maps of the old files stay valid after unlinking
+            for name in merged:
+                for suffix in ['.npy', '.hash.npy']:
+                    os.remove(self.segment_path(name, suffix))
+            self._hashed_segments = (self._hashed_segments - merged) | {entry['name']}
+        logger.info(f"Compacted {len(small)} feedback segments into {entry['name']} ({entry['rows']} rows)")
+        return len(small)
+
+    def segments(self, mmap_mode='r'):
+        """Memory-mapped (rows, columns) matrix of every live segment, in order"""
+        for attempt in range(3):
+            manifest = self.read_manifest()
+            try:
+                return [np.load(self.segment_path(segment['name']), mmap_mode=mmap_mode)
+                        for segment in manifest['segments']]
+            except FileNotFoundError:
+                # compacted between reading the manifest and opening a segment
+                continue
+        raise ValueError(f"Feedback store {self.path} kept changing while being read")
+
+    def load(self, mmap_mode='r'):
+        """Every stored row as ``{column: array}``.
+
+        With a single segment (the usual state after compaction) the arrays
+        are zero-copy views of the memory-mapped file; several segments are
+        concatenated.
+        """
+        segments = self.segments(mmap_mode)
+        if not segments:
+            return {column: np.empty(0) for column in self.columns}
+        matrix = segments[0] if len(segments) == 1 else np.concatenate(segments)
+        return {column: matrix[:, index] for index, column in enumerate(self.columns)}
+
+    def __len__(self):
+        return sum(segment['rows'] for segment in self.read_manifest()['segments'])
+
+    def import_csv(self, csv_path, chunk_size=50000):
+        """One-time import of a feedback CSV; returns (rows read, rows added)"""
+        import pandas as pd
+        digest = hashlib.sha256()
+        with open(csv_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        checksum = digest.hexdigest()
+        if any(entry['sha256'] == checksum for entry in self.read_manifest()['imported']):
+            logger.info(f"{csv_path} was already imported")
+            return 0, 0
+
+        read = added = 0
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_size):
+            missing = [column for column in self.columns if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"{csv_path} is missing columns: {missing}")
+            read += len(chunk)
+            added += self.append(chunk[self.columns].to_numpy(dtype=np.float64))
+        with self.locked():
+            manifest = self.read_manifest()
+            manifest['imported'].append({'file': os.path.abspath(csv_path), 'sha256': checksum, 'rows': read})
+            self.write_manifest(manifest)
+        return read, added
+
+    def stats(self):
+        manifest = self.read_manifest()
+        return {
+            'rows': sum(segment['rows'] for segment in manifest['segments']),
+            'segments': len(manifest['segments']),
+            'duplicates_dropped': self.duplicates,
+            'bytes': sum(os.path.getsize(path) for path in glob.glob(os.path.join(self.path, 'seg-*.npy')))
+        }
@@ -0,0 +1,191 @@
+import os
+import io
+import csv
+import time
+import atexit
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: O_APPEND still keeps each batch write whole
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+class FeedbackQueueFull(Exception):
+    """Raised by ``FeedbackWriter.submit`` when the buffer is at ``max_pending`` rows"""
+
+class FeedbackCsv:
+    """Feedback CSV shared by several worker processes.
+
+    Each batch is one ``O_APPEND`` write under an exclusive ``flock``, so
+    workers never interleave lines or write two headers.
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = list(columns)
+        self._write_lock = threading.Lock()
+
+    def append(self, batch):
+        """Append rows to the CSV in one locked write, adding the header to a new file"""
+        body = io.StringIO()
+        csv.writer(body, lineterminator='\n').writerows(batch)
+        with self._write_lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                text = body.getvalue()
+                # checked under the lock so only one process writes the header
+                size = os.fstat(fd).st_size
+                if size == 0:
+                    text = ','.join(self.columns) + '\n' + text
+                else:
+                    # a process that died mid-write leaves a partial line; start ours on a new one
+                    os.lseek(fd, size - 1, os.SEEK_SET)
+                    if os.read(fd, 1) != b'\n':
+                        text = '\n' + text
+                data = text.encode('utf-8')
+                while data:
+                    data = data[os.write(fd, data):]
+            finally:
+                # closing the descriptor releases the lock
+                os.close(fd)
+        logger.info(f"Wrote {len(batch)} feedback rows to {self.path}")
+        return len(batch)
+
+class FeedbackWriter:
+    """Write-behind buffer for /api/new-data feedback rows.
+
+    ``submit`` queues a row in memory and returns; a background thread
+    hands queued rows to ``sink.append`` (a ``FeedbackCsv`` or
+    ``FeedbackStore``) once ``max_rows`` are waiting or the oldest has
+    waited ``max_wait`` seconds. Pending rows are flushed at interpreter
+    exit and by ``close``.
+    """
+
+    def __init__(self, sink, max_rows=100, max_wait=2.0, max_pending=10000):
+        self.sink = sink
+        self.columns = sink.columns
+        self.max_rows = max_rows
+        self.max_wait = max_wait
+        self.max_pending = max_pending
+        self.written = 0
+        self.failures = 0
+        self.dropped = 0
+        self._pending = []
+        self._first_at = None
+        self._closed = False
+        self._pid = None
+        self._cond = None
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # threads don't survive fork, so each worker process starts its own
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self._pending = []
+                self._first_at = None
+                self._closed = False
+                self._cond = threading.Condition()
+                self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+                self._pid = os.getpid()
+
+    def submit(self, row):
+        """Queue one row (a dict keyed by ``columns``) for writing"""
+        self._ensure_worker()
+        values = [row.get(column, 0) for column in self.columns]
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                raise FeedbackQueueFull(f"Feedback buffer is full ({self.max_pending} rows)")
+            if not self._pending:
+                self._first_at = time.monotonic()
+            self._pending.append(values)
+            # wake the writer to start the timer on the first row, or to write a full batch
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._cond.notify()
+            return len(self._pending)
+
+    def _take_batch(self):
+        """Block until a batch is due (or the writer closes) and take it"""
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            while len(self._pending) < self.max_rows and not self._closed:
+                remaining = self._first_at + self.max_wait - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch, self._pending, self._first_at = self._pending, [], None
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if batch:
+                self._write(batch)
+            if self._closed:
+                return
+
+    def _write(self, batch):
+        try:
+            self.sink.append(batch)
+            self.written += len(batch)
+        except OSError as e:
+            self.failures += 1
+            logger.error(f"Could not write {len(batch)} feedback rows: {str(e)}")
+            with self._cond:
+                # keep them for the next flush, oldest first
+                self._pending[:0] = batch[:max(self.max_pending - len(self._pending), 0)]
+                if self._pending and self._first_at is None:
+                    self._first_at = time.monotonic()
+            if not self._closed:
+                time.sleep(self.max_wait)
+        except Exception:
+            # not a transient write error (e.g. a store schema mismatch): retrying would fail the
+            # same way, so drop the batch rather than let the queue fill up behind it
+            self.failures += 1
+            self.dropped += len(batch)
+            logger.exception(f"Dropped {len(batch)} feedback rows that could not be written")
+
+    def flush(self):
+        """Write everything queued so far from the calling thread"""
+        if self._cond is None:
+            return
+        with self._cond:
+            batch, self._pending, self._first_at = self._pending, [], None
+        if batch:
+            self._write(batch)
+
+    def close(self, timeout=10.0):
+        """Stop the background thread after writing what is queued"""
+        if self._cond is None or self._pid != os.getpid() or self._closed:
+            return
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        # let a batch the thread already took finish writing before the process exits
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            logger.warning(f"Feedback writer still busy after {timeout}s; writing the rest from this thread")
+        self.flush()
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'written': self.written,
+            'failures': self.failures,
+            'dropped': self.dropped,
+            'max_rows': self.max_rows,
+            'max_wait': self.max_wait
+        }
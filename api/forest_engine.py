@@ -0,0 +1,167 @@
+import os
+import json
+import hashlib
+import numpy as np
+
+# flat-array scoring for the RandomForest G1/G2 models
+
+FORMAT_VERSION = 1
+
+ARRAY_DTYPES = {
+    'feature': np.int16,
+    'threshold': np.float64,
+    'children': np.int32,
+    'leaf_index': np.int32,
+    'leaf_values': np.float64,
+    'roots': np.int32,
+    'classes': np.int64,
+}
+
+def file_checksum(path):
+    """sha256 of a file, used to tie exports to the artifact they came from"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class FlatForest:
+    """A RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    All trees share one node table; ``children`` holds the global
+    (left, right) node indices and leaves point back at themselves, so a
+    batch of rows walks every tree at once, one level per step, with no
+    per-tree Python work; after ``max_depth`` steps every path is at its
+    leaf. Leaf class distributions live in ``leaf_values`` and are summed
+    tree by tree in the same order as sklearn, so probabilities and
+    classes match it exactly.
+    """
+
+    def __init__(self, arrays, feature_names, max_depth, meta=None):
+        for name, dtype in ARRAY_DTYPES.items():
+            setattr(self, name, arrays[name])
+        self.feature_names = list(feature_names)
+        self.n_features = len(self.feature_names)
+        self.max_depth = int(max_depth)
+        self.n_trees = len(self.roots)
+        self.meta = meta or {}
+        self._flat_children = self.children.reshape(-1)
+
+    @classmethod
+    def from_sklearn(cls, forest, feature_names=None):
+        """Flatten a fitted RandomForestClassifier"""
+        names = getattr(forest, 'feature_names_in_', None)
+        if names is None:
+            names = feature_names
+        if names is None or len(names) != forest.n_features_in_:
+            raise ValueError("Feature names are required to flatten this forest")
+        n_classes = len(forest.classes_)
+
+        parts = {name: [] for name in ['feature', 'threshold', 'children', 'leaf_index', 'leaf_values']}
+        roots = []
+        offset, leaf_offset, max_depth = 0, 0, 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+            leaves = np.flatnonzero(is_leaf)
+
+            leaf_index = np.full(tree.node_count, -1, dtype=np.int64)
+            leaf_index[leaves] = leaf_offset + np.arange(len(leaves))
+
+            # leaves loop back to themselves
+            parts['feature'].append(np.where(is_leaf, 0, tree.feature))
+            parts['threshold'].append(np.where(is_leaf, np.inf, tree.threshold))
+            parts['children'].append(np.stack([
+                np.where(is_leaf, node_ids, tree.children_left),
+                np.where(is_leaf, node_ids, tree.children_right)
+            ], axis=1) + offset)
+            parts['leaf_index'].append(leaf_index)
+            parts['leaf_values'].append(tree.value[leaves, 0, :n_classes])
+
+            roots.append(offset)
+            offset += tree.node_count
+            leaf_offset += len(leaves)
+            max_depth = max(max_depth, tree.max_depth)
+
+        arrays = {name: np.concatenate(values) for name, values in parts.items()}
+        arrays['roots'] = np.array(roots)
+        arrays['classes'] = np.asarray(forest.classes_)
+        arrays = {name: np.ascontiguousarray(arrays[name], dtype=dtype) for name, dtype in ARRAY_DTYPES.items()}
+        return cls(arrays, names, max_depth)
+
+    def save(self, path, **meta):
+        """Write one .npy per array plus a meta.json into directory ``path``"""
+        os.makedirs(path, exist_ok=True)
+        # each file is replaced whole: a serving process that maps the arrays keeps the old
+        # files' contents and never sees a partly written one; meta.json goes last
+        for name in ARRAY_DTYPES:
+            array_path = os.path.join(path, f'{name}.npy')
+            with open(f"{array_path}.tmp", 'wb') as f:
+                np.save(f, getattr(self, name))
+            os.replace(f"{array_path}.tmp", array_path)
+        self.meta = dict(meta,
+                         format='flat_forest',
+                         format_version=FORMAT_VERSION,
+                         feature_names=self.feature_names,
+                         max_depth=self.max_depth,
+                         n_trees=self.n_trees)
+        meta_path = os.path.join(path, 'meta.json')
+        with open(f"{meta_path}.tmp", 'w') as f:
+            json.dump(self.meta, f, indent=2)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        """Load an exported forest; arrays are memory-mapped by default"""
+        with open(os.path.join(path, 'meta.json')) as f:
+            meta = json.load(f)
+        if meta.get('format') != 'flat_forest' or meta.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported forest format in {path}")
+        arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode=mmap_mode)
+                  for name in ARRAY_DTYPES}
+        return cls(arrays, meta['feature_names'], meta['max_depth'], meta)
+
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAY_DTYPES)
+
+    def to_matrix(self, rows):
+        """Stack processed feature dicts into a matrix in forest feature order"""
+        X = np.empty((len(rows), self.n_features), dtype=np.float32)
+        for i, processed_data in enumerate(rows):
+            X[i] = [processed_data[name] for name in self.feature_names]
+        return X
+
+    def apply(self, X):
+        """Return the global leaf node reached in every tree, shape (n_rows, n_trees)"""
+        # sklearn scores trees on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected {self.n_features} features, got shape {X.shape}")
+        if np.isnan(X).any():
+            raise ValueError("Input contains NaN")
+
+        n_rows = X.shape[0]
+        flat_X = X.reshape(-1)
+        # one entry per (row, tree) path: current node and the row's offset into flat_X
+        node = np.tile(self.roots, n_rows)
+        row_offset = np.repeat(np.arange(0, n_rows * self.n_features, self.n_features, dtype=np.int32), self.n_trees)
+
+        # paths already at a leaf keep stepping onto it (feature 0, both children itself), which
+        # is cheaper than dropping them from the working set with fancy indexing every level
+        for _ in range(self.max_depth):
+            go_right = flat_X.take(row_offset + self.feature.take(node)) > self.threshold.take(node)
+            node = self._flat_children.take(2 * node + go_right)
+        return node.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X):
+        leaf_values = self.leaf_values[self.leaf_index[self.apply(X)]]
+        # accumulate tree by tree like sklearn so the sums round the same way
+        proba = np.zeros((leaf_values.shape[0], leaf_values.shape[2]), dtype=np.float64)
+        for tree in range(self.n_trees):
+            proba += leaf_values[:, tree]
+        proba /= self.n_trees
+        return proba
+
+    def predict(self, X):
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
@@ -0,0 +1,302 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from dataset_store import read_split
+
+from .compiled_models import CompiledLinearModel
+from .feature_transformer import FeatureTransformer
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+LOCK_FILE = 'LOCK'
+
+# model key -> processed_data split its G3 model was trained on (see 0.3_Task2ML_train)
+SEED_SPLITS = {
+    'math_female': 'Pmat_full',
+    'math_male': 'PmatM',
+    'por_female': 'Ppor_full',
+    'por_male': 'PporM',
+}
+
+class ModelVersionActive(Exception):
+    """Raised by ``update`` while a registry version is served instead of ``models_dir``"""
+
+class SufficientStatistics:
+    """Everything an ordinary least squares fit needs from its rows.
+
+    Keeps the row count, the means and the centered cross products
+    ``XᵀX`` / ``Xᵀy``; adding rows or merging another set is O(features²)
+    per row and never needs the rows again. ``solve`` gives the same
+    minimum-norm solution as sklearn's ``LinearRegression`` (which centers
+    the data and calls lstsq), so collinear one-hot groups and constant
+    columns are handled the same way.
+    """
+
+    # eigenvalues below this fraction of the largest are treated as zero
+    RCOND = 1e-10
+
+    def __init__(self, n_features):
+        self.n = 0
+        self.mean_x = np.zeros(n_features)
+        self.mean_y = 0.0
+        self.sxx = np.zeros((n_features, n_features))
+        self.sxy = np.zeros(n_features)
+
+    @classmethod
+    def from_data(cls, X, y):
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        stats = cls(X.shape[1])
+        if len(X):
+            stats.n = len(X)
+            stats.mean_x = X.mean(axis=0)
+            stats.mean_y = float(y.mean())
+            centered = X - stats.mean_x
+            stats.sxx = centered.T @ centered
+            stats.sxy = centered.T @ (y - stats.mean_y)
+        return stats
+
+    def merge(self, other):
+        """Fold another set of statistics into this one (Chan et al. pairwise update)"""
+        if other.n == 0:
+            return self
+        n = self.n + other.n
+        dx = other.mean_x - self.mean_x
+        dy = other.mean_y - self.mean_y
+        weight = self.n * other.n / n
+        self.sxx = self.sxx + other.sxx + weight * np.outer(dx, dx)
+        self.sxy = self.sxy + other.sxy + weight * dx * dy
+        self.mean_x = self.mean_x + dx * (other.n / n)
+        self.mean_y = self.mean_y + dy * (other.n / n)
+        self.n = n
+        return self
+
+    def add(self, X, y):
+        return self.merge(SufficientStatistics.from_data(X, y))
+
+    def solve(self):
+        """(coef, intercept) of the least squares fit with an intercept"""
+        if self.n == 0:
+            raise ValueError("No rows to fit")
+        coef = np.linalg.pinv(self.sxx, rcond=self.RCOND, hermitian=True) @ self.sxy
+        return coef, float(self.mean_y - self.mean_x @ coef)
+
+    def save(self, path, **meta):
+        with open(f"{path}.tmp", 'wb') as f:
+            np.savez(f, n=self.n, mean_x=self.mean_x, mean_y=self.mean_y, sxx=self.sxx, sxy=self.sxy,
+                     meta=json.dumps(dict(meta, format_version=FORMAT_VERSION)))
+        os.replace(f"{path}.tmp", path)
+
+    @classmethod
+    def load(cls, path):
+        """Statistics and the meta dict saved with them"""
+        with np.load(path) as data:
+            meta = json.loads(str(data['meta']))
+            if meta.get('format_version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported statistics format in {path}")
+            stats = cls(len(data['mean_x']))
+            stats.n = int(data['n'])
+            stats.mean_x = data['mean_x']
+            stats.mean_y = float(data['mean_y'])
+            stats.sxx = data['sxx']
+            stats.sxy = data['sxy']
+        return stats, meta
+
+class IncrementalG3Trainer:
+    """Keeps the G3 linear models up to date with /api/new-data rows.
+
+    One ``SufficientStatistics`` per model key lives in
+    ``<stats_path>/<key>.npz``, seeded from the processed_data training
+    split on first use. ``observe`` adds a feedback row to this process's
+    in-memory delta; ``update`` merges the deltas into the shared files
+    under ``flock`` and, for keys with at least ``min_rows`` rows not yet
+    published, re-solves and writes the model into ``models_dir`` where
+    the serving hot reload picks it up. That overwrites the tracked
+    ``models/*_G3_model.joblib`` files in place. While ``registry`` has an
+    active version, ``models_dir`` isn't served and versions are immutable,
+    so ``update`` still merges rows but raises ``ModelVersionActive``
+    instead of publishing. With ``interval`` set a background thread runs
+    ``update`` on that schedule.
+    """
+
+    def __init__(self, stats_path, models_dir='models', backend='joblib', seed_dir='processed_data',
+                 min_rows=1, interval=0, registry=None):
+        self.stats_path = stats_path
+        self.models_dir = models_dir
+        self.registry = registry
+        self.backend = backend
+        self.seed_dir = seed_dir
+        self.min_rows = min_rows
+        self.interval = interval
+        self.feature_names = FeatureTransformer.G3_FEATURES
+        self.observed = 0
+        self.last_update = None
+        self.last_error = None
+        self._deltas = {}
+        self._pid = None
+        self._lock = threading.Lock()
+        self._update_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        # threads don't survive fork, so each worker process starts its own scheduler
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._deltas = {}
+                if self.interval > 0:
+                    threading.Thread(target=self._run, name='g3-update', daemon=True).start()
+                self._pid = os.getpid()
+
+    def observe(self, split_key, processed_data):
+        """Add one processed feedback row (with its G3) for a key such as 'math_female'"""
+        if split_key not in SEED_SPLITS:
+            raise ValueError(f"Unknown model key: {split_key}")
+        x = np.array([[processed_data[name] for name in self.feature_names]], dtype=np.float64)
+        y = np.array([processed_data['G3']], dtype=np.float64)
+        self._ensure_worker()
+        with self._lock:
+            delta = self._deltas.setdefault(split_key, SufficientStatistics(len(self.feature_names)))
+            delta.add(x, y)
+            self.observed += 1
+
+    @contextmanager
+    def locked(self):
+        """Hold the statistics lock across processes"""
+        os.makedirs(self.stats_path, exist_ok=True)
+        fd = os.open(os.path.join(self.stats_path, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(fd)
+
+    def stats_file(self, split_key):
+        return os.path.join(self.stats_path, f"{split_key}.npz")
+
+    def seed(self, split_key):
+        """Statistics of the training split the notebook fitted the model on"""
+        name = SEED_SPLITS[split_key]
+        X, y = read_split(self.seed_dir, name, 'train')
+        X = pd.concat([X, y[['G1', 'G2']]], axis=1)[self.feature_names]
+        return SufficientStatistics.from_data(X.to_numpy(dtype=np.float64), y['G3'].to_numpy(dtype=np.float64))
+
+    def load_statistics(self, split_key):
+        """Saved statistics and meta for a key, seeding them if there are none yet"""
+        path = self.stats_file(split_key)
+        if os.path.exists(path):
+            stats, meta = SufficientStatistics.load(path)
+            if meta.get('feature_names') == self.feature_names:
+                return stats, meta
+            logger.warning(f"{path} was built for other features, seeding it again")
+        stats = self.seed(split_key)
+        return stats, {'feature_names': self.feature_names, 'seed_rows': stats.n, 'published_rows': stats.n}
+
+    def sync(self):
+        """Merge this process's observed rows into the shared statistics; returns rows merged"""
+        with self._lock:
+            deltas, self._deltas = self._deltas, {}
+        merged = 0
+        try:
+            with self.locked():
+                for split_key in list(deltas):
+                    stats, meta = self.load_statistics(split_key)
+                    stats.merge(deltas[split_key])
+                    stats.save(self.stats_file(split_key), **meta)
+                    merged += deltas.pop(split_key).n
+        finally:
+            # rows that could not be merged wait for the next sync
+            with self._lock:
+                for split_key, delta in deltas.items():
+                    pending = self._deltas.get(split_key)
+                    self._deltas[split_key] = delta if pending is None else delta.merge(pending)
+        return merged
+
+    def update(self, force=False):
+        """Sync, then re-solve and publish every key with enough unpublished rows.
+
+        ``force`` publishes every key even without new rows. Returns
+        ``{key: {'rows', 'new_rows', 'published'}}``.
+        """
+        with self._update_lock:
+            self.sync()
+            version = self.registry.active_version() if self.registry is not None else None
+            if version:
+                raise ModelVersionActive(f"Model version {version} is being served, not {self.models_dir}; "
+                                         f"retrain and publish a new version instead")
+            report = {}
+            with self.locked():
+                for split_key in SEED_SPLITS:
+                    stats, meta = self.load_statistics(split_key)
+                    new_rows = stats.n - meta['published_rows']
+                    published = force or (new_rows > 0 and new_rows >= self.min_rows)
+                    if published:
+                        coef, intercept = stats.solve()
+                        self.publish(split_key, coef, intercept, rows=stats.n)
+                        meta['published_rows'] = stats.n
+                    if published or not os.path.exists(self.stats_file(split_key)):
+                        stats.save(self.stats_file(split_key), **meta)
+                    report[split_key] = {'rows': stats.n, 'new_rows': new_rows, 'published': published}
+            self.last_update = time.time()
+            return report
+
+    def publish(self, split_key, coef, intercept, rows):
+        """Write the solved model where the serving ModelStore looks for it"""
+        key = f"{split_key}_G3"
+        model = CompiledLinearModel(coef, intercept, self.feature_names)
+        # every file is replaced atomically; meta.json last as the exported store expects
+        model.save(os.path.join(self.models_dir, 'compiled', key), source='incremental', rows=rows)
+        if self.backend == 'joblib':
+            import joblib
+            from sklearn.linear_model import LinearRegression
+            estimator = LinearRegression()
+            estimator.coef_ = model.coef
+            estimator.intercept_ = model.intercept
+            estimator.feature_names_in_ = np.array(self.feature_names, dtype=object)
+            estimator.n_features_in_ = model.n_features
+            path = os.path.join(self.models_dir, f"{key}_model.joblib")
+            joblib.dump(estimator, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+        logger.info(f"Published {key} from {rows} rows")
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                report = self.update()
+                self.last_error = None
+                published = [key for key, entry in report.items() if entry['published']]
+                if published:
+                    logger.info(f"Incremental G3 update published {published}")
+            except ModelVersionActive as e:
+                # rows keep accumulating; only say so once per change of version
+                if self.last_error != str(e):
+                    logger.warning(f"Incremental G3 update skipped: {str(e)}")
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Incremental G3 update failed: {str(e)}")
+
+    def status(self):
+        with self._lock:
+            pending = {key: delta.n for key, delta in self._deltas.items()}
+        return {
+            'observed': self.observed,
+            'pending': pending,
+            'interval': self.interval,
+            'min_rows': self.min_rows,
+            'last_update': self.last_update,
+            'last_error': self.last_error
+        }
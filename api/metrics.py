@@ -0,0 +1,266 @@
+import os
+import glob
+import json
+import time
+import atexit
+import bisect
+import logging
+import secrets
+import itertools
+import threading
+from flask import jsonify, Response
+from . import api
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds in seconds: ten per decade (the R10 series) from 1 µs to 100 s,
+# fine enough to estimate p50/p99 from. The text format lists the 1, 2.5 and 5 bounds of each
+# decade; dropping bounds from a cumulative histogram keeps it valid.
+MANTISSAS = (1.0, 1.25, 1.6, 2.0, 2.5, 3.2, 4.0, 5.0, 6.3, 8.0)
+EXPOSED_MANTISSAS = (1.0, 2.5, 5.0)
+_GRID = list(itertools.product(range(-6, 2), MANTISSAS))
+BUCKETS = tuple(float(f"{mantissa}e{exponent}") for exponent, mantissa in _GRID) + (100.0,)
+EXPOSED_BUCKETS = tuple(index for index, (_, mantissa) in enumerate(_GRID)
+                        if mantissa in EXPOSED_MANTISSAS) + (len(BUCKETS) - 1,)
+QUANTILES = (0.5, 0.99)
+
+# name -> (type, help) of everything the app records
+METRICS = {
+    'http_request_seconds': ('histogram', 'Time from the start of a request to its response, by endpoint'),
+    'prediction_stage_seconds': ('histogram', 'Time spent in each stage of a prediction request (json_parse times every JSON body); batch="true" series time a whole batch'),
+    'predictions_total': ('counter', 'Predictions served, by model key'),
+    'prediction_errors_total': ('counter', 'Failed predictions, by exception type and the stage that raised it'),
+}
+
+class _StageTimer:
+    """``with metrics.stage('features'):`` records the block's duration"""
+    __slots__ = ('metrics', 'labels', 'start')
+
+    def __init__(self, metrics, labels):
+        self.metrics = metrics
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe('prediction_stage_seconds', time.perf_counter() - self.start, self.labels)
+        return False
+
+class Metrics:
+    """Histograms and counters of one process, summed across processes on read.
+
+    Recording is a bisect and two additions under a lock. Each process
+    writes its values to ``<directory>/<pid>-<token>.json`` every
+    ``flush_interval`` seconds, at exit and before answering a scrape;
+    ``collect`` adds up every file, so with several gunicorn workers each
+    scrape reports all of them. Files of exited workers stay, so counters
+    never go backwards until ``clear_directory`` at server start.
+    """
+
+    def __init__(self, directory=None, flush_interval=5.0, enabled=True):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.enabled = enabled
+        # (name, labels) -> [bucket counts..., overflow count, sum] or counter value
+        self._histograms = {}
+        self._counters = {}
+        self._dirty = False
+        self._pid = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    @staticmethod
+    def clear_directory(directory):
+        """Drop the values of earlier server runs"""
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            os.remove(path)
+
+    def _ensure_process(self):
+        if self._pid is not None:
+            return
+        with self._start_lock:
+            if self._pid is None:
+                if self.directory:
+                    self._file = os.path.join(self.directory, f"{os.getpid()}-{secrets.token_hex(4)}.json")
+                    threading.Thread(target=self._run, name='metrics-flush', daemon=True).start()
+                    atexit.register(self.flush)
+                self._pid = os.getpid()
+
+    def _after_fork(self):
+        # values recorded before a fork belong to the parent's file, and threads don't survive fork
+        self._histograms = {}
+        self._counters = {}
+        self._dirty = False
+        self._pid = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+
+    def stage(self, stage, batch=False):
+        """Timer for one stage; ``batch`` marks a duration covering a whole batch of records"""
+        return _StageTimer(self, stage_labels(stage, batch))
+
+    def observe(self, name, seconds, labels=()):
+        """Add one observation to histogram ``name``; ``labels`` is a tuple of (name, value) pairs"""
+        if not self.enabled:
+            return
+        self._ensure_process()
+        index = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            values = self._histograms.get((name, labels))
+            if values is None:
+                values = self._histograms[(name, labels)] = [0] * (len(BUCKETS) + 1) + [0.0]
+            values[index] += 1
+            values[-1] += seconds
+            self._dirty = True
+
+    def inc(self, name, labels=(), amount=1):
+        if not self.enabled:
+            return
+        self._ensure_process()
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0) + amount
+            self._dirty = True
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'histograms': [[name, list(labels), list(values)] for (name, labels), values in self._histograms.items()],
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+            }
+
+    def flush(self):
+        """Write this process's values to its file in the metrics directory"""
+        if self._file is None or self._pid != os.getpid():
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        snapshot = self.snapshot()
+        snapshot['buckets'] = list(BUCKETS)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(f"{self._file}.tmp", 'w') as f:
+                json.dump(snapshot, f)
+            os.replace(f"{self._file}.tmp", self._file)
+        except OSError as e:
+            self._dirty = True
+            logger.warning(f"Could not write metrics to {self._file}: {str(e)}")
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+    def collect(self):
+        """(histograms, counters) summed over every process; keys are (name, labels)"""
+        self._ensure_process()
+        if self._file is None:
+            snapshots = [self.snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, '*.json')):
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    # a worker replacing its file as we list them
+                    continue
+                if snapshot.get('buckets') == list(BUCKETS):
+                    snapshots.append(snapshot)
+
+        histograms, counters = {}, {}
+        for snapshot in snapshots:
+            for name, labels, values in snapshot['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                total = histograms.setdefault(key, [0] * len(values))
+                for index, value in enumerate(values):
+                    total[index] += value
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                counters[key] = counters.get(key, 0) + value
+        return histograms, counters
+
+    @staticmethod
+    def quantile(q, counts):
+        """Estimate a quantile from bucket counts, interpolating within the bucket that holds it"""
+        total = sum(counts)
+        if not total:
+            return float('nan')
+        target = q * total
+        seen = 0
+        for index, count in enumerate(counts[:-1]):
+            if count and seen + count >= target:
+                lower = BUCKETS[index - 1] if index else 0.0
+                return lower + (BUCKETS[index] - lower) * (target - seen) / count
+            seen += count
+        # beyond the last bound
+        return BUCKETS[-1]
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        histograms, counters = self.collect()
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {value}")
+                continue
+            series = sorted((labels, values) for (metric, labels), values in histograms.items() if metric == name)
+            for labels, values in series:
+                counts, total = values[:-1], values[-1]
+                cumulative = 0
+                position = 0
+                for index in EXPOSED_BUCKETS:
+                    cumulative += sum(counts[position:index + 1])
+                    position = index + 1
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', f'{BUCKETS[index]:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(labels + (('le', '+Inf'),))} {sum(counts)}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{format_labels(labels)} {sum(counts)}")
+            if series:
+                lines.append(f"# HELP {name}_quantile p50 and p99 of {name}, estimated from its buckets")
+                lines.append(f"# TYPE {name}_quantile gauge")
+                for labels, values in series:
+                    for q in QUANTILES:
+                        lines.append(f"{name}_quantile{format_labels(labels + (('quantile', str(q)),))} "
+                                     f"{self.quantile(q, values[:-1])!r}")
+        return '\n'.join(lines) + '\n'
+
+def stage_labels(stage, batch=False):
+    return (('stage', stage), ('batch', 'true')) if batch else (('stage', stage),)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+# this process's request and prediction metrics (see Config.METRICS_*)
+metrics = Metrics(Config.METRICS_DIR, Config.METRICS_FLUSH_INTERVAL, Config.METRICS_ENABLED)
+# records nothing; for work that isn't serving traffic, such as model warm-up
+null_metrics = Metrics(enabled=False)
+
+@api.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Latency histograms and counters of every worker, in the Prometheus text format"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled (METRICS_ENABLED)'}), 404
+    try:
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+    except Exception as e:
+        logger.error(f"Metrics collection failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,220 @@
+import os
+import json
+import shutil
+import logging
+import threading
+import time
+from datetime import datetime
+import joblib
+
+from .forest_engine import file_checksum
+from .model_store import ModelStore, MODEL_SUFFIX
+from .feature_transformer import FeatureTransformer
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = 'manifest.json'
+ACTIVE_FILE = 'ACTIVE'
+
+class ModelRegistry:
+    """Versioned model artifact directories under ``root``.
+
+    Each version is an immutable directory holding the ``*_model.joblib``
+    files, the fitted ``*_features.json`` transformers and a manifest with their checksums, feature lists and training
+    metadata. The ``ACTIVE`` file names the version being served; it is
+    replaced atomically so every worker sees either the old or new name.
+    """
+
+    def __init__(self, root='models/registry'):
+        self.root = root
+
+    def version_path(self, version):
+        return os.path.join(self.root, version)
+
+    def versions(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.exists(os.path.join(self.root, name, MANIFEST_FILE)))
+
+    def active_version(self):
+        try:
+            with open(os.path.join(self.root, ACTIVE_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def active_path(self):
+        version = self.active_version()
+        return self.version_path(version) if version else None
+
+    def pointer_version(self):
+        """Change token for the ACTIVE pointer, checked by workers to pick up swaps"""
+        return ModelStore.artifact_version(os.path.join(self.root, ACTIVE_FILE))
+
+    def read_manifest(self, version):
+        with open(os.path.join(self.version_path(version), MANIFEST_FILE)) as f:
+            return json.load(f)
+
+    def verify(self, version):
+        """Check every artifact in a version against its manifest checksum"""
+        manifest = self.read_manifest(version)
+        entries = list(manifest['models'].items()) + list(manifest.get('transformers', {}).items())
+        for key, entry in entries:
+            path = os.path.join(self.version_path(version), entry['file'])
+            if not os.path.exists(path):
+                raise ValueError(f"Version {version} is missing {entry['file']}")
+            if file_checksum(path) != entry['sha256']:
+                raise ValueError(f"Checksum mismatch for {key} in version {version}")
+        return manifest
+
+    def publish(self, source_dir='models', version=None, metadata=None):
+        """Copy the artifacts in ``source_dir`` into a new version with a manifest"""
+        version = version or datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        target = self.version_path(version)
+        if os.path.exists(target):
+            raise ValueError(f"Version already exists: {version}")
+
+        paths = ModelStore.discover(source_dir)
+        if not paths:
+            raise ValueError(f"No model artifacts found in {source_dir}")
+
+        # build in a temporary directory and rename so a version appears complete or not at all
+        staging = f"{target}.tmp"
+        os.makedirs(staging)
+        models = {}
+        for key, path in paths.items():
+            file_name = f"{key}{MODEL_SUFFIX}"
+            shutil.copy2(path, os.path.join(staging, file_name))
+            model = joblib.load(path)
+            features = getattr(model, 'feature_names_in_', None)
+            models[key] = {
+                'file': file_name,
+                'sha256': file_checksum(path),
+                'type': type(model).__name__,
+                'features': list(features) if features is not None else None
+            }
+
+        # feature scaling fitted with the models (fit_transformers.py)
+        transformers = {}
+        for split_key in sorted({key.rsplit('_', 1)[0] for key in paths}):
+            path = FeatureTransformer.path_for(split_key, source_dir)
+            if os.path.exists(path):
+                file_name = os.path.basename(path)
+                shutil.copy2(path, os.path.join(staging, file_name))
+                transformers[split_key] = {'file': file_name, 'sha256': file_checksum(path)}
+
+        manifest = {
+            'version': version,
+            'created': datetime.utcnow().isoformat(),
+            'source': source_dir,
+            'metadata': metadata or {},
+            'models': models,
+            'transformers': transformers
+        }
+        with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.rename(staging, target)
+        logger.info(f"Published model version {version} ({len(models)} models)")
+        return version
+
+    def activate(self, version):
+        """Point ACTIVE at ``version``"""
+        if version not in self.versions():
+            raise ValueError(f"Unknown model version: {version}")
+        self.verify(version)
+        os.makedirs(self.root, exist_ok=True)
+        pointer = os.path.join(self.root, ACTIVE_FILE)
+        with open(f"{pointer}.tmp", 'w') as f:
+            f.write(version)
+        os.replace(f"{pointer}.tmp", pointer)
+        logger.info(f"Activated model version {version}")
+
+class ModelReloader:
+    """Loads a registry version in the background and hands it to ``on_swap``.
+
+    The new predictor is built, checked and warmed before ``on_swap`` is
+    called, so requests keep using the old predictor until the new one is
+    ready; requests already in flight finish on the object they started with.
+    Version ``None`` (no ACTIVE pointer) loads ``default_path``.
+    """
+
+    def __init__(self, registry, factory, on_swap, warmup=None, check_interval=5, default_path='models'):
+        self.registry = registry
+        self.default_path = default_path
+        self.factory = factory
+        self.on_swap = on_swap
+        self.warmup = warmup
+        self.check_interval = check_interval
+        self.loaded_version = registry.active_version()
+        self.loading_version = None
+        self.last_error = None
+        self._loading = False
+        self._pointer = registry.pointer_version()
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Start a background reload if another worker moved the ACTIVE pointer"""
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+        pointer = self.registry.pointer_version()
+        if pointer == self._pointer:
+            return False
+        version = self.registry.active_version()
+        if version == self.loaded_version:
+            self._pointer = pointer
+            return False
+        # while another load runs the pointer stays unhandled, so a later check retries
+        started = self.reload(version)
+        if started:
+            self._pointer = pointer
+        return started
+
+    def reload(self, version, background=True):
+        """Load ``version`` (None: ``default_path``) and swap it in; returns False if a reload is already running"""
+        with self._lock:
+            if self._loading:
+                return False
+            self._loading = True
+            self.loading_version = version
+        if background:
+            threading.Thread(target=self._load, args=(version,), name='model-reload', daemon=True).start()
+        else:
+            self._load(version)
+        return True
+
+    def _load(self, version):
+        try:
+            start = time.perf_counter()
+            if version is None:
+                path = self.default_path
+            else:
+                self.registry.verify(version)
+                path = self.registry.version_path(version)
+            predictor = self.factory(path)
+            if self.warmup is not None:
+                self.warmup(predictor)
+            self.on_swap(predictor)
+            self.loaded_version = version
+            self.last_error = None
+            label = f"model version {version}" if version else path
+            logger.info(f"Swapped in {label} in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.last_error = str(e)
+            logger.error(f"Model reload of {version or self.default_path} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._loading = False
+                self.loading_version = None
+
+    def status(self):
+        return {
+            'active_version': self.registry.active_version(),
+            'loaded_version': self.loaded_version,
+            'loading_version': self.loading_version,
+            'last_error': self.last_error,
+            'versions': self.registry.versions()
+        }
@@ -0,0 +1,201 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+import joblib
+import numpy as np
+
+from .compiled_models import load_exported_model
+
+logger = logging.getLogger(__name__)
+
+MODEL_SUFFIX = '_model.joblib'
+
+def estimate_model_bytes(obj, _seen=None):
+    """Estimate the in-process array memory held by a model.
+
+    Returns ``(resident_bytes, mmapped_bytes)``; memory-mapped arrays are
+    counted separately because their pages are shared between processes.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0, 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.memmap):
+        return 0, obj.nbytes
+    if isinstance(obj, np.ndarray):
+        if obj.dtype == object:
+            return _sum_sizes((estimate_model_bytes(item, _seen) for item in obj.ravel()))
+        return obj.nbytes, 0
+    if isinstance(obj, dict):
+        return _sum_sizes(estimate_model_bytes(value, _seen) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return _sum_sizes(estimate_model_bytes(item, _seen) for item in obj)
+
+    # sklearn's Cython Tree keeps its arrays behind __getstate__
+    if type(obj).__name__ == 'Tree' and hasattr(obj, '__getstate__'):
+        state = obj.__getstate__()
+        return sum(state[name].nbytes for name in ['nodes', 'values'] if name in state), 0
+    if hasattr(obj, '__dict__'):
+        return estimate_model_bytes(vars(obj), _seen)
+    return 0, 0
+
+def _sum_sizes(sizes):
+    resident, mmapped = 0, 0
+    for r, m in sizes:
+        resident += r
+        mmapped += m
+    return resident, mmapped
+
+class ModelStore:
+    """Lazily loaded, size-capped cache of the joblib artifacts in ``models/``.
+
+    Artifacts are discovered up front but only unpickled on first use, then
+    kept in LRU order; the least recently used model is evicted once
+    ``max_models`` or ``max_bytes`` is exceeded. ``mmap_mode`` is passed to
+    ``joblib.load`` so plain numpy arrays are shared between forked workers;
+    sklearn's trees copy their node arrays when unpickled, so forests only
+    benefit once exported to flat arrays.
+    """
+
+    def __init__(self, base_path='models', mmap_mode=None, max_models=None, max_bytes=None):
+        self.base_path = base_path
+        self.mmap_mode = mmap_mode
+        self.max_models = max_models
+        self.max_bytes = max_bytes
+        self.paths = self.discover(base_path)
+        self._models = OrderedDict()
+        self._sizes = {}
+        self._versions = {key: self.artifact_version(path) for key, path in self.paths.items()}
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def discover(base_path):
+        """Map model keys (e.g. ``math_female_G3``) to artifact paths"""
+        paths = {}
+        for subject in ['math', 'por']:
+            for gender in ['male', 'female']:
+                for period in ['G1', 'G2', 'G3']:
+                    key = f"{subject}_{gender}_{period}"
+                    model_path = os.path.join(base_path, f"{key}{MODEL_SUFFIX}")
+                    if os.path.exists(model_path):
+                        paths[key] = model_path
+        return paths
+
+    @staticmethod
+    def artifact_version(path):
+        """Cheap change token for an artifact file"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def changed_keys(self):
+        """Keys whose artifact file changed on disk since it was discovered or reloaded"""
+        return [key for key, path in self.paths.items()
+                if self.artifact_version(path) != self._versions.get(key)]
+
+    def reload(self, key):
+        """Forget a model so its changed artifact is loaded again on next use"""
+        with self._lock:
+            self.evict(key)
+            self._versions[key] = self.artifact_version(self.paths[key])
+
+    def __contains__(self, key):
+        return key in self.paths
+
+    def __getitem__(self, key):
+        return self.get(key)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def keys(self):
+        return self.paths.keys()
+
+    def loaded_keys(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def get(self, key):
+        """Return a model, loading it on first use"""
+        if key not in self.paths:
+            raise KeyError(key)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            model = self.load_artifact(self.paths[key])
+            resident, mmapped = estimate_model_bytes(model)
+            self._models[key] = model
+            self._sizes[key] = {'resident_bytes': resident, 'mmapped_bytes': mmapped}
+            logger.info(f"Loaded model: {key} ({resident / 1024:.0f} KB resident, {mmapped / 1024:.0f} KB mapped)")
+            self._evict(keep=key)
+            return model
+
+    def load_artifact(self, path):
+        return joblib.load(path, mmap_mode=self.mmap_mode)
+
+    def load_all(self):
+        """Eagerly load every discovered model (subject to the caps)"""
+        for key in self.paths:
+            self.get(key)
+
+    def resident_bytes(self):
+        with self._lock:
+            return sum(size['resident_bytes'] for size in self._sizes.values())
+
+    def memory_usage(self):
+        """Report estimated memory per currently loaded model key"""
+        with self._lock:
+            return {key: dict(self._sizes[key]) for key in self._models}
+
+    def evict(self, key):
+        with self._lock:
+            self._models.pop(key, None)
+            self._sizes.pop(key, None)
+
+    def _evict(self, keep):
+        # drop least recently used models until both caps are satisfied
+        while len(self._models) > 1:
+            over_count = self.max_models is not None and len(self._models) > self.max_models
+            over_bytes = self.max_bytes is not None and self.resident_bytes() > self.max_bytes
+            if not (over_count or over_bytes):
+                break
+            oldest = next(iter(self._models))
+            if oldest == keep:
+                break
+            self.evict(oldest)
+            logger.info(f"Evicted model: {oldest}")
+
+class ExportedModelStore(ModelStore):
+    """ModelStore over the sklearn-free exports in ``<models>/compiled/``.
+
+    Each model is a directory of .npy arrays and a meta.json written by
+    export_models.py, loaded with NumPy only (forest arrays memory-mapped),
+    so serving from it never imports scikit-learn or unpickles anything.
+    """
+
+    @staticmethod
+    def discover(base_path):
+        paths = {}
+        for subject in ['math', 'por']:
+            for gender in ['male', 'female']:
+                for period in ['G1', 'G2', 'G3']:
+                    key = f"{subject}_{gender}_{period}"
+                    export_path = os.path.join(base_path, key)
+                    if os.path.exists(os.path.join(export_path, 'meta.json')):
+                        paths[key] = export_path
+        return paths
+
+    @staticmethod
+    def artifact_version(path):
+        # meta.json is written last by an export
+        return ModelStore.artifact_version(os.path.join(path, 'meta.json'))
+
+    def load_artifact(self, path):
+        return load_exported_model(path, mmap_mode=self.mmap_mode or 'r')
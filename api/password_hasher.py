@@ -0,0 +1,157 @@
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# bcrypt hash (default cost) of a random string nobody knows: unknown emails are checked
+# against it so they take as long to reject as a wrong password
+DUMMY_HASH = b'$2b$12$3xrCzlVamOZMMl.zFeWT1.CCaygPN8EVfPmhmc972JAsCgw.9l3x.'
+
+class PasswordHasherBusy(Exception):
+    """Raised when a password can't be hashed now; ``status_code`` is 429 (too many waiting) or 503"""
+
+    def __init__(self, message, status_code, retry_after=1):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+class PasswordHasher:
+    """bcrypt off the request threads, with bounded concurrency.
+
+    Hashes run in ``processes`` child processes (per worker, started on
+    first use) at ``nice`` lower priority, so a burst of logins takes at
+    most that many cores and yields them to prediction requests. Past
+    ``max_pending`` hashes waiting or running in this process (including
+    ones whose caller timed out), new calls
+    fail fast with a 429 instead of tying up more request threads; a hash
+    that takes longer than ``timeout`` seconds fails with a 503. With
+    ``processes=0`` bcrypt runs on the calling thread, still capped by
+    ``max_pending``. As with any multiprocessing pool, a script run
+    directly must start the app under ``if __name__ == '__main__':``.
+    """
+
+    def __init__(self, processes=1, max_pending=2, timeout=10.0, nice=10):
+        self.processes = processes
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.nice = nice
+        self._pool = None
+        self._pid = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.seconds = 0.0
+
+    def _ensure_pool(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    # a pool inherited through fork belongs to the parent
+                    self._pool = None
+                    self._pid = os.getpid()
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    # forkserver children start from a clean process with bcrypt loaded, not a fork of this threaded worker
+                    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+                    context = multiprocessing.get_context(method)
+                    if method == 'forkserver':
+                        context.set_forkserver_preload(['bcrypt'])
+                    lower_priority = getattr(os, 'nice', None) if self.nice else None
+                    self._pool = ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                                     initializer=lower_priority,
+                                                     initargs=(self.nice,) if lower_priority else ())
+        return self._pool
+
+    def _release(self, future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _replace_pool(self, broken):
+        logger.error("Password hashing pool died; starting a new one")
+        with self._lock:
+            if self._pool is broken:
+                self._pool = None
+        broken.shutdown(wait=False)
+
+    def _run(self, function, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise PasswordHasherBusy("Too many logins in progress, retry shortly", 429)
+            self._pending += 1
+        start = time.perf_counter()
+        if not self.processes:
+            try:
+                result = function(*args)
+            finally:
+                self._release()
+        else:
+            pool = self._ensure_pool()
+            try:
+                future = pool.submit(function, *args)
+            except BrokenProcessPool:
+                self._release()
+                self._replace_pool(pool)
+                raise PasswordHasherBusy("Password hashing is unavailable, retry shortly", 503)
+            # the slot is held until the hash really ends: a running bcrypt call can't be cancelled,
+            # so giving up on it must not let more work into the pool
+            future.add_done_callback(self._release)
+            try:
+                result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                with self._lock:
+                    self.timeouts += 1
+                raise PasswordHasherBusy("Password check timed out, retry shortly", 503, retry_after=5)
+            except BrokenProcessPool:
+                self._replace_pool(pool)
+                raise PasswordHasherBusy("Password hashing is unavailable, retry shortly", 503)
+        with self._lock:
+            self.completed += 1
+            self.seconds += time.perf_counter() - start
+        return result
+
+    def hash(self, password):
+        """bcrypt hash of ``password`` with a new salt"""
+        return self._run(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+
+    def check(self, password, password_hash):
+        """Whether ``password`` matches; a missing hash takes as long and returns False"""
+        matched = self._run(bcrypt.checkpw, password.encode('utf-8'), password_hash or DUMMY_HASH)
+        return bool(matched) and password_hash is not None
+
+    def stats(self):
+        with self._lock:
+            return {
+                'processes': self.processes,
+                'max_pending': self.max_pending,
+                'pending': self._pending,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts,
+                'mean_seconds': self.seconds / self.completed if self.completed else 0.0
+            }
+
+    def close(self):
+        """Stop this process's hashing pool (at worker exit)"""
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+# this process's password hashing (see Config.PASSWORD_HASH_*)
+password_hasher = PasswordHasher(
+    processes=Config.PASSWORD_HASH_PROCESSES,
+    max_pending=Config.PASSWORD_HASH_MAX_PENDING,
+    timeout=Config.PASSWORD_HASH_TIMEOUT,
+    nice=Config.PASSWORD_HASH_NICE
+)
@@ -1,98 +1,770 @@
-from flask import jsonify, request
+from flask import jsonify, request, Response, stream_with_context
+from werkzeug.wsgi import get_input_stream
 from . import api
-import joblib
+import numpy as np
 import pandas as pd
 import os
+import json
+import itertools
+from functools import wraps
+import time
 import logging
 from .data_manager import DataManager 
+from . import data_manager
+from .feature_transformer import FeatureTransformer
+from .batching import MicroBatcher
+from .compiled_models import CompiledLinearModel
+from .model_store import ModelStore, ExportedModelStore
+from .forest_engine import FlatForest, file_checksum
+from .prediction_cache import PredictionCache
+from .metrics import metrics, null_metrics, stage_labels
+from .model_registry import ModelRegistry, ModelReloader
+from .incremental_g3 import ModelVersionActive
+from . import require_admin_token
+from config import Config
 
 logger = logging.getLogger(__name__)
 
 class ModelPredictor:
-    def __init__(self):
-        self.models = {}
+    # Grade bands used to train the G1/G2 forests (classify_grades_edu in
+    # 0.3_Task2ML_train) and the grade each band stands for in the cascade
+    GRADE_BANDS = {
+        0: (0, 5),
+        1: (6, 10),
+        2: (11, 14),
+        3: (15, 17),
+        4: (18, 20)
+    }
+
+    def __init__(self, compiled=None, cascade=None, model_path='models', backend=None):
+        self.model_path = model_path
+        self.compiled_models = {}
+        # 'exported' serves the NumPy exports from export_models.py without sklearn
+        self.backend = backend or Config.MODEL_BACKEND
+        self.compiled = Config.PREDICT_COMPILED_INFERENCE if compiled is None else compiled
+        if self.backend == 'exported':
+            self.compiled = True
+        self.cascade = Config.PREDICT_CASCADE if cascade is None else cascade
         self.load_models()
         
-        # Define base features (excluding G1 and G2)
-        self.base_features = [
-            'school', 'sex', 'age', 'address', 'famsize', 'Pstatus',
-            'Medu', 'Fedu', 'traveltime', 'studytime', 'failures',
-            'schoolsup', 'famsup', 'paid', 'activities', 'nursery',
-            'higher', 'internet', 'romantic', 'famrel', 'freetime',
-            'goout', 'Dalc', 'Walc', 'health', 'absences',
-            'Mjob_at_home', 'Mjob_health', 'Mjob_other', 'Mjob_services',
-            'Mjob_teacher', 'Fjob_at_home', 'Fjob_health', 'Fjob_other',
-            'Fjob_services', 'Fjob_teacher', 'reason_course', 'reason_home',
-            'reason_other', 'reason_reputation', 'guardian_father',
-            'guardian_mother', 'guardian_other', 'Gvg', 'Avgalc', 'Bum'
-        ]
-        
-        # Define the exact feature order for G3 model (base + G1 + G2)
-        self.g3_features = self.base_features + ['G1', 'G2']
+        # Feature order shared with training (G3 models add G1 and G2)
+        self.base_features = FeatureTransformer.FEATURES
+        self.g3_features = FeatureTransformer.G3_FEATURES
+        # fitted feature scaling per subject/gender, loaded on first use, and its file's change token
+        self.transformers = {}
+        self.transformer_versions = {}
+
+        if self.compiled:
+            self.compile_models()
+
+        # Cache of recent results keyed on the processed feature vector
+        self.cache = None
+        if Config.PREDICT_CACHE_SIZE > 0:
+            self.cache = PredictionCache(Config.PREDICT_CACHE_SIZE, Config.PREDICT_CACHE_TTL)
+        self._last_model_check = time.monotonic()
 
     def load_models(self):
-        """Load all models at initialization"""
-        base_path = 'models'
-        for subject in ['math', 'por']:
-            for gender in ['male', 'female']:
-                for period in ['G1', 'G2', 'G3']:
-                    model_path = f"{base_path}/{subject}_{gender}_{period}_model.joblib"
-                    if os.path.exists(model_path):
-                        key = f"{subject}_{gender}_{period}"
-                        self.models[key] = joblib.load(model_path)
-                        logger.info(f"Loaded model: {key}")
+        """Set up the model store; artifacts load on first use unless lazy loading is off"""
+        if self.backend == 'exported':
+            store, base_path = ExportedModelStore, os.path.join(self.model_path, 'compiled')
+        elif self.backend == 'joblib':
+            store, base_path = ModelStore, self.model_path
+        else:
+            raise ValueError(f"Unknown model backend: {self.backend}")
+        self.models = store(
+            base_path=base_path,
+            mmap_mode=Config.MODEL_MMAP_MODE,
+            max_models=Config.MODEL_CACHE_MAX_MODELS,
+            max_bytes=Config.MODEL_CACHE_MAX_BYTES
+        )
+        logger.info(f"Found models in {self.models.base_path}: {', '.join(self.models.keys())}")
+        if self.backend == 'exported' and not len(self.models):
+            logger.warning(f"No exported models in {self.models.base_path}, run export_models.py")
+        if not Config.MODEL_LAZY_LOADING:
+            self.models.load_all()
+
+    def compile_models(self):
+        """Set up the NumPy fast paths: linear G3 coefficients and exported G1/G2 forests"""
+        for key in self.models.keys():
+            self.compile_model(key)
+
+    def compile_model(self, key):
+        if self.backend == 'exported':
+            # exported models are already the NumPy implementations
+            self.compiled_models[key] = self.models[key]
+        elif key.endswith('_G3'):
+            self.compile_linear_model(key)
+        else:
+            self.load_flat_forest(key)
+
+    def compile_linear_model(self, key):
+        """Extract coefficients of a linear G3 model"""
+        try:
+            compiled = CompiledLinearModel.from_estimator(self.models[key], self.g3_features)
+        except (AttributeError, ValueError) as e:
+            logger.warning(f"Could not compile model {key}: {str(e)}")
+            return
+        missing = set(compiled.feature_names) - set(self.g3_features)
+        if missing:
+            logger.warning(f"Could not compile model {key}: unknown features {sorted(missing)}")
+            return
+        self.compiled_models[key] = compiled
+        logger.info(f"Compiled model: {key}")
+
+    def load_flat_forest(self, key):
+        """Use a forest exported by export_models.py if it matches the current artifact"""
+        export_path = os.path.join(self.models.base_path, 'compiled', key)
+        if not os.path.exists(os.path.join(export_path, 'meta.json')):
+            return
+        try:
+            flat = FlatForest.load(export_path, mmap_mode='r')
+            if flat.meta.get('source_sha256') != file_checksum(self.models.paths[key]):
+                logger.warning(f"Exported forest for {key} is stale, re-run export_models.py")
+                return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not load exported forest {key}: {str(e)}")
+            return
+        self.compiled_models[key] = flat
+        logger.info(f"Loaded flat forest: {key}")
+
+    def flat_forest(self, key, n_rows):
+        """Flat forest to score ``n_rows`` rows with, or None to use the sklearn model.
+
+        The flat walk wins on small batches; past PREDICT_FLAT_FOREST_MAX_ROWS
+        sklearn's compiled tree traversal is faster, unless it isn't loaded.
+        """
+        flat = self.compiled_models.get(key)
+        if flat is not None and self.backend == 'joblib' and n_rows > Config.PREDICT_FLAT_FOREST_MAX_ROWS:
+            return None
+        return flat
+
+    def check_for_model_updates(self, force=False):
+        """Reload model artifacts that changed on disk and drop cached predictions"""
+        now = time.monotonic()
+        if not force and now - self._last_model_check < Config.MODEL_CHECK_INTERVAL:
+            return []
+        self._last_model_check = now
+
+        changed = self.models.changed_keys()
+        for key in changed:
+            self.models.reload(key)
+            self.transformers.pop(key.rsplit('_', 1)[0], None)
+            self.compiled_models.pop(key, None)
+            if self.compiled:
+                self.compile_model(key)
+            logger.info(f"Model artifact changed, reloaded: {key}")
+        # a refit (fit_transformers.py) rewrites the JSON without touching the models
+        for split_key, version in list(self.transformer_versions.items()):
+            if split_key in self.transformers and ModelStore.artifact_version(
+                    FeatureTransformer.path_for(split_key, self.model_path)) != version:
+                self.transformers.pop(split_key, None)
+                changed.append(f"{split_key}_features")
+                logger.info(f"Feature transformer changed, reloading: {split_key}")
+        if changed and self.cache is not None:
+            self.cache.clear()
+        return changed
+
+    def transformer_for(self, split_key):
+        """Fitted FeatureTransformer for a subject/gender split such as 'math_female'"""
+        transformer = self.transformers.get(split_key)
+        if transformer is None:
+            if f"{split_key}_G3" not in self.models:
+                # unknown subject/gender: scoring fails on the missing model
+                return FeatureTransformer.default()
+            # token read first, so a rewrite during the load is caught by the next check
+            self.transformer_versions[split_key] = ModelStore.artifact_version(
+                FeatureTransformer.path_for(split_key, self.model_path))
+            transformer = FeatureTransformer.load_for(split_key, self.model_path)
+            self.transformers[split_key] = transformer
+        return transformer
+
+    def get_transformer(self, data):
+        """FeatureTransformer for the models that score ``data``"""
+        return self.transformer_for(self.get_model_key(data).rsplit('_', 1)[0])
+
+    def process_known(self, data):
+        """Processed features of a request's inputs, leaving out the grades it is missing.
+
+        The one row the cache key, the cascade and the G3 row are built
+        from: only Gvg depends on the grades, and ``prepare_g3_row`` sets it.
+        """
+        missing = self.missing_grades(data)
+        known = {k: v for k, v in data.items() if k not in missing}
+        return DataManager.process_prediction_data(known, self.get_transformer(data))
+
+    def prediction_cache_key(self, data, processed_data=None):
+        """Cache key from the model key and the processed features of the known inputs"""
+        if processed_data is None:
+            processed_data = self.process_known(data)
+        return PredictionCache.make_key(self.get_model_key(data), processed_data, self.g3_features,
+                                        self.missing_grades(data))
+
+    def get_model_key(self, data, period='G3'):
+        """Build the model key for a request's subject and gender"""
+        gender = data['gender']
+        subject_key = 'math' if data['subject'] == 'mathematics' else 'por'
+        return f"{subject_key}_{gender}_{period}"
+
+    @staticmethod
+    def missing_grades(data):
+        """List the G1/G2 fields a request left out"""
+        return [period for period in ['G1', 'G2'] if data.get(period) is None or data.get(period) == '']
+
+    @classmethod
+    def band_to_grade(cls, band):
+        """Representative grade (band midpoint) for a predicted grade band"""
+        low, high = cls.GRADE_BANDS[int(band)]
+        return (low + high) / 2.0
+
+    def estimate_grades_batch(self, records, rows=None):
+        """Predict missing G1/G2 for many records with the G1/G2 forest models.
+
+        Rows are grouped so each forest runs once per batch. Returns
+        ``(estimates, errors)``: a list of ``{period: grade}`` dicts aligned
+        with ``records`` and a dict of index -> error message. ``rows``, if
+        given, holds each record's ``process_known`` row or None; the rows
+        processed here are stored in it for ``prepare_g3_row``.
+        """
+        estimates = [{} for _ in records]
+        errors = {}
+        groups = {}
+
+        for index, data in enumerate(records):
+            missing = self.missing_grades(data)
+            if not missing:
+                continue
+            try:
+                row = rows[index] if rows is not None else None
+                if row is None:
+                    row = self.process_known(data)
+                    if rows is not None:
+                        rows[index] = row
+                for period in missing:
+                    model_key = self.get_model_key(data, period)
+                    if model_key not in self.models:
+                        raise ValueError(f"Model not found: {model_key}")
+                    groups.setdefault(model_key, ([], []))
+                    groups[model_key][0].append(index)
+                    groups[model_key][1].append(row)
+            except Exception as e:
+                errors[index] = str(e)
+
+        # One forest call per model key
+        for model_key, (indices, rows) in groups.items():
+            period = model_key.rsplit('_', 1)[1]
+            try:
+                flat = self.flat_forest(model_key, len(rows))
+                if flat is not None:
+                    bands = flat.predict(flat.to_matrix(rows))
+                else:
+                    forest_input = pd.DataFrame(rows)[self.base_features]
+                    bands = self.models[model_key].predict(forest_input)
+                for index, band in zip(indices, bands):
+                    estimates[index][period] = self.band_to_grade(band)
+            except Exception as e:
+                logger.error(f"Grade estimation error for {model_key}: {str(e)}")
+                for index in indices:
+                    errors[index] = str(e)
+
+        return estimates, errors
+
+    def prepare_g3_row(self, data, processed_data=None):
+        """Process request data into a G3 feature row with G1, G2 and Gvg filled in.
+
+        ``processed_data`` is the record's ``process_known`` row, if already built.
+        """
+        transformer = self.get_transformer(data)
+        if processed_data is None:
+            processed_data = DataManager.process_prediction_data(data, transformer)
+        else:
+            processed_data = dict(processed_data)
+
+        # Extract G1 and G2 from input data (guaranteed to be present)
+        g1_value = float(data['G1'])
+        g2_value = float(data['G2'])
+
+        # Update processed data with G1 and G2 values
+        processed_data['G1'] = g1_value
+        processed_data['G2'] = g2_value
+
+        # Update Gvg based on actual G1 and G2 values
+        processed_data['Gvg'] = float(transformer.grade_average(g1_value, g2_value))
+        return processed_data
 
     def predict(self, data):
         """Make G3 prediction using provided G1 and G2 values"""
+        self.check_for_model_updates()
+        # the stage a failure is counted against in prediction_errors_total
+        stage = 'cache'
         try:
+            # Serve repeated inputs from the cache
+            cache_key = None
+            # processed once for the key, the cascade and the G3 row
+            rows = [None]
+            if self.cache is not None:
+                with metrics.stage('cache'):
+                    rows[0] = self.process_known(data)
+                    cache_key = self.prediction_cache_key(data, rows[0])
+                    cached = self.cache.get(cache_key)
+                if cached is not None:
+                    metrics.inc('predictions_total', (('model', self.get_model_key(data)),))
+                    logger.info(f"Cached G3 prediction: {cached['G3']:.2f}")
+                    return dict(cached)
+
+            # Estimate missing G1/G2 with the forest models
+            estimated = {}
+            if self.cascade and self.missing_grades(data):
+                stage = 'cascade'
+                with metrics.stage('cascade'):
+                    estimates, errors = self.estimate_grades_batch([data], rows)
+                if errors:
+                    raise ValueError(errors[0])
+                estimated = estimates[0]
+                data = dict(data, **estimated)
+                logger.info(f"Estimated grades from forest models: {estimated}")
+
             # Process input data
-            processed_data = DataManager.process_prediction_data(data)
-            
-            # Get model parameters
-            gender = data['gender']
-            subject_key = 'math' if data['subject'] == 'mathematics' else 'por'
+            stage = 'features'
+            with metrics.stage('features'):
+                processed_data = self.prepare_g3_row(data, rows[0])
+            logger.info(f"Using G1={processed_data['G1']} and G2={processed_data['G2']}")
             
-            # Extract G1 and G2 from input data (guaranteed to be present)
-            g1_value = float(data['G1'])
-            g2_value = float(data['G2'])
-            logger.info(f"Using provided G1={g1_value} and G2={g2_value}")
-            
-            # Update processed data with G1 and G2 values
-            processed_data['G1'] = g1_value
-            processed_data['G2'] = g2_value
-            
-            # Update Gvg based on actual G1 and G2 values
-            processed_data['Gvg'] = (g1_value + g2_value) / 2.0
-            
-            # Create DataFrame with exact feature order for G3 model
-            g3_input = pd.DataFrame([processed_data])[self.g3_features]
-            
-            # Get G3 model based on subject and gender
-            g3_model_key = f"{subject_key}_{gender}_G3"
-            if g3_model_key not in self.models:
-                raise ValueError(f"Model not found: {g3_model_key}")
+            # Get G3 model based on subject and gender (loading it if it isn't resident)
+            stage = 'lookup'
+            with metrics.stage('lookup'):
+                g3_model_key = self.get_model_key(data)
+                if g3_model_key not in self.models:
+                    raise ValueError(f"Model not found: {g3_model_key}")
+                compiled = self.compiled_models.get(g3_model_key)
+                model = self.models[g3_model_key] if compiled is None else None
                 
-            g3_model = self.models[g3_model_key]
+            # Make G3 prediction, skipping pandas when a compiled model exists
+            stage = 'predict'
+            with metrics.stage('predict'):
+                if compiled is not None:
+                    g3_prediction = compiled.predict_row(processed_data)
+                else:
+                    # Create DataFrame with exact feature order for G3 model
+                    g3_input = pd.DataFrame([processed_data])[self.g3_features]
+                    g3_prediction = float(model.predict(g3_input)[0])
+            metrics.inc('predictions_total', (('model', g3_model_key),))
             
-            # Make G3 prediction
-            g3_prediction = float(g3_model.predict(g3_input)[0])
-            
-            # Return only G3 prediction
+            # Return G3 prediction, plus any grades the cascade estimated
             predictions = {
                 'G3': g3_prediction
             }
+            if estimated:
+                predictions['estimated'] = estimated
+            if cache_key is not None:
+                self.cache.put(cache_key, predictions)
             
             logger.info(f"Final G3 prediction: {g3_prediction:.2f}")
-            return predictions
+            return dict(predictions)
 
         except Exception as e:
+            metrics.inc('prediction_errors_total', (('stage', stage), ('type', type(e).__name__)))
             logger.error(f"Prediction error: {str(e)}")
             raise ValueError(f"Prediction error: {str(e)}")
 
-# Initialize predictor
-predictor = ModelPredictor()
+    def predict_batch(self, records):
+        """Make G3 predictions for many records with one model call per model key.
+
+        Returns a list aligned with ``records``; a record that fails gets
+        ``{'error': ...}`` in its slot instead of failing the whole batch.
+        """
+        self.check_for_model_updates()
+        if self.cache is None:
+            return self.score_batch(records)
+
+        results = [None] * len(records)
+        cache_keys = [None] * len(records)
+        rows = [None] * len(records)
+        with metrics.stage('cache', batch=True):
+            for index, data in enumerate(records):
+                try:
+                    rows[index] = self.process_known(data)
+                    cache_keys[index] = self.prediction_cache_key(data, rows[index])
+                except Exception:
+                    # left for score_batch to report
+                    continue
+                cached = self.cache.get(cache_keys[index])
+                if cached is not None:
+                    results[index] = dict(cached)
+
+        hits = [index for index, result in enumerate(results) if result is not None]
+        for index in hits:
+            metrics.inc('predictions_total', (('model', self.get_model_key(records[index])),))
+
+        pending = [index for index, result in enumerate(results) if result is None]
+        if pending:
+            scored = self.score_batch([records[index] for index in pending], rows=[rows[index] for index in pending])
+            for index, result in zip(pending, scored):
+                results[index] = result
+                if cache_keys[index] is not None and 'error' not in result:
+                    self.cache.put(cache_keys[index], dict(result))
+        return results
+
+    def score_batch(self, records, record_metrics=True, rows=None):
+        """Uncached body of predict_batch.
+
+        Stage timings are recorded once per batch (``batch="true"``);
+        predictions and errors are counted per record, as in ``predict``.
+        ``record_metrics=False`` leaves the metrics untouched (warm-up).
+        ``rows`` holds records' ``process_known`` rows already built, or None.
+        """
+        recorder = metrics if record_metrics else null_metrics
+        results = [None] * len(records)
+        groups = {}
+        rows = list(rows) if rows is not None else [None] * len(records)
+
+        # Estimate missing G1/G2 for the whole batch up front
+        estimates = [{} for _ in records]
+        if self.cascade and any(self.missing_grades(data) for data in records):
+            with recorder.stage('cascade', batch=True):
+                estimates, errors = self.estimate_grades_batch(records, rows)
+            for index, error in errors.items():
+                # predict() raises these as ValueError
+                recorder.inc('prediction_errors_total', (('stage', 'cascade'), ('type', 'ValueError')))
+                results[index] = {'error': f"Prediction error: {error}"}
+
+        # Process every record and group row positions by model key
+        seconds = {'lookup': 0.0, 'features': 0.0}
+        for index, data in enumerate(records):
+            if results[index] is not None:
+                continue
+            if estimates[index]:
+                data = dict(data, **estimates[index])
+            stage = 'lookup'
+            start = time.perf_counter()
+            try:
+                model_key = self.get_model_key(data)
+                if model_key not in self.models:
+                    raise ValueError(f"Model not found: {model_key}")
+                stage = 'features'
+                middle = time.perf_counter()
+                seconds['lookup'] += middle - start
+                row = self.prepare_g3_row(data, rows[index])
+                seconds['features'] += time.perf_counter() - middle
+                groups.setdefault(model_key, ([], []))
+                groups[model_key][0].append(index)
+                groups[model_key][1].append(row)
+            except Exception as e:
+                recorder.inc('prediction_errors_total', (('stage', stage), ('type', type(e).__name__)))
+                results[index] = {'error': f"Prediction error: {str(e)}"}
+        for stage, elapsed in seconds.items():
+            recorder.observe('prediction_stage_seconds', elapsed, stage_labels(stage, batch=True))
+
+        # One vectorized predict call per model key
+        for model_key, (indices, rows) in groups.items():
+            try:
+                with recorder.stage('predict', batch=True):
+                    if model_key in self.compiled_models:
+                        g3_predictions = self.compiled_models[model_key].predict_rows(rows)
+                    else:
+                        g3_input = pd.DataFrame(rows)[self.g3_features]
+                        g3_predictions = self.models[model_key].predict(g3_input)
+                for index, g3_prediction in zip(indices, g3_predictions):
+                    results[index] = {'G3': float(g3_prediction)}
+                    if estimates[index]:
+                        results[index]['estimated'] = estimates[index]
+                recorder.inc('predictions_total', (('model', model_key),), amount=len(indices))
+            except Exception as e:
+                logger.error(f"Batch prediction error for {model_key}: {str(e)}")
+                recorder.inc('prediction_errors_total', (('stage', 'predict'), ('type', type(e).__name__)),
+                            amount=len(indices))
+                for index in indices:
+                    results[index] = {'error': f"Prediction error: {str(e)}"}
+
+        logger.info(f"Batch prediction: {len(records)} records across {len(groups)} models")
+        return results
+
+    def score_frame(self, frame, normalized=False):
+        """Vectorized score_batch over a DataFrame of request-shaped rows.
+
+        Each subject/gender group is processed with its FeatureTransformer
+        and each model runs once per group. Returns a DataFrame
+        aligned with ``frame`` holding ``G3``, the cascade estimates
+        ``G1_estimated``/``G2_estimated`` (NaN where the grade was given) and
+        ``error`` (None for rows that scored).
+        """
+        grades = {}
+        for period in ['G1', 'G2']:
+            if period in frame.columns:
+                grades[period] = frame[period].replace('', np.nan)
+            else:
+                grades[period] = pd.Series(np.nan, index=frame.index)
+        missing = {period: grades[period].isna() for period in grades}
+        if not self.cascade:
+            # same default as apply_grade_defaults
+            grades = {period: values.fillna(0.0) for period, values in grades.items()}
+            missing = {period: pd.Series(False, index=frame.index) for period in grades}
+        frame = frame.assign(**grades)
+
+        results = pd.DataFrame({'G3': np.nan, 'G1_estimated': np.nan, 'G2_estimated': np.nan},
+                               index=frame.index)
+        results['error'] = None
+        missing = pd.DataFrame(missing)
+
+        def process(rows, transformer):
+            """Features for ``rows``, reporting and dropping rows with unparseable values"""
+            processed = DataManager.process_prediction_frame(frame.loc[rows], normalized, transformer)
+            # missing grades are filled in below
+            known = processed[self.base_features].join(
+                processed[['G1', 'G2']].mask(missing.loc[rows], 0.0))
+            invalid = known.isna().any(axis=1)
+            for index, field in known[invalid].isna().idxmax(axis=1).items():
+                results.at[index, 'error'] = f"Prediction error: invalid value for {field}"
+            return processed, rows[~invalid.to_numpy()]
+
+        if 'subject' not in frame.columns or 'gender' not in frame.columns:
+            _, rows = process(frame.index, None)
+            results.loc[rows, 'error'] = "Prediction error: subject and gender are required"
+            return results
+        unassigned = frame['subject'].isna() | frame['gender'].isna()
+        if unassigned.any():
+            _, rows = process(frame.index[unassigned.to_numpy()], None)
+            results.loc[rows, 'error'] = "Prediction error: subject and gender are required"
+        assigned = frame[~unassigned]
+        subject_keys = assigned['subject'].map(lambda subject: 'math' if subject == 'mathematics' else 'por')
+        for (subject_key, gender), group in assigned.groupby([subject_keys, assigned['gender']]).groups.items():
+            # Each subject/gender is scaled as its training split was
+            transformer = self.transformer_for(f"{subject_key}_{gender}")
+            processed, group = process(group, transformer)
+
+            # Estimate missing G1/G2 with the forests, one call per model key
+            failed = pd.Series(False, index=group)
+            for period in ['G1', 'G2']:
+                rows = group[missing[period].loc[group].to_numpy()]
+                if len(rows) == 0:
+                    continue
+                model_key = f"{subject_key}_{gender}_{period}"
+                try:
+                    if model_key not in self.models:
+                        raise ValueError(f"Model not found: {model_key}")
+                    flat = self.flat_forest(model_key, len(rows))
+                    if flat is not None:
+                        bands = flat.predict(processed.loc[rows, flat.feature_names].to_numpy(dtype=np.float32))
+                    else:
+                        bands = self.models[model_key].predict(processed.loc[rows, self.base_features])
+                    estimated = [self.band_to_grade(band) for band in bands]
+                    results.loc[rows, f'{period}_estimated'] = estimated
+                    processed.loc[rows, period] = estimated
+                except Exception as e:
+                    logger.error(f"Grade estimation error for {model_key}: {str(e)}")
+                    results.loc[rows, 'error'] = f"Prediction error: {str(e)}"
+                    failed.loc[rows] = True
+
+            # One G3 call for the rest of the group
+            rows = group[~failed.to_numpy()]
+            if len(rows) == 0:
+                continue
+            model_key = f"{subject_key}_{gender}_G3"
+            try:
+                if model_key not in self.models:
+                    raise ValueError(f"Model not found: {model_key}")
+                g3_input = processed.loc[rows, self.g3_features].astype(np.float64)
+                g3_input['Gvg'] = transformer.grade_average(g3_input['G1'], g3_input['G2'])
+                if model_key in self.compiled_models:
+                    compiled = self.compiled_models[model_key]
+                    X = np.asfortranarray(g3_input[compiled.feature_names].to_numpy())
+                    results.loc[rows, 'G3'] = compiled.predict_matrix(X)
+                else:
+                    results.loc[rows, 'G3'] = self.models[model_key].predict(g3_input)
+            except Exception as e:
+                logger.error(f"Frame prediction error for {model_key}: {str(e)}")
+                results.loc[rows, 'error'] = f"Prediction error: {str(e)}"
+
+        return results
+
+def warm_up_predictor(new_predictor):
+    """Score sample rows for every model key so models load before serving traffic"""
+    sample = {
+        'age': 16, 'studytime': 2, 'failures': 0, 'absences': 4, 'Medu': 2, 'Fedu': 2,
+        'traveltime': 1, 'famrel': 4, 'freetime': 3, 'goout': 3, 'Dalc': 1, 'Walc': 1,
+        'health': 3, 'Mjob': 'other', 'Fjob': 'other', 'reason': 'course', 'guardian': 'mother'
+    }
+    records = []
+    for subject in ['mathematics', 'portuguese']:
+        for gender in ['male', 'female']:
+            records.append(dict(sample, subject=subject, gender=gender, G1=12.0, G2=12.0))
+            if new_predictor.cascade:
+                records.append(dict(sample, subject=subject, gender=gender))
+    results = new_predictor.score_batch(records, record_metrics=False)
+    errors = [result['error'] for result in results if 'error' in result]
+    if errors:
+        raise ValueError(f"Warm-up failed: {errors[0]}")
+
+# Serving state, set up by init_predictor() at startup (in the background for
+# the development server, before forking under gunicorn)
+registry = ModelRegistry(Config.MODEL_REGISTRY_PATH)
+predictor = None
+batcher = None
+reloader = None
+
+def init_predictor():
+    """Build and warm the predictor from the active registry version, or models/ if none is published"""
+    global predictor, batcher, reloader
+    new_predictor = ModelPredictor(model_path=registry.active_path() or 'models')
+    warm_up_predictor(new_predictor)
+
+    # Optional dynamic batching of concurrent single-record requests
+    if Config.PREDICT_MICRO_BATCHING:
+        batcher = MicroBatcher(
+            new_predictor,
+            max_batch_size=Config.PREDICT_MICRO_BATCH_SIZE,
+            max_wait_ms=Config.PREDICT_MICRO_BATCH_WAIT_MS
+        )
+    reloader = ModelReloader(
+        registry,
+        factory=lambda path: ModelPredictor(model_path=path),
+        on_swap=swap_predictor,
+        warmup=warm_up_predictor,
+        check_interval=Config.MODEL_CHECK_INTERVAL
+    )
+    # published last so requests never see a half set up predictor
+    predictor = new_predictor
+    return predictor
+
+def swap_predictor(new_predictor):
+    """Atomically replace the serving predictor; in-flight requests keep the old one"""
+    global predictor
+    predictor = new_predictor
+    if batcher is not None:
+        batcher.predictor = new_predictor
+
+def require_predictor(f):
+    """Answer 503 until init_predictor() has finished"""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if predictor is None:
+            return jsonify({'error': 'Models are still loading, retry shortly'}), 503
+        return f(*args, **kwargs)
+    return decorated
+
+def apply_grade_defaults(data):
+    """Coerce G1/G2 to float; missing grades are left for the cascade or default to 0.0"""
+    for period in ['G1', 'G2']:
+        if period not in data or data[period] == '':
+            if predictor.cascade:
+                data.pop(period, None)
+                logger.info(f"{period} not provided, estimating with forest model")
+            else:
+                # Check for G1 and G2, set default values if not provided
+                data[period] = 0.0
+                logger.info(f"{period} not provided, using default value")
+    
+    # Ensure G1 and G2 are float values
+    try:
+        for period in ['G1', 'G2']:
+            if period in data:
+                data[period] = float(data[period])
+    except (ValueError, TypeError):
+        raise ValueError('G1 and G2 must be valid numbers')
+    return data
+
+def score_records(records):
+    """Validate and score records, returning one result or ``{'error': ...}`` per record"""
+    # Validate grades per record so one bad row doesn't fail the batch
+    predictions = [None] * len(records)
+    valid_indices = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            predictions[index] = {'error': 'Record must be a JSON object'}
+            continue
+        try:
+            apply_grade_defaults(record)
+            valid_indices.append(index)
+        except ValueError as e:
+            predictions[index] = {'error': str(e)}
+
+    results = predictor.predict_batch([records[i] for i in valid_indices])
+    for index, result in zip(valid_indices, results):
+        predictions[index] = result
+    return predictions
+
+def iter_lines(stream, block_size=64 * 1024):
+    """Yield the lines of a byte stream without reading it all into memory"""
+    pending = b''
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        *lines, pending = (pending + block).split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+def score_stream_chunk(chunk):
+    """Score (line number, raw line) pairs and render them as NDJSON"""
+    records = [None] * len(chunk)
+    errors = {}
+    for index, (line_number, line) in enumerate(chunk):
+        try:
+            records[index] = json.loads(line)
+        except ValueError as e:
+            errors[index] = f'Invalid JSON: {str(e)}'
+
+    parsed = [index for index in range(len(chunk)) if index not in errors]
+    results = dict(zip(parsed, score_records([records[index] for index in parsed])))
+
+    output = []
+    for index, (line_number, line) in enumerate(chunk):
+        result = results.get(index) or {'error': errors[index]}
+        if 'error' in result:
+            output.append({'line': line_number, 'error': result['error']})
+        else:
+            output.append({'line': line_number, 'predictions': result})
+    return ''.join(json.dumps(item) + '\n' for item in output)
+
+def stream_predictions(stream, chunk_size):
+    """Read NDJSON records from ``stream`` and yield scored NDJSON one chunk at a time"""
+    chunk = []
+    total = 0
+    try:
+        for line_number, line in enumerate(iter_lines(stream), 1):
+            if not line.strip():
+                continue
+            chunk.append((line_number, line))
+            if len(chunk) >= chunk_size:
+                total += len(chunk)
+                yield score_stream_chunk(chunk)
+                chunk = []
+        if chunk:
+            total += len(chunk)
+            yield score_stream_chunk(chunk)
+        logger.info(f"Streamed predictions for {total} records")
+    except Exception as e:
+        # the status line has already been sent, so report the failure in-band
+        logger.error(f"Prediction stream failed after {total} records: {str(e)}")
+        yield json.dumps({'error': str(e)}) + '\n'
+
+def sweep_values(field, points=None):
+    """Grid values for a swept field: its numeric range or its one-hot options"""
+    if field in DataManager.NUMERIC_RANGES:
+        min_val, max_val = DataManager.NUMERIC_RANGES[field]
+        if points:
+            return np.linspace(min_val, max_val, points).tolist()
+        return list(range(min_val, max_val + 1))
+    if field in DataManager.ONE_HOT_FIELDS:
+        return list(DataManager.ONE_HOT_FIELDS[field])
+    raise ValueError(f"Cannot sweep {field}: expected one of the numeric or one-hot fields")
+
+def build_sweep_grid(record, fields, points=None, values=None):
+    """Repeat ``record`` over every combination of the swept field values.
+
+    Returns the grid values per field and one record per grid point, first
+    field varying slowest.
+    """
+    values = values or {}
+    axes = [list(values.get(field) or sweep_values(field, points)) for field in fields]
+    size = int(np.prod([len(axis) for axis in axes]))
+    if size > Config.PREDICT_SWEEP_MAX_POINTS:
+        raise ValueError(f"Sweep has {size} points, the limit is {Config.PREDICT_SWEEP_MAX_POINTS}")
+    grid = [dict(record, **dict(zip(fields, point))) for point in itertools.product(*axes)]
+    return axes, grid
 
 @api.route('/predict', methods=['POST'])
+@require_predictor
 def predict():
     """Endpoint for grade prediction"""
     if not request.is_json:
@@ -100,26 +772,148 @@ def predict():
 
     try:
         data = request.get_json()
-        logger.info(f"Prediction request data: {data}")
-        
-        # Check for G1 and G2, set default values if not provided
-        if 'G1' not in data or data['G1'] == '':
-            data['G1'] = 0.0
-            logger.info("G1 not provided, using default value")
-        
-        if 'G2' not in data or data['G2'] == '':
-            data['G2'] = 0.0
-            logger.info("G2 not provided, using default value")
+        logger.debug("Prediction request data: %s", data)
+        reloader.check()
         
-        # Ensure G1 and G2 are float values
         try:
-            data['G1'] = float(data['G1'])
-            data['G2'] = float(data['G2'])
-        except (ValueError, TypeError):
-            return jsonify({'error': 'G1 and G2 must be valid numbers'}), 400
+            apply_grade_defaults(data)
+        except ValueError as e:
+            metrics.inc('prediction_errors_total', (('stage', 'input'), ('type', type(e).__name__)))
+            return jsonify({'error': str(e)}), 400
             
-        predictions = predictor.predict(data)
-        return jsonify({'predictions': predictions})
+        if batcher is not None:
+            predictions = batcher.predict(data)
+        else:
+            predictions = predictor.predict(data)
+        with metrics.stage('serialize'):
+            response = jsonify({'predictions': predictions})
+        return response
     except Exception as e:
         logger.error(f"Prediction failed: {str(e)}")
-        return jsonify({'error': str(e)}), 400
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/predict/batch', methods=['POST'])
+@require_predictor
+def predict_batch():
+    """Endpoint for scoring many records in one request"""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+
+    try:
+        data = request.get_json()
+        records = data.get('records') if isinstance(data, dict) else data
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'records must be a non-empty list'}), 400
+        if len(records) > Config.PREDICT_BATCH_MAX_RECORDS:
+            return jsonify({'error': f'Batch exceeds {Config.PREDICT_BATCH_MAX_RECORDS} records'}), 413
+        logger.info(f"Batch prediction request: {len(records)} records")
+        reloader.check()
+        return jsonify({'predictions': score_records(records)})
+    except Exception as e:
+        logger.error(f"Batch prediction failed: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/predict/stream', methods=['POST'])
+@require_predictor
+def predict_stream():
+    """Endpoint for scoring newline-delimited JSON records as they are uploaded"""
+    if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        return jsonify({'error': 'Content-Type must be application/x-ndjson'}), 400
+
+    reloader.check()
+    # read the raw body ourselves: MAX_CONTENT_LENGTH is sized for form posts, not bulk uploads
+    stream = get_input_stream(request.environ, max_content_length=Config.PREDICT_STREAM_MAX_BYTES)
+    results = stream_predictions(stream, Config.PREDICT_STREAM_CHUNK_SIZE)
+    return Response(stream_with_context(results), mimetype='application/x-ndjson')
+
+@api.route('/predict/sweep', methods=['POST'])
+@require_predictor
+def predict_sweep():
+    """Endpoint for the G3 curve (one field) or surface (two fields) around a base record"""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+
+    try:
+        data = request.get_json()
+        record = data.get('record')
+        fields = data.get('fields')
+        if not isinstance(record, dict):
+            return jsonify({'error': 'record must be a JSON object'}), 400
+        if not isinstance(fields, list) or not 1 <= len(fields) <= 2 or len(set(fields)) != len(fields):
+            return jsonify({'error': 'fields must list one or two different fields'}), 400
+        reloader.check()
+        apply_grade_defaults(record)
+
+        axes, grid = build_sweep_grid(record, fields, data.get('points'), data.get('values'))
+        # uncached: the grid shares one model key, so this is one G3 model call
+        predictor.check_for_model_updates()
+        results = predictor.score_batch(grid)
+        for result in results:
+            if 'error' in result:
+                return jsonify({'error': result['error']}), 400
+
+        shape = [len(axis) for axis in axes]
+        sweep = {
+            'fields': fields,
+            'values': axes,
+            'G3': np.array([result['G3'] for result in results]).reshape(shape).tolist()
+        }
+        estimated = {period: np.array([result['estimated'][period] for result in results]).reshape(shape).tolist()
+                     for period in ['G1', 'G2'] if period in results[0].get('estimated', {})}
+        if estimated:
+            sweep['estimated'] = estimated
+        logger.info(f"Sweep over {fields}: {len(grid)} points")
+        return jsonify({'sweep': sweep})
+    except Exception as e:
+        logger.error(f"Sweep failed: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@api.route('/predict/cache', methods=['GET'])
+@require_predictor
+def prediction_cache_stats():
+    """Hit, miss and eviction counters for the prediction cache"""
+    if predictor.cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(predictor.cache.stats(), enabled=True))
+
+@api.route('/models', methods=['GET'])
+@require_admin_token
+@require_predictor
+def model_versions():
+    """Registry versions and which one this worker is serving"""
+    return jsonify(reloader.status())
+
+@api.route('/models/activate', methods=['POST'])
+@require_admin_token
+@require_predictor
+def activate_model_version():
+    """Activate a registry version and hot-swap it in the background"""
+    if not request.is_json:
+        return jsonify({'error': 'Content-Type must be application/json'}), 400
+    version = request.get_json().get('version')
+    try:
+        registry.activate(version)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    started = reloader.reload(version)
+    return jsonify({'message': 'Reload started' if started else 'Reload already in progress',
+                    'version': version}), 202
+
+@api.route('/models/g3-update', methods=['POST'])
+@require_admin_token
+@require_predictor
+def update_g3_models():
+    """Re-solve the incrementally trained G3 models now and reload them in this worker"""
+    trainer = data_manager.g3_trainer
+    if trainer is None:
+        return jsonify({'error': 'Incremental G3 training is disabled (G3_INCREMENTAL)'}), 400
+    try:
+        force = bool((request.get_json(silent=True) or {}).get('force', False))
+        report = trainer.update(force=force)
+    except ModelVersionActive as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        logger.error(f"Incremental G3 update failed: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    reloaded = predictor.check_for_model_updates(force=True)
+    return jsonify({'models': report, 'reloaded': reloaded, 'trainer': trainer.status()})
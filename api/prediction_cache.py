@@ -0,0 +1,77 @@
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+class PredictionCache:
+    """Bounded LRU cache of prediction results with an optional TTL.
+
+    Keys are built by ``make_key`` from the model key and a hash of the
+    processed feature vector, so raw inputs that normalize to the same
+    features share one entry.
+    """
+
+    def __init__(self, max_entries=10000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(model_key, processed_data, feature_names, extra=()):
+        """Canonical key for a processed feature dict"""
+        # + 0.0 folds -0.0 into 0.0 so equal values hash the same
+        vector = np.array([processed_data[name] for name in feature_names], dtype=np.float64) + 0.0
+        digest = hashlib.blake2b(vector.tobytes(), digest_size=16).digest()
+        return (model_key, tuple(extra), digest)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires = entry
+            if expires is not None and expires < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations
+            }
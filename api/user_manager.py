@@ -2,7 +2,10 @@ from flask import session
 from datetime import datetime, timedelta
 from models import User, db
 from .data_manager import DataManager
-import bcrypt
+from .password_hasher import password_hasher
+import logging
+
+logger = logging.getLogger(__name__)
 
 # user authentication and session management
 
@@ -12,16 +15,17 @@ class UserManager:
 
     @staticmethod
     def authenticate(email, password):
-        print(f"Authentication attempt for email: {email}")
+        logger.debug("Authentication attempt for email: %s", email)
         email = DataManager.sanitize_email(email)
         user = User.query.filter_by(email=email).first()
-        print(f"User found: {user}")
+        logger.debug("User found: %s", user)
         
-        if user and bcrypt.checkpw(password.encode('utf-8'), user.password_hash):
-            print("Password check passed")
+        # unknown emails are checked against a dummy hash, so they take as long as a wrong password
+        if password_hasher.check(password, user.password_hash if user else None) and user:
+            logger.debug("Password check passed")
             return user
 
-        print("Authentication failed")
+        logger.debug("Authentication failed")
         return None
 
     @staticmethod
@@ -35,8 +39,7 @@ class UserManager:
             raise ValueError("Developer tag already taken")
         
         user = User(email=email, developer_tag=developer_tag)
-        salt = bcrypt.gensalt()
-        user.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
+        user.password_hash = password_hasher.hash(password)
         db.session.add(user)
         return user
 
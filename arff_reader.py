@@ -0,0 +1,302 @@
+import os
+import re
+import json
+import hashlib
+import argparse
+import numpy as np
+import pandas as pd
+
+from row_hash import row_hashes
+
+# Typed, streaming reader for the ARFF exports in data/ (mat.arff, por.arff and dataset.csv)
+# run from the repo root: python arff_reader.py data/mat.arff data/por.arff data/dataset.csv
+#
+# The header's @attribute lines give the column names and types. The @data section is
+# parsed in chunks straight into one array per column: numeric attributes as int64/float64,
+# string and nominal attributes as small integer codes into a per-column domain. Parsed
+# files are cached as .npz next to a record of the source's size, mtime and sha256, so
+# a file is only parsed again when its contents change.
+
+FORMAT_VERSION = 1
+NUMERIC_TYPES = {'numeric', 'real', 'integer'}
+MISSING = '?'
+
+ATTRIBUTE = re.compile(r"""@attribute\s+('[^']*'|"[^"]*"|\S+)\s+(.+)$""", re.IGNORECASE)
+
+def unquote(value):
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+        return value[1:-1]
+    return value
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class ArffTable:
+    """Columns of a parsed ARFF file.
+
+    ``data`` maps each column to a NumPy array; categorical columns hold
+    codes into ``domains[column]`` (-1 for a missing value).
+    """
+
+    def __init__(self, relation, attributes, data, domains):
+        self.relation = relation
+        # [{'name', 'type'}], type 'numeric', 'integer', 'real', 'string' or 'nominal'
+        self.attributes = attributes
+        self.columns = [attribute['name'] for attribute in attributes]
+        self.data = data
+        self.domains = domains
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def is_categorical(self, column):
+        return column in self.domains
+
+    def decode(self, column):
+        """Values of a column as the file spelled them (object array, None for missing)"""
+        values = self.data[column]
+        if not self.is_categorical(column):
+            return values
+        labels = np.array(self.domains[column] + [None], dtype=object)
+        # code -1 picks the trailing None
+        return labels[values]
+
+    def to_frame(self, categorical=False):
+        """DataFrame of the table: decoded strings, or pandas Categoricals with ``categorical``"""
+        frame = {}
+        for column in self.columns:
+            if self.is_categorical(column) and categorical:
+                frame[column] = pd.Categorical.from_codes(self.data[column], self.domains[column])
+            else:
+                frame[column] = self.decode(column)
+        return pd.DataFrame(frame)
+
+    def row_hashes(self, columns=None):
+        """16-byte digest of each row's values over ``columns`` (comparable across files)"""
+        columns = columns or self.columns
+        matrix = np.empty((len(self), len(columns)), dtype=np.float64)
+        for index, column in enumerate(columns):
+            if self.is_categorical(column):
+                # per-file codes differ, so hash the labels through a stable code per label
+                labels = [int.from_bytes(hashlib.blake2b(str(label).encode('utf-8'), digest_size=6).digest(), 'big')
+                          for label in self.domains[column]]
+                matrix[:, index] = np.array(labels + [-1], dtype=np.float64)[self.data[column]]
+            else:
+                matrix[:, index] = self.data[column]
+        return row_hashes(matrix)
+
+    def select(self, mask):
+        return ArffTable(self.relation, self.attributes,
+                         {column: values[mask] for column, values in self.data.items()}, self.domains)
+
+class _Column:
+    """Accumulates one column while the @data section streams in"""
+
+    def __init__(self, attribute):
+        self.attribute = attribute
+        self.categorical = attribute['type'] not in NUMERIC_TYPES
+        self.fixed = attribute['type'] == 'nominal'
+        self.domain = list(attribute.get('domain', []))
+        self.index = {label: code for code, label in enumerate(self.domain)}
+        self.chunks = []
+
+    def add(self, values):
+        if not self.categorical:
+            self.chunks.append(pd.to_numeric(values, errors='raise').to_numpy())
+            return
+        codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        lookup = np.empty(len(uniques) + 1, dtype=np.int32)
+        lookup[-1] = -1
+        for position, label in enumerate(uniques):
+            label = str(label)
+            code = self.index.get(label)
+            if code is None:
+                if self.fixed:
+                    raise ValueError(f"{label!r} is not a value of nominal attribute {self.attribute['name']}")
+                code = self.index[label] = len(self.domain)
+                self.domain.append(label)
+            lookup[position] = code
+        self.chunks.append(lookup[codes])
+
+    def finish(self):
+        if not self.chunks:
+            values = np.empty(0, dtype=np.int8 if self.categorical else np.float64)
+        else:
+            values = np.concatenate(self.chunks)
+        if self.categorical:
+            # the smallest integer type that holds every code
+            values = values.astype(np.min_scalar_type(-max(len(self.domain), 1)))
+        return values
+
+def read_header(f):
+    """Relation and attributes from the lines before @data; leaves ``f`` at the first data line"""
+    relation, attributes = None, []
+    for line in iter(f.readline, ''):
+        stripped = line.strip()
+        if not stripped or stripped.startswith('%'):
+            continue
+        keyword = stripped.split(None, 1)[0].lower()
+        if keyword == '@relation':
+            relation = unquote(stripped.split(None, 1)[1]) if ' ' in stripped else ''
+        elif keyword == '@attribute':
+            match = ATTRIBUTE.match(stripped)
+            if match is None:
+                raise ValueError(f"Unreadable attribute declaration: {stripped}")
+            name, kind = unquote(match.group(1)), match.group(2).strip()
+            if kind.startswith('{'):
+                domain = [unquote(label) for label in kind.strip('{}').split(',')]
+                attributes.append({'name': name, 'type': 'nominal', 'domain': domain})
+            else:
+                attributes.append({'name': name, 'type': kind.split()[0].lower()})
+        elif keyword == '@data':
+            return relation, attributes
+        else:
+            raise ValueError(f"Unexpected line in ARFF header: {stripped}")
+    raise ValueError("No @data section")
+
+def parse_arff(path, chunk_size=100000):
+    """Parse an ARFF file into an ``ArffTable``, ``chunk_size`` data rows at a time"""
+    with open(path, encoding='utf-8') as f:
+        relation, attributes = read_header(f)
+        if not attributes:
+            raise ValueError(f"{path} declares no attributes")
+        columns = [_Column(attribute) for attribute in attributes]
+        names = [attribute['name'] for attribute in attributes]
+        reader = pd.read_csv(
+            f, header=None, names=names, index_col=False, quotechar="'", skipinitialspace=True, comment='%',
+            na_values=[MISSING], keep_default_na=False, chunksize=chunk_size,
+            dtype={column.attribute['name']: str for column in columns if column.categorical}
+        )
+        for chunk in reader:
+            for column in columns:
+                column.add(chunk[column.attribute['name']])
+    data = {column.attribute['name']: column.finish() for column in columns}
+    domains = {column.attribute['name']: column.domain for column in columns if column.categorical}
+    for attribute in attributes:
+        attribute.pop('domain', None)
+    return ArffTable(relation, attributes, data, domains)
+
+class ArffCache:
+    """Parsed ARFF tables stored as ``<cache_dir>/<name>-<path hash>.npz``.
+
+    An entry is used while the source keeps the size and mtime it had when
+    parsed; if those changed but the sha256 did not (a touch or a copy),
+    the entry is still used and its record updated.
+    """
+
+    def __init__(self, cache_dir='.arff_cache'):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, path):
+        key = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{os.path.basename(path)}-{key}.npz")
+
+    @staticmethod
+    def stat_of(path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def load(self, path):
+        """Cached table for ``path``, or None if there is no valid entry"""
+        entry = self.entry_path(path)
+        if not os.path.exists(entry):
+            return None
+        with np.load(entry, allow_pickle=False) as stored:
+            meta = json.loads(str(stored['meta']))
+            if meta.get('format_version') != FORMAT_VERSION:
+                return None
+            if meta['stat'] != self.stat_of(path):
+                if meta['sha256'] != file_digest(path):
+                    return None
+                meta['stat'] = self.stat_of(path)
+                refresh = True
+            else:
+                refresh = False
+            data = {column: stored[f"column_{index}"] for index, column in enumerate(meta['columns'])}
+        table = ArffTable(meta['relation'], meta['attributes'], data, meta['domains'])
+        if refresh:
+            self.save(path, table, meta['sha256'])
+        return table
+
+    def save(self, path, table, sha256=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        meta = {
+            'format_version': FORMAT_VERSION,
+            'source': os.path.abspath(path),
+            'stat': self.stat_of(path),
+            'sha256': sha256 or file_digest(path),
+            'relation': table.relation,
+            'attributes': table.attributes,
+            'columns': table.columns,
+            'domains': table.domains,
+        }
+        entry = self.entry_path(path)
+        arrays = {f"column_{index}": table.data[column] for index, column in enumerate(table.columns)}
+        with open(f"{entry}.tmp", 'wb') as f:
+            np.savez(f, meta=json.dumps(meta), **arrays)
+        os.replace(f"{entry}.tmp", entry)
+
+    def read(self, path, chunk_size=100000):
+        table = self.load(path)
+        if table is not None:
+            self.hits += 1
+            return table
+        self.misses += 1
+        table = parse_arff(path, chunk_size)
+        self.save(path, table)
+        return table
+
+def read_arff(path, cache_dir='.arff_cache', chunk_size=100000):
+    """Parsed table for an ARFF file, through the binary cache unless ``cache_dir`` is None"""
+    if cache_dir is None:
+        return parse_arff(path, chunk_size)
+    return ArffCache(cache_dir).read(path, chunk_size)
+
+def deduplicate(tables, columns=None):
+    """Keep-masks that drop rows already seen in this or an earlier table.
+
+    Rows are compared on ``columns``, by default the columns every table
+    has (dataset.csv has no G1/G2), so the same student exported twice is
+    kept once.
+    """
+    if columns is None:
+        columns = [column for column in tables[0].columns if all(column in table.columns for table in tables)]
+    seen = set()
+    masks = []
+    for table in tables:
+        keep = np.zeros(len(table), dtype=bool)
+        for index, digest in enumerate(table.row_hashes(columns)):
+            key = digest.tobytes()
+            if key not in seen:
+                seen.add(key)
+                keep[index] = True
+        masks.append(keep)
+    return masks
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse ARFF files into the binary cache and report duplicates across them")
+    parser.add_argument('paths', nargs='+')
+    parser.add_argument('--cache-dir', default='.arff_cache')
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    args = parser.parse_args()
+
+    cache = ArffCache(args.cache_dir)
+    tables = [cache.read(path, args.chunk_size) for path in args.paths]
+    for path, table in zip(args.paths, tables):
+        categorical = sum(table.is_categorical(column) for column in table.columns)
+        size = sum(values.nbytes for values in table.data.values())
+        print(f"{path}: {len(table)} rows, {len(table.columns)} columns ({categorical} categorical), {size / 1024:.0f} KB in memory")
+    if len(tables) > 1:
+        for path, keep in zip(args.paths, deduplicate(tables)):
+            print(f"{path}: {int((~keep).sum())} rows duplicate an earlier one")
+    print(f"cache: {cache.hits} hits, {cache.misses} parsed")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,305 @@
+import os
+import gc
+import sys
+import json
+import time
+import argparse
+import platform
+import warnings
+import subprocess
+import statistics
+import logging
+from datetime import datetime, timezone
+import numpy as np
+import pandas as pd
+
+# Microbenchmarks of the prediction hot path, kept as a JSON baseline
+# run from the repo root: python benchmark.py run [--output benchmarks/current.json] [--compare benchmarks/baseline.json]
+#                         python benchmark.py compare benchmarks/baseline.json benchmarks/current.json [--threshold 0.2]
+#
+# Fixtures are the first --rows rows of data/dataset.csv as /api/predict requests,
+# alternating mathematics and portuguese so all four model pairs are exercised; G1 and
+# G2, which dataset.csv lacks, are set to the row's G3. Timings are per record: each
+# round runs every fixture once with the garbage collector off, and the median round
+# is the figure compared. Cold model loading and per-model memory are measured in a
+# fresh interpreter. compare exits 1 when a result is worse than the baseline by more
+# than the threshold, so it can gate a change like a failing test.
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+FORMAT_VERSION = 1
+DEFAULT_BASELINE = 'benchmarks/baseline.json'
+GENDER_CODES = {'F': 'female', 'M': 'male'}
+
+COLD_LOAD = """
+import gc, json, time, logging, warnings, tracemalloc
+warnings.filterwarnings('ignore', category=UserWarning)
+logging.disable(logging.INFO)
+from api.predict import ModelPredictor
+from api.model_store import estimate_model_bytes
+backend, compiled = {backend!r}, {compiled!r}
+start = time.perf_counter()
+predictor = ModelPredictor(compiled=compiled, backend=backend)
+predictor.models.load_all()
+load_s = time.perf_counter() - start
+memory = {{}}
+for key in sorted(predictor.models.keys()):
+    predictor.models.evict(key)
+    gc.collect()
+    tracemalloc.start()
+    model = predictor.models[key]
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    resident, mmapped = estimate_model_bytes(model)
+    memory[key] = {{'allocated': allocated, 'resident': resident, 'mmapped': mmapped}}
+print(json.dumps({{'load_s': load_s, 'memory': memory}}))
+"""
+
+def load_fixtures(path='data/dataset.csv', rows=200):
+    """/api/predict request dicts from the ARFF-formatted dataset.csv"""
+    from arff_reader import read_arff
+    frame = read_arff(path).to_frame().head(rows)
+    records = []
+    for index, row in enumerate(frame.to_dict('records')):
+        row['gender'] = GENDER_CODES[row.pop('sex')]
+        row['subject'] = 'mathematics' if index % 2 == 0 else 'portuguese'
+        row['G1'] = row['G2'] = row['G3']
+        records.append(row)
+    return records
+
+def time_rounds(function, count, repeat):
+    """Per-record seconds of ``repeat`` rounds of ``function`` (one warm-up round first)"""
+    function()
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rounds = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            rounds.append((time.perf_counter() - start) / count)
+    finally:
+        if enabled:
+            gc.enable()
+    return rounds
+
+def timing_result(rounds):
+    return {'kind': 'time', 'unit': 'us', 'value': statistics.median(rounds) * 1e6,
+            'min': min(rounds) * 1e6, 'max': max(rounds) * 1e6, 'rounds': len(rounds)}
+
+def exports_present(model_path='models'):
+    """Whether export_models.py has written every model under models/compiled"""
+    from api.model_store import ModelStore
+    return all(os.path.exists(os.path.join(model_path, 'compiled', key, 'meta.json'))
+               for key in ModelStore.discover(model_path))
+
+def hot_path_cases(records):
+    """name -> function that runs its step once over every fixture, for the in-process timings"""
+    from api.data_manager import DataManager
+    from api.forest_engine import FlatForest
+    from api.predict import ModelPredictor
+
+    predictor = ModelPredictor(compiled=False, cascade=False)
+    compiled = ModelPredictor(compiled=True, cascade=False)
+    for p in [predictor, compiled]:
+        # the cache would turn every round after the first into lookups
+        p.cache = None
+        p.models.load_all()
+    cascade = ModelPredictor(compiled=True, cascade=True)
+    cascade.cache = None
+
+    transformers = [predictor.get_transformer(record) for record in records]
+    rows = [predictor.prepare_g3_row(record) for record in records]
+    forest_keys = [predictor.get_model_key(record, 'G1') for record in records]
+    forest_rows = [DataManager.process_prediction_data(record, transformer)
+                   for record, transformer in zip(records, transformers)]
+    exported = exports_present(predictor.model_path)
+    flat = {key: FlatForest.load(os.path.join(predictor.model_path, 'compiled', key), mmap_mode='r')
+            for key in set(forest_keys)} if exported else {}
+    ungraded = [{k: v for k, v in record.items() if k not in ['G1', 'G2']} for record in records]
+    frames = {}
+    for record, transformer in zip(records, transformers):
+        frames.setdefault(id(transformer), (transformer, []))[1].append(record)
+    frames = [(transformer, pd.DataFrame(group)) for transformer, group in frames.values()]
+
+    def feature_processing():
+        for record, transformer in zip(records, transformers):
+            DataManager.process_prediction_data(record, transformer)
+
+    def feature_processing_frame():
+        for transformer, frame in frames:
+            DataManager.process_prediction_frame(frame, transformer=transformer)
+
+    def dataframe_assembly():
+        for row in rows:
+            pd.DataFrame([row])[predictor.g3_features]
+
+    def g3_predict(target):
+        def run():
+            for record in records:
+                target.predict(record)
+        return run
+
+    def forest_predict_sklearn():
+        for key, row in zip(forest_keys, forest_rows):
+            predictor.models[key].predict(pd.DataFrame([row])[predictor.base_features])
+
+    def forest_predict_flat():
+        for key, row in zip(forest_keys, forest_rows):
+            flat[key].predict(flat[key].to_matrix([row]))
+
+    def cascade_batch():
+        cascade.estimate_grades_batch(ungraded)
+
+    cases = {
+        'feature_processing': feature_processing,
+        'feature_processing_frame': feature_processing_frame,
+        'dataframe_assembly': dataframe_assembly,
+        'g3_predict_sklearn': g3_predict(predictor),
+        'g3_predict_compiled': g3_predict(compiled),
+        'forest_predict_sklearn': forest_predict_sklearn,
+        'forest_predict_flat': forest_predict_flat,
+        'cascade_estimate_batch': cascade_batch,
+    }
+    if not exported:
+        print("  models/compiled is missing, skipping forest_predict_flat (run export_models.py)")
+        del cases['forest_predict_flat']
+    return cases
+
+def cold_load(backend, compiled):
+    """Seconds for ModelPredictor() plus load_all() in a fresh interpreter, and per-model memory"""
+    env = dict(os.environ, PYTHONPATH=os.getcwd(), MODEL_LAZY_LOADING='true')
+    result = subprocess.run([sys.executable, '-c', COLD_LOAD.format(backend=backend, compiled=compiled)],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def environment():
+    import sklearn
+    return {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+def run(rows, repeat, cold_repeat, only=None):
+    """All benchmark results as the JSON document the baseline stores"""
+    logging.disable(logging.INFO)
+    records = load_fixtures(rows=rows)
+    results = {}
+
+    def selected(name):
+        return not only or any(part in name for part in only)
+
+    for name, function in hot_path_cases(records).items():
+        if not selected(name):
+            continue
+        results[name] = timing_result(time_rounds(function, len(records), repeat))
+        print(f"  {name:<28} {results[name]['value']:>10.1f} us/record", flush=True)
+
+    if selected('load_models_cold') or selected('memory'):
+        backends = [('joblib', False), ('joblib', True)] + ([('exported', True)] if exports_present() else [])
+        for backend, compiled in backends:
+            name = f"load_models_cold_{backend}{'_compiled' if compiled and backend == 'joblib' else ''}"
+            loads = [cold_load(backend, compiled) for _ in range(cold_repeat)]
+            results[name] = timing_result([load['load_s'] for load in loads])
+            print(f"  {name:<28} {results[name]['value'] / 1000:>10.1f} ms", flush=True)
+            if backend == 'joblib' and not compiled:
+                for key, usage in loads[0]['memory'].items():
+                    results[f"memory_{key}"] = {'kind': 'memory', 'unit': 'bytes', 'value': usage['allocated'],
+                                                'resident': usage['resident'], 'mmapped': usage['mmapped']}
+                    print(f"  memory_{key:<21} {usage['allocated'] / 1024:>10.0f} KB", flush=True)
+
+    return {
+        'format_version': FORMAT_VERSION,
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'environment': environment(),
+        'fixtures': {'source': 'data/dataset.csv', 'rows': len(records), 'repeat': repeat},
+        'results': results,
+    }
+
+def compare(baseline, current, threshold):
+    """(name, baseline, current, ratio, status) rows; status 'regression' when current/baseline > 1 + threshold"""
+    rows = []
+    for name in sorted(set(baseline['results']) | set(current['results'])):
+        old, new = baseline['results'].get(name), current['results'].get(name)
+        if old is None or new is None:
+            rows.append((name, old and old['value'], new and new['value'], None, 'new' if old is None else 'missing'))
+            continue
+        ratio = new['value'] / old['value'] if old['value'] else float('inf')
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold):
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, old['value'], new['value'], ratio, status))
+    return rows
+
+def print_comparison(baseline, current, threshold):
+    """Print the comparison table; returns the number of regressions"""
+    differing = {key: (value, current['environment'].get(key))
+                 for key, value in baseline['environment'].items() if current['environment'].get(key) != value}
+    if differing:
+        print(f"Warning: environments differ: {differing}")
+    print(f"{'benchmark':<32} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name, old, new, ratio, status in compare(baseline, current, threshold):
+        unit = (current['results'].get(name) or baseline['results'][name])['unit']
+        change = f"{(ratio - 1) * 100:+.1f}%" if ratio is not None else ''
+        marker = '' if status == 'ok' else f"  {status.upper() if status == 'regression' else status}"
+        print(f"{name:<32} {format_value(old, unit):>12} {format_value(new, unit):>12} {change:>9}{marker}")
+    regressions = sum(row[4] == 'regression' for row in compare(baseline, current, threshold))
+    print(f"{regressions} regression(s) beyond {threshold:.0%}")
+    return regressions
+
+def format_value(value, unit):
+    if value is None:
+        return '-'
+    if unit == 'bytes':
+        return f"{value / 1024:.0f} KB"
+    return f"{value / 1000:.2f} ms" if value >= 1000 else f"{value:.1f} us"
+
+def read_results(path):
+    with open(path) as f:
+        results = json.load(f)
+    if results.get('format_version') != FORMAT_VERSION:
+        sys.exit(f"{path} was written by another version of benchmark.py")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prediction hot path and compare against a baseline")
+    commands = parser.add_subparsers(dest='command', required=True)
+    run_parser = commands.add_parser('run', help="run the benchmarks and write the results")
+    run_parser.add_argument('--output', default=DEFAULT_BASELINE)
+    run_parser.add_argument('--rows', type=int, default=200, help="fixture rows from data/dataset.csv")
+    run_parser.add_argument('--repeat', type=int, default=7, help="timed rounds per benchmark")
+    run_parser.add_argument('--cold-repeat', type=int, default=3, help="fresh interpreters per cold load")
+    run_parser.add_argument('--only', nargs='+', help="run benchmarks whose name contains one of these")
+    run_parser.add_argument('--compare', help="baseline to compare the new results against")
+    run_parser.add_argument('--threshold', type=float, default=0.2)
+    compare_parser = commands.add_parser('compare', help="compare two result files")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.2,
+                                help="fractional slowdown (or memory growth) counted as a regression")
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        results = run(args.rows, args.repeat, args.cold_repeat, args.only)
+        os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+        with open(f"{args.output}.tmp", 'w') as f:
+            json.dump(results, f, indent=2)
+        os.replace(f"{args.output}.tmp", args.output)
+        print(f"Wrote {args.output}")
+        if args.compare:
+            sys.exit(1 if print_comparison(read_results(args.compare), results, args.threshold) else 0)
+    else:
+        regressions = print_comparison(read_results(args.baseline), read_results(args.current), args.threshold)
+        sys.exit(1 if regressions else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import sys
+import warnings
+import numpy as np
+import pandas as pd
+import joblib
+
+from api.compiled_models import CompiledLinearModel
+from dataset_store import read_split
+from api.forest_engine import FlatForest
+
+# Checks the compiled inference paths give exactly the sklearn results
+# run from the repo root: python check_parity.py
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+# model key -> processed_data split name used to train it (see 0.3_Task2ML_train)
+SPLITS = {
+    'math_female': 'Pmat_full',
+    'math_male': 'PmatM',
+    'por_female': 'Ppor_full',
+    'por_male': 'PporM',
+}
+
+def load_split(name):
+    frames = []
+    for part in ['train', 'test']:
+        X, y = read_split('processed_data', name, part)
+        frames.append(pd.concat([X, y[['G1', 'G2']]], axis=1))
+    return pd.concat(frames, ignore_index=True)
+
+def check_g3(key, data):
+    model = joblib.load(f'models/{key}_G3_model.joblib')
+    compiled = CompiledLinearModel.from_estimator(model)
+    X = data[list(model.feature_names_in_)]
+    expected = model.predict(X)
+
+    # per-row path as used by ModelPredictor.predict
+    rows = X.astype('float64').to_dict('records')
+    single = np.array([compiled.predict_row(row) for row in rows])
+    single_expected = np.array([model.predict(X.iloc[[i]])[0] for i in range(len(X))])
+    # batched path as used by ModelPredictor.predict_batch
+    batch = compiled.predict_rows(rows)
+    batch_expected = model.predict(pd.DataFrame(rows)[list(model.feature_names_in_)])
+
+    ok = (np.array_equal(single, single_expected) and np.array_equal(batch, expected)
+          and np.array_equal(batch, batch_expected))
+    print(f"{key}_G3: {len(X)} rows, {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+def check_forest(key, data):
+    forest = joblib.load(f'models/{key}_model.joblib')
+    flat = FlatForest.from_sklearn(forest)
+    X = data[list(forest.feature_names_in_)]
+
+    proba_ok = np.array_equal(flat.predict_proba(X.to_numpy()), forest.predict_proba(X))
+    single_ok = all(
+        flat.predict(X.iloc[[i]].to_numpy())[0] == forest.predict(X.iloc[[i]])[0]
+        for i in range(0, len(X), 10)
+    )
+    ok = proba_ok and single_ok and np.array_equal(flat.predict(X.to_numpy()), forest.predict(X))
+    print(f"{key}: {len(X)} rows, {'OK' if ok else 'MISMATCH'}")
+    return ok
+
+def main():
+    results = []
+    for key, split in SPLITS.items():
+        data = load_split(split)
+        results.append(check_g3(key, data))
+        for period in ['G1', 'G2']:
+            results.append(check_forest(f'{key}_{period}', data))
+    if not all(results):
+        sys.exit(1)
+    print("All compiled models match sklearn")
+
+if __name__ == '__main__':
+    main()
@@ -64,4 +64,89 @@ class Config:
     API_VERSION = 'v1'
     API_RATE_LIMIT = "100 per hour"
     API_KEY_LENGTH = 32
-    API_KEY_PREFIX = "dvlg_"
\ No newline at end of file
+    API_KEY_PREFIX = "dvlg_"
+
+    # API key lookup cache (size 0 disables)
+    API_KEY_CACHE_SIZE = int(os.getenv('API_KEY_CACHE_SIZE', 10000))
+    API_KEY_CACHE_NEGATIVE_SIZE = int(os.getenv('API_KEY_CACHE_NEGATIVE_SIZE', 10000))
+    API_KEY_CACHE_TTL = float(os.getenv('API_KEY_CACHE_TTL', 300))
+    API_KEY_CACHE_NEGATIVE_TTL = float(os.getenv('API_KEY_CACHE_NEGATIVE_TTL', 30))
+    API_KEY_SIGNAL_PATH = os.getenv('API_KEY_SIGNAL_PATH', '.databaseFiles/api_key_version')
+    API_KEY_CACHE_DB_CHECK = float(os.getenv('API_KEY_CACHE_DB_CHECK', 5))
+
+    # password hashing pool (0 processes: on the request thread; keep max pending below WEB_THREADS)
+    PASSWORD_HASH_PROCESSES = int(os.getenv('PASSWORD_HASH_PROCESSES', 1))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 2))
+    PASSWORD_HASH_TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', 10))
+    PASSWORD_HASH_NICE = int(os.getenv('PASSWORD_HASH_NICE', 10))
+
+    # startup
+    STARTUP_BACKGROUND_INIT = os.getenv('STARTUP_BACKGROUND_INIT', 'true').lower() == 'true'
+    STARTUP_PROFILE = os.getenv('STARTUP_PROFILE', 'false').lower() == 'true'
+
+    # prediction inference (larger forest batches go to sklearn)
+    PREDICT_COMPILED_INFERENCE = os.getenv('PREDICT_COMPILED_INFERENCE', 'true').lower() == 'true'
+    PREDICT_FLAT_FOREST_MAX_ROWS = int(os.getenv('PREDICT_FLAT_FOREST_MAX_ROWS', 500))
+    PREDICT_CASCADE = os.getenv('PREDICT_CASCADE', 'true').lower() == 'true'
+
+    # model loading
+    MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'joblib')  # or 'exported'
+    MODEL_LAZY_LOADING = os.getenv('MODEL_LAZY_LOADING', 'true').lower() == 'true'
+    MODEL_MMAP_MODE = os.getenv('MODEL_MMAP_MODE') or None
+    MODEL_CACHE_MAX_MODELS = int(os.getenv('MODEL_CACHE_MAX_MODELS', 0)) or None
+    MODEL_CACHE_MAX_BYTES = int(os.getenv('MODEL_CACHE_MAX_BYTES', 0)) or None
+    MODEL_CHECK_INTERVAL = float(os.getenv('MODEL_CHECK_INTERVAL', 5))
+    MODEL_REGISTRY_PATH = os.getenv('MODEL_REGISTRY_PATH', 'models/registry')
+    MODEL_ADMIN_TOKEN = os.getenv('MODEL_ADMIN_TOKEN')
+
+    # prediction result cache (0 disables)
+    PREDICT_CACHE_SIZE = int(os.getenv('PREDICT_CACHE_SIZE', 10000))
+    PREDICT_CACHE_TTL = float(os.getenv('PREDICT_CACHE_TTL', 0)) or None
+
+    # prediction batching
+    PREDICT_BATCH_MAX_RECORDS = int(os.getenv('PREDICT_BATCH_MAX_RECORDS', 5000))
+    PREDICT_MICRO_BATCHING = os.getenv('PREDICT_MICRO_BATCHING', 'false').lower() == 'true'
+    PREDICT_MICRO_BATCH_SIZE = int(os.getenv('PREDICT_MICRO_BATCH_SIZE', 64))
+    PREDICT_MICRO_BATCH_WAIT_MS = float(os.getenv('PREDICT_MICRO_BATCH_WAIT_MS', 5))
+
+    # streaming predictions (/api/predict/stream); max bytes 0 means no limit
+    PREDICT_STREAM_CHUNK_SIZE = int(os.getenv('PREDICT_STREAM_CHUNK_SIZE', 500))
+    PREDICT_STREAM_MAX_BYTES = int(os.getenv('PREDICT_STREAM_MAX_BYTES', 0)) or None
+
+    # what-if sweeps (/api/predict/sweep)
+    PREDICT_SWEEP_MAX_POINTS = int(os.getenv('PREDICT_SWEEP_MAX_POINTS', 10000))
+
+    # /api/new-data write-behind buffer
+    FEEDBACK_PATH = os.getenv('FEEDBACK_PATH', 'feedback_data/feedback_data.csv')
+    FEEDBACK_FLUSH_ROWS = int(os.getenv('FEEDBACK_FLUSH_ROWS', 100))
+    FEEDBACK_FLUSH_INTERVAL = float(os.getenv('FEEDBACK_FLUSH_INTERVAL', 2))
+    FEEDBACK_MAX_PENDING = int(os.getenv('FEEDBACK_MAX_PENDING', 10000))
+
+    # feedback storage: 'csv' or 'store'
+    FEEDBACK_FORMAT = os.getenv('FEEDBACK_FORMAT', 'csv')
+    FEEDBACK_STORE_PATH = os.getenv('FEEDBACK_STORE_PATH', 'feedback_data/store')
+    FEEDBACK_SEGMENT_ROWS = int(os.getenv('FEEDBACK_SEGMENT_ROWS', 100000))
+    FEEDBACK_COMPACT_SEGMENTS = int(os.getenv('FEEDBACK_COMPACT_SEGMENTS', 8))
+
+    # incremental G3 training (interval 0: only on request)
+    G3_INCREMENTAL = os.getenv('G3_INCREMENTAL', 'false').lower() == 'true'
+    G3_STATS_PATH = os.getenv('G3_STATS_PATH', 'models/incremental')
+    G3_UPDATE_INTERVAL = float(os.getenv('G3_UPDATE_INTERVAL', 300))
+    G3_UPDATE_MIN_ROWS = int(os.getenv('G3_UPDATE_MIN_ROWS', 20))
+
+    # request metrics (/api/metrics)
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_DIR = os.getenv('METRICS_DIR', 'logs/metrics')
+    METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+
+    # logging
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_LEVELS = os.getenv('LOG_LEVELS', '')
+    LOG_SAMPLING = os.getenv('LOG_SAMPLING', '')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_FILE = os.getenv('LOG_FILE', 'logs/debug.log')
+    LOG_ROTATE_BYTES = int(os.getenv('LOG_ROTATE_BYTES', 10 * 1024 * 1024))
+    LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN') or None
+    LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', 5))
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_STDERR = os.getenv('LOG_STDERR', 'true').lower() == 'true'
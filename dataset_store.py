@@ -0,0 +1,396 @@
+import os
+import re
+import glob
+import json
+import shutil
+import warnings
+from collections import defaultdict, deque
+import numpy as np
+import pandas as pd
+
+# The processed_data datasets, kept once as memory-mapped column arrays in processed_data/store.
+# The notebooks and pipeline.py write them with save() and read them with load()/read_split();
+# kept free of app imports so the notebooks and CLIs don't load Flask
+
+FORMAT_VERSION = 1
+SCHEMA_FILE = 'schema.json'
+COLUMNS_FILE = 'columns.bin'
+INDEX_FILE = 'index.bin'
+ALIGNMENT = 8
+STORE_DIR = 'store'
+
+def compact_dtype(values):
+    """Narrowest dtype that holds a numeric column exactly"""
+    if values.dtype == bool or not len(values):
+        return values.dtype
+    if values.dtype.kind == 'f':
+        if np.isfinite(values).all() and (values == np.trunc(values)).all():
+            values = values.astype(np.int64)
+        elif (values.astype(np.float32).astype(values.dtype) == values).all():
+            return np.dtype(np.float32)
+        else:
+            return values.dtype
+    if values.dtype.kind in 'iu':
+        return np.result_type(np.min_scalar_type(int(values.min())), np.min_scalar_type(int(values.max())))
+    return values.dtype
+
+class _PackedWriter:
+    """Arrays appended into one file at aligned offsets"""
+
+    def __init__(self, path):
+        self.f = open(path, 'wb')
+        self.offset = 0
+
+    def add(self, array):
+        array = np.ascontiguousarray(array)
+        padding = -self.offset % ALIGNMENT
+        self.f.write(b'\0' * padding)
+        self.offset += padding
+        entry = {'offset': self.offset, 'dtype': array.dtype.str, 'length': int(len(array))}
+        self.f.write(array.tobytes())
+        self.offset += array.nbytes
+        return entry
+
+    def close(self):
+        self.f.close()
+
+class DatasetStore:
+    """Tables stored once, with subsets as stored row indices.
+
+    Each table's columns are packed one after another into
+    ``<table>/columns.bin``, memory-mapped with ``mmap_mode``, each in the
+    narrowest dtype that holds it exactly; text columns are stored as
+    integer codes with their categories in ``schema.json``. A subset (a
+    gender split, a train or test split, an X or y frame) names a table,
+    a row index array (in ``<table>/index.bin``) and optionally a column
+    list. Rows are laid out so each table's main subsets are contiguous;
+    those come back as slices of the mapped file, so ``arrays`` and
+    ``frame`` copy nothing. Other subsets gather their rows.
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        self.path = path
+        self.mmap_mode = mmap_mode
+        with open(os.path.join(path, SCHEMA_FILE)) as f:
+            self.schema = json.load(f)
+        if self.schema.get('format') != 'dataset_store' or self.schema.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported dataset store format in {path}")
+        self._buffers = {}
+
+    @staticmethod
+    def exists(path):
+        return os.path.exists(os.path.join(path, SCHEMA_FILE))
+
+    def names(self):
+        """Every table and subset name"""
+        return list(self.schema['tables']) + list(self.schema['subsets'])
+
+    def __contains__(self, name):
+        return name in self.schema['tables'] or name in self.schema['subsets']
+
+    def _buffer(self, table, filename):
+        key = (table, filename)
+        if key not in self._buffers:
+            path = os.path.join(self.path, table, filename)
+            if os.path.getsize(path) == 0:
+                self._buffers[key] = np.empty(0, dtype=np.uint8)
+            elif self.mmap_mode is None:
+                self._buffers[key] = np.fromfile(path, dtype=np.uint8)
+            else:
+                self._buffers[key] = np.memmap(path, dtype=np.uint8, mode=self.mmap_mode)
+        return self._buffers[key]
+
+    def _array(self, table, filename, entry):
+        dtype = np.dtype(entry['dtype'])
+        start = entry['offset']
+        return self._buffer(table, filename)[start:start + entry['length'] * dtype.itemsize].view(dtype)
+
+    def _index(self, table, name):
+        return self._array(table, INDEX_FILE, self.schema['tables'][table]['indices'][name])
+
+    def resolve(self, name):
+        """(table, rows, columns) of a table or subset; rows is a slice when contiguous"""
+        if name in self.schema['tables']:
+            # a whole table reads back in its original row order
+            table = self.schema['tables'][name]
+            columns = list(table['columns'])
+            if 'original' not in table['indices']:
+                return name, slice(0, table['rows']), columns
+            return name, self._index(name, 'original'), columns
+        if name not in self.schema['subsets']:
+            raise KeyError(f"No table or subset named {name}")
+        subset = self.schema['subsets'][name]
+        columns = subset['columns'] or list(self.schema['tables'][subset['table']]['columns'])
+        if subset['contiguous'] is not None:
+            return subset['table'], slice(*subset['contiguous']), columns
+        return subset['table'], self._index(subset['table'], subset['index']), columns
+
+    def column(self, table, column):
+        """A whole stored column, in stored row order"""
+        return self._array(table, COLUMNS_FILE, self.schema['tables'][table]['columns'][column])
+
+    def categories(self, table, column):
+        return self.schema['tables'][table]['columns'][column].get('categories')
+
+    def arrays(self, name, columns=None):
+        """``{column: array}`` of a table or subset; text columns as their integer codes"""
+        table, rows, available = self.resolve(name)
+        return {column: self.column(table, column)[rows] for column in columns or available}
+
+    def frame(self, name, columns=None, categorical=False):
+        """DataFrame of a table or subset.
+
+        Text columns come back as strings, or as pandas Categoricals over
+        the stored codes with ``categorical``.
+        """
+        table = self.resolve(name)[0]
+        data = {}
+        for column, values in self.arrays(name, columns).items():
+            categories = self.categories(table, column)
+            if categories is None:
+                data[column] = values
+            elif categorical:
+                data[column] = pd.Categorical.from_codes(values, categories)
+            else:
+                data[column] = np.array(categories, dtype=object)[values]
+        return pd.DataFrame(data, copy=False)
+
+    def matrix(self, name, columns=None, dtype=np.float64):
+        """Column-major ``dtype`` matrix of a subset (a copy), as the models take it"""
+        arrays = self.arrays(name, columns)
+        out = np.empty((self.rows(name), len(arrays)), dtype=dtype, order='F')
+        for index, values in enumerate(arrays.values()):
+            out[:, index] = values
+        return out
+
+    def rows(self, name):
+        if name in self.schema['tables']:
+            return self.schema['tables'][name]['rows']
+        return self.schema['subsets'][name]['rows']
+
+    def nbytes(self):
+        """Bytes on disk"""
+        return sum(os.path.getsize(os.path.join(root, name))
+                   for root, _, files in os.walk(self.path) for name in files)
+
+    @classmethod
+    def write(cls, path, tables, subsets, layouts=None):
+        """Create a store, replacing any store at ``path``.
+
+        ``tables`` maps table names to DataFrames; ``subsets`` maps subset
+        names to ``(table, row positions, columns or None)``. Subsets that
+        share the same row positions share one index. ``layouts`` maps a
+        table to disjoint subsets whose rows are stored first, in that
+        order, so they become contiguous.
+        """
+        layouts = layouts or {}
+        staging = f"{path}.tmp"
+        shutil.rmtree(staging, ignore_errors=True)
+        schema = {'format': 'dataset_store', 'format_version': FORMAT_VERSION, 'tables': {}, 'subsets': {}}
+
+        orders, index_writers = {}, {}
+        for table, frame in tables.items():
+            first = [np.asarray(subsets[name][1]) for name in layouts.get(table, [])]
+            placed = np.concatenate(first).astype(np.int64) if first else np.empty(0, dtype=np.int64)
+            if len(np.unique(placed)) != len(placed):
+                raise ValueError(f"Layout subsets of {table} overlap")
+            order = np.concatenate([placed, np.setdiff1d(np.arange(len(frame)), placed)])
+            # position of each original row in the stored order
+            position = np.empty(len(order), dtype=np.int64)
+            position[order] = np.arange(len(order))
+            orders[table] = position
+
+            os.makedirs(os.path.join(staging, table))
+            writer = _PackedWriter(os.path.join(staging, table, COLUMNS_FILE))
+            columns = {}
+            stored = frame.iloc[order]
+            for column in frame.columns:
+                values = stored[column]
+                if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+                    array = values.to_numpy()
+                    columns[column] = writer.add(array.astype(compact_dtype(array)))
+                else:
+                    codes, categories = pd.factorize(values, sort=True)
+                    columns[column] = writer.add(codes.astype(compact_dtype(codes)))
+                    columns[column]['categories'] = [str(category) for category in categories]
+            writer.close()
+            index_writers[table] = _PackedWriter(os.path.join(staging, table, INDEX_FILE))
+            schema['tables'][table] = {'rows': len(frame), 'columns': columns, 'indices': {}}
+            if not np.array_equal(order, np.arange(len(order))):
+                schema['tables'][table]['indices']['original'] = index_writers[table].add(
+                    position.astype(compact_dtype(position)))
+
+        shared = {}
+        for name, (table, rows, columns) in subsets.items():
+            stored = orders[table][np.asarray(rows, dtype=np.int64)]
+            entry = {'table': table, 'rows': len(stored), 'columns': columns, 'contiguous': None, 'index': None}
+            if len(stored) and np.array_equal(stored, np.arange(stored[0], stored[0] + len(stored))):
+                entry['contiguous'] = [int(stored[0]), int(stored[0]) + len(stored)]
+            else:
+                key = (table, stored.tobytes())
+                if key not in shared:
+                    shared[key] = name
+                    schema['tables'][table]['indices'][name] = index_writers[table].add(
+                        stored.astype(compact_dtype(stored)))
+                entry['index'] = shared[key]
+            schema['subsets'][name] = entry
+        for writer in index_writers.values():
+            writer.close()
+
+        with open(os.path.join(staging, SCHEMA_FILE), 'w') as f:
+            json.dump(schema, f, separators=(',', ':'))
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(staging, path)
+        return cls(path)
+
+SUBSET = re.compile(r'^P(mat|por)(M|FE)$')
+SPLIT = re.compile(r'^(X|Y|y)_(.+)_(train|test)$')
+
+def hashing_frame(frame):
+    """Numbers (and booleans) as float64 so rows written by different notebooks hash alike"""
+    return frame.apply(lambda column: column.astype(np.float64)
+                       if pd.api.types.is_numeric_dtype(column) or pd.api.types.is_bool_dtype(column) else column)
+
+def match_rows(base, derived, candidates=None):
+    """Position in ``base`` of each row of ``derived``, over derived's columns.
+
+    Identical rows are paired in order, so a frame with repeated rows maps
+    to distinct base rows.
+    """
+    columns = list(derived.columns)
+    candidates = np.arange(len(base)) if candidates is None else np.asarray(candidates)
+    base_hashes = pd.util.hash_pandas_object(hashing_frame(base[columns].iloc[candidates]), index=False).to_numpy()
+    pool = defaultdict(deque)
+    for position, digest in zip(candidates, base_hashes):
+        pool[digest].append(position)
+    rows = np.empty(len(derived), dtype=np.int64)
+    for index, digest in enumerate(pd.util.hash_pandas_object(hashing_frame(derived), index=False).to_numpy()):
+        if not pool[digest]:
+            raise ValueError(f"Row {index} has no match in the base table")
+        rows[index] = pool[digest].popleft()
+    return rows
+
+def subject_table(name):
+    return f"P{name[1:4]}_full"
+
+def plan(frames):
+    """Tables, subsets and layouts for the named frames.
+
+    Full and enhanced frames become tables; the gender subsets and the X/y
+    train/test splits become row indices into them, found by matching
+    each frame's rows to its table.
+    """
+    derived = {name for name in frames if SUBSET.match(name) or SPLIT.match(name)}
+    tables = {name: frame for name, frame in frames.items() if name not in derived}
+    subsets, layouts = {}, defaultdict(list)
+
+    # gender subsets of the cleaned subject tables
+    for name in sorted(n for n in derived if SUBSET.match(n)):
+        table = subject_table(name)
+        subsets[name] = (table, match_rows(tables[table], frames[name]), None)
+        layouts[table].append(name)
+
+    # X/y splits: features and grades matched together so the pairs stay aligned
+    pairs = defaultdict(dict)
+    for name in derived:
+        match = SPLIT.match(name)
+        if match:
+            pairs[(match.group(2), match.group(3))][match.group(1).lower()] = name
+    for (stem, part), names in sorted(pairs.items()):
+        if stem.endswith('_enhanced'):
+            table, candidates = stem, None
+        else:
+            table = subject_table(stem)
+            candidates = subsets[stem][1] if stem in subsets else None
+        joined = pd.concat([frames[names[kind]] for kind in sorted(names)], axis=1)
+        rows = match_rows(tables[table], joined, candidates)
+        for kind, name in names.items():
+            subsets[name] = (table, rows, list(frames[name].columns))
+        if stem.endswith('_enhanced') and part == 'train':
+            layouts[table][:0] = [names['x']]
+        elif stem.endswith('_enhanced'):
+            layouts[table].append(names['x'])
+    return tables, subsets, dict(layouts)
+
+def verify(store, frames):
+    """Names whose store frame differs from the given frame"""
+    mismatched = []
+    for name, expected in frames.items():
+        actual = store.frame(name)
+        same = list(actual.columns) == list(expected.columns) and len(actual) == len(expected)
+        for column in expected.columns if same else []:
+            if pd.api.types.is_numeric_dtype(expected[column]) or pd.api.types.is_bool_dtype(expected[column]):
+                same = same and np.array_equal(actual[column].to_numpy(dtype=np.float64),
+                                               expected[column].to_numpy(dtype=np.float64))
+            else:
+                same = same and (actual[column].to_numpy(dtype=object) == expected[column].to_numpy(dtype=object)).all()
+        if not same:
+            mismatched.append(name)
+    return mismatched
+
+def widen(frame):
+    """Copy of ``frame`` with int64/float64 numbers, as read_csv gives them (same values; a whole-number float column stays int64)"""
+    return frame.astype({column: np.int64 if dtype.kind in 'iu' else np.float64
+                         for column, dtype in frame.dtypes.items() if dtype.kind in 'iuf'})
+
+def stale_csvs(source):
+    """``{name: path}`` of the CSVs in ``source`` newer than its store (all of them if there is no store)"""
+    schema = os.path.join(source, STORE_DIR, SCHEMA_FILE)
+    built = os.path.getmtime(schema) if os.path.exists(schema) else -np.inf
+    return {os.path.basename(path)[:-4]: path for path in sorted(glob.glob(os.path.join(source, '*.csv')))
+            if os.path.getmtime(path) > built}
+
+def load(source, name, wide=False):
+    """The ``name`` frame from ``<source>/store``, or from ``<source>/<name>.csv`` when that is newer.
+
+    Stored columns keep their narrow dtypes (views of the mapped file);
+    ``wide`` copies them to int64/float64 so no fit runs in float32.
+    """
+    path = os.path.join(source, f"{name}.csv")
+    store_path = os.path.join(source, STORE_DIR)
+    if name in stale_csvs(source):
+        if DatasetStore.exists(store_path):
+            warnings.warn(f"{path} is newer than {store_path}; reading the CSV (python build_dataset_store.py imports it)")
+        return pd.read_csv(path)
+    if not DatasetStore.exists(store_path):
+        raise FileNotFoundError(f"No dataset store in {source}")
+    frame = DatasetStore(store_path).frame(name)
+    return widen(frame) if wide else frame
+
+def read_split(source, name, part, wide=False):
+    """X and y frames of the ``<name>_enhanced`` ``part`` split (see ``load``)"""
+    return load(source, f'X_{name}_enhanced_{part}', wide), load(source, f'y_{name}_enhanced_{part}', wide)
+
+def save(source, frames, keep_csv=False):
+    """Write named frames into ``<source>/store``, replacing frames of the same name.
+
+    The store is rewritten with every other frame it held, plus any CSVs
+    newer than it, and read back to check it reproduces them all. Stored
+    subsets of a replaced table are dropped unless given again, as their
+    rows may be gone. The CSVs of the names written are then removed,
+    unless ``keep_csv``, so each dataset is kept once. Returns the store
+    and every frame written.
+    """
+    store_path = os.path.join(source, STORE_DIR)
+    fresh = {name: pd.read_csv(path) for name, path in stale_csvs(source).items()}
+    fresh.update(frames)
+    merged = {}
+    if DatasetStore.exists(store_path):
+        # read into memory: the write replaces the files these would map
+        store = DatasetStore(store_path, mmap_mode=None)
+        dropped = sorted(name for name, entry in store.schema['subsets'].items()
+                         if entry['table'] in fresh and name not in fresh)
+        if dropped:
+            warnings.warn(f"Dropped {', '.join(dropped)} from {store_path}: their table was replaced")
+        merged.update((name, store.frame(name)) for name in store.names() if name not in fresh and name not in dropped)
+    merged.update(fresh)
+    os.makedirs(source, exist_ok=True)
+    store = DatasetStore.write(store_path, *plan(merged))
+    mismatched = verify(store, merged)
+    if mismatched:
+        raise ValueError(f"Store does not reproduce: {', '.join(sorted(mismatched))}")
+    for name in [] if keep_csv else merged:
+        path = os.path.join(source, f"{name}.csv")
+        if os.path.exists(path):
+            os.remove(path)
+    return store, merged
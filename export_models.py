@@ -0,0 +1,76 @@
+import os
+import sys
+import time
+import argparse
+import warnings
+import joblib
+import numpy as np
+
+from api.compiled_models import CompiledLinearModel
+from api.forest_engine import FlatForest, file_checksum
+from dataset_store import read_split
+
+# Exports the models to the sklearn-free format served with MODEL_BACKEND=exported:
+# G3 coefficients (api/compiled_models.py) and G1/G2 flat forests (api/forest_engine.py)
+# run from the repo root: python export_models.py [--benchmark]
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+def model_keys(models_dir):
+    for subject in ['math', 'por']:
+        for gender in ['male', 'female']:
+            for period in ['G1', 'G2', 'G3']:
+                key = f"{subject}_{gender}_{period}"
+                if os.path.exists(os.path.join(models_dir, f"{key}_model.joblib")):
+                    yield key
+
+def export(key, models_dir='models'):
+    source = os.path.join(models_dir, f"{key}_model.joblib")
+    model = joblib.load(source)
+    target = os.path.join(models_dir, 'compiled', key)
+    meta = dict(source=source, source_sha256=file_checksum(source))
+    if key.endswith('_G3'):
+        exported = CompiledLinearModel.from_estimator(model)
+        exported.save(target, **meta)
+        print(f"{key}: {exported.n_features} coefficients")
+    else:
+        exported = FlatForest.from_sklearn(model)
+        exported.save(target, **meta)
+        print(f"{key}: {exported.n_trees} trees, depth {exported.max_depth}, "
+              f"{os.path.getsize(source) / 1024:.0f} KB -> {exported.nbytes() / 1024:.0f} KB")
+    return model, exported
+
+def time_call(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000.0
+
+def benchmark(key, forest, flat, X):
+    parts = []
+    for n_rows in [1, 100, 1000, 10000]:
+        rows = X.iloc[:1] if n_rows == 1 else X.sample(n_rows, replace=True, random_state=0)
+        rows_array = rows.to_numpy(dtype=np.float32)
+        repeat = max(3, 2000 // n_rows)
+        parts.append(f"{n_rows} rows sklearn {time_call(lambda: forest.predict(rows), max(3, repeat // 10)):.2f} ms, "
+                     f"flat {time_call(lambda: flat.predict(rows_array), repeat):.2f} ms")
+    print(f"{key}: " + ' | '.join(parts))
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the models to NumPy arrays for sklearn-free serving")
+    parser.add_argument('--models-dir', default='models', help="directory holding the .joblib models")
+    parser.add_argument('--benchmark', action='store_true', help="time sklearn vs flat forest predict")
+    args = parser.parse_args()
+
+    exported = {key: export(key, args.models_dir) for key in model_keys(args.models_dir)}
+    if not exported:
+        sys.exit(f"No models found in {args.models_dir}")
+
+    if args.benchmark:
+        X = read_split('processed_data', 'Ppor_full', 'test', wide=True)[0]
+        for key, (forest, flat) in exported.items():
+            if not key.endswith('_G3'):
+                benchmark(key, forest, flat, X[list(forest.feature_names_in_)])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+import os
+import sys
+import argparse
+import numpy as np
+
+from api.feature_transformer import FeatureTransformer
+from arff_reader import read_arff
+from dataset_store import load
+
+# Fits the feature transformers the API scales requests with, from the raw data
+# run from the repo root: python fit_transformers.py [--models-dir models]
+#
+# Repeats the cleaning of 0.1_Task2ML_datawrngle on data/*.arff, fits one
+# FeatureTransformer per model key's training split and saves it next to the
+# models as <key>_features.json. Each transformer is checked against the
+# processed_data *_enhanced dataset the models were trained on.
+
+COLUMNS = [
+    'school', 'sex', 'age', 'address', 'famsize', 'Pstatus', 'Medu', 'Fedu', 'Mjob', 'Fjob',
+    'reason', 'guardian', 'traveltime', 'studytime', 'failures', 'schoolsup', 'famsup', 'paid',
+    'activities', 'nursery', 'higher', 'internet', 'romantic', 'famrel', 'freetime', 'goout',
+    'Dalc', 'Walc', 'health', 'absences', 'G1', 'G2', 'G3'
+]
+OUTLIER_COLUMNS = ['age', 'absences', 'G1', 'G2', 'G3', 'studytime', 'failures', 'Dalc', 'Walc']
+
+# model key -> (subject data, sex filter, processed_data split it was trained on);
+# the female models were trained on the full subject data (see 0.3_Task2ML_train)
+SPLITS = {
+    'math_female': ('data/mat.arff', None, 'Pmat_full'),
+    'math_male': ('data/mat.arff', 'm', 'PmatM'),
+    'por_female': ('data/por.arff', None, 'Ppor_full'),
+    'por_male': ('data/por.arff', 'm', 'PporM'),
+}
+
+def load_arff(path):
+    """Rows of a student ARFF file as a DataFrame (see arff_reader.py)"""
+    table = read_arff(path)
+    if table.columns != COLUMNS:
+        raise ValueError(f"{path} does not have the student data columns")
+    return table.to_frame()
+
+def clean(df):
+    """Null, duplicate and IQR outlier removal as in 0.1_Task2ML_datawrngle"""
+    df = df.dropna().drop_duplicates()
+    df = df.assign(sex=df['sex'].str.lower())
+    for column in OUTLIER_COLUMNS:
+        q1, q3 = df[column].quantile(0.25), df[column].quantile(0.75)
+        iqr = q3 - q1
+        df = df[(df[column] >= q1 - 1.5 * iqr) & (df[column] <= q3 + 1.5 * iqr)]
+    return df.reset_index(drop=True)
+
+def fit_split(key):
+    """Fitted transformer and training rows for a model key"""
+    path, sex, name = SPLITS[key]
+    subject = clean(load_arff(path))
+    data = subject if sex is None else subject[subject['sex'] == sex].reset_index(drop=True)
+    transformer = FeatureTransformer.fit(data, numeric_data=subject, source=path, split=name)
+    return transformer, data
+
+def check(transformer, data, name):
+    """Largest difference from the features of processed_data's <name>_enhanced dataset"""
+    expected = load('processed_data', f'{name}_enhanced')
+    features = transformer.transform(data)[FeatureTransformer.FEATURES]
+    if len(features) != len(expected):
+        return np.inf
+    return float(np.abs(features.to_numpy() - expected[FeatureTransformer.FEATURES].to_numpy(dtype=np.float64)).max())
+
+def fit_all(models_dir='models', tolerance=1e-9):
+    """Fit, check and save a transformer for every model key"""
+    ok = True
+    for key in SPLITS:
+        transformer, data = fit_split(key)
+        difference = check(transformer, data, SPLITS[key][2])
+        status = 'OK' if difference <= tolerance else 'MISMATCH'
+        ok = ok and status == 'OK'
+        path = FeatureTransformer.path_for(key, models_dir)
+        transformer.save(path)
+        print(f"{key}: {len(data)} rows, max difference from {SPLITS[key][2]}_enhanced "
+              f"{difference:.2e} {status} -> {path}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description="Fit the feature transformers saved next to the models")
+    parser.add_argument('--models-dir', default='models')
+    args = parser.parse_args()
+
+    os.makedirs(args.models_dir, exist_ok=True)
+    if not fit_all(args.models_dir):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import os
+import multiprocessing
+
+# Production launcher: gunicorn -c gunicorn.conf.py wsgi:app
+# The app and models load once in the master (preload_app) and the workers
+# fork from it, so model memory is shared copy-on-write.
+
+# one BLAS thread per worker; the workers already use every core
+for var in ['OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS']:
+    os.environ.setdefault(var, '1')
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_WORKERS', cpu_count))
+# predictions are short CPU bursts; a few threads cover request I/O waits
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 4))
+preload_app = True
+timeout = int(os.getenv('WEB_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+accesslog = os.getenv('WEB_ACCESS_LOG')
+
+def on_starting(server):
+    # request metrics count from zero for each server run
+    from api.metrics import Metrics
+    from config import Config
+    Metrics.clear_directory(Config.METRICS_DIR)
+
+def worker_exit(server, worker):
+    # write rows still buffered for the feedback CSV before the worker goes away
+    from api.data_manager import feedback_writer
+    feedback_writer.close()
+    from api.metrics import metrics
+    metrics.flush()
+    from api.password_hasher import password_hasher
+    password_hasher.close()
+    from logger_config import flush_logging
+    flush_logging()
@@ -1,23 +1,307 @@
-import logging
 import os
+import sys
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from contextlib import contextmanager
+from config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process writes the log
+    fcntl = None
+
+# The one place logging is configured; create_app() calls setup_logging().
+#
+# Loggers hand records to a bounded in-memory queue and return; a listener thread
+# formats them and writes Config.LOG_FILE (rotated by size or time) and stderr.
+# Per-logger levels (LOG_LEVELS) and sampling (LOG_SAMPLING) are applied before a
+# record is queued, so a suppressed record costs a level check or a random draw.
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# LogRecord attributes; anything else on a record came from ``extra=`` and is written as a field
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'taskName'}
+
+_listener = None
+
+def parse_settings(text, convert):
+    """``'api.predict=0.1,werkzeug=0.5'`` -> ``{'api.predict': 0.1, 'werkzeug': 0.5}``"""
+    settings = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        if not value:
+            raise ValueError(f"Expected logger=value, got {item!r}")
+        settings[name.strip()] = convert(value.strip())
+    return settings
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, process, thread and any ``extra`` fields"""
+
+    def __init__(self):
+        super().__init__()
+        self._second = None
+        self._prefix = None
+
+    def timestamp(self, created):
+        second = int(created)
+        if second != self._second:
+            self._second, self._prefix = second, time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(second))
+        return f"{self._prefix}.{int((created - second) * 1000):03d}Z"
+
+    def format(self, record):
+        entry = {
+            'time': self.timestamp(record.created),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+            'thread': record.threadName,
+        }
+        for key in record.__dict__.keys() - RECORD_ATTRIBUTES:
+            entry.setdefault(key, record.__dict__[key])
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of each logger's records below WARNING.
+
+    Rates apply to a logger and its children (``api`` covers
+    ``api.predict``); the most specific name wins.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+        self._resolved = {}
+
+    def rate_for(self, name):
+        rate = self._resolved.get(name)
+        if rate is None:
+            rate, parts = 1.0, name.split('.')
+            for length in range(len(parts), 0, -1):
+                prefix = '.'.join(parts[:length])
+                if prefix in self.rates:
+                    rate = self.rates[prefix]
+                    break
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate_for(record.name)
+        return rate >= 1.0 or random.random() < rate
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Queues records without blocking; past ``max_size`` queued records they are dropped and counted.
+
+    The queue is a lock-free ``SimpleQueue``, so the bound is checked
+    against its size rather than enforced by it.
+    """
+
+    def __init__(self, log_queue, max_size):
+        super().__init__(log_queue)
+        self.max_size = max_size
+        self.dropped = 0
+        self._reported = 0
+
+    def prepare(self, record):
+        # only the message is resolved here; formatting happens on the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= self.max_size:
+            self.dropped += 1
+            return
+        if self.dropped > self._reported:
+            dropped, self._reported = self.dropped - self._reported, self.dropped
+            self.queue.put(logging.LogRecord('logger_config', logging.WARNING, __file__, 0,
+                                             f"Dropped {dropped} log records, the log queue was full", None, None))
+        self.queue.put(record)
+
+class BatchQueueListener(logging.handlers.QueueListener):
+    """Takes every record already queued at once and hands handlers the batch.
+
+    Handlers with ``emit_batch`` write a batch in one call; others get
+    the records one by one.
+    """
+
+    max_batch = 512
+
+    def _monitor(self):
+        while True:
+            records = [self.dequeue(True)]
+            while len(records) < self.max_batch:
+                try:
+                    records.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            stop = self._sentinel in records
+            records = [record for record in records if record is not self._sentinel]
+            if records:
+                self.handle_batch(records)
+            if stop:
+                return
+
+    def handle_batch(self, records):
+        for handler in self.handlers:
+            batch = [record for record in records if record.levelno >= handler.level and handler.filter(record)]
+            if not batch:
+                continue
+            if hasattr(handler, 'emit_batch'):
+                handler.emit_batch(batch)
+            else:
+                for record in batch:
+                    handler.handle(record)
+
+class BatchStreamHandler(logging.StreamHandler):
+    def emit_batch(self, records):
+        try:
+            with self.lock:
+                self.stream.write(''.join(self.format(record) + self.terminator for record in records))
+                self.flush()
+        except Exception:
+            self.handleError(records[0])
+
+class _SharedFileMixin:
+    """Lets several processes write and rotate one log file.
+
+    Each batch is written under an ``flock`` on ``<file>.lock``. If
+    another process rotated the file since this one opened it, the new
+    file is opened first and this process does not rotate it again.
+    """
+
+    _lock_file = None
+    _lock_pid = None
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        # a lock held through a descriptor shared with a forked parent excludes nobody
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(f"{self.baseFilename}.lock", 'a')
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _follow_rotation(self):
+        if self.stream is None:
+            self.stream = self._open()
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+            self._rotated_elsewhere()
+
+    def _rotated_elsewhere(self):
+        pass
+
+    def emit(self, record):
+        self.emit_batch([record])
+
+    def emit_batch(self, records):
+        try:
+            text = ''.join(self.format(record) + self.terminator for record in records)
+            with self.lock, self._file_lock():
+                self._follow_rotation()
+                if self.shouldRollover(records[0]):
+                    self.doRollover()
+                    if self.stream is None:
+                        self.stream = self._open()
+                self.stream.write(text)
+                self.stream.flush()
+        except Exception:
+            self.handleError(records[0])
+
+class SharedRotatingFileHandler(_SharedFileMixin, logging.handlers.RotatingFileHandler):
+    pass
+
+class SharedTimedRotatingFileHandler(_SharedFileMixin, logging.handlers.TimedRotatingFileHandler):
+    def _rotated_elsewhere(self):
+        self.rolloverAt = self.computeRollover(time.time())
+
+def build_handlers(config):
+    """The handlers the listener thread writes to"""
+    formatter = JsonFormatter() if config.LOG_FORMAT == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = []
+    if config.LOG_FILE:
+        directory = os.path.dirname(config.LOG_FILE)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if config.LOG_ROTATE_WHEN:
+            handler = SharedTimedRotatingFileHandler(config.LOG_FILE, when=config.LOG_ROTATE_WHEN,
+                                                     backupCount=config.LOG_BACKUP_COUNT, encoding='utf-8')
+        else:
+            handler = SharedRotatingFileHandler(config.LOG_FILE, maxBytes=config.LOG_ROTATE_BYTES,
+                                                backupCount=config.LOG_BACKUP_COUNT, encoding='utf-8')
+        handlers.append(handler)
+    if config.LOG_STDERR:
+        handlers.append(BatchStreamHandler(sys.stderr))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+def _start_listener(queue_handler, handlers):
+    global _listener
+    queue_handler.queue = queue.SimpleQueue()
+    _listener = BatchQueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def _restart_after_fork():
+    # the listener thread doesn't survive fork; each worker runs its own over the same handlers
+    if _listener is not None:
+        queue_handler = logging.getLogger().handlers[0]
+        _start_listener(queue_handler, _listener.handlers)
+
+def flush_logging():
+    """Write every queued record and stop the listener (at exit)"""
+    global _listener
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+def setup_logging(config=Config):
+    """Configure the root logger once per process; later calls return the app logger unchanged"""
+    if _listener is None:
+        handlers = build_handlers(config)
+        queue_handler = DroppingQueueHandler(None, config.LOG_QUEUE_SIZE)
+        sampling = parse_settings(config.LOG_SAMPLING, float)
+        if sampling:
+            queue_handler.addFilter(SamplingFilter(sampling))
+        _start_listener(queue_handler, handlers)
+
+        # no format here uses the caller's file and line, so skip the stack walk that finds them
+        logging._srcfile = None
+        logging.logMultiprocessing = False
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(config.LOG_LEVEL.upper())
+        for name, level in parse_settings(config.LOG_LEVELS, str.upper).items():
+            logging.getLogger(name).setLevel(level)
+
+        atexit.register(flush_logging)
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=_restart_after_fork)
 
-def setup_logging():
-    # Create logs directory if it doesn't exist
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
-    # Configure logging
-    logging.basicConfig(
-        level=logging.DEBUG,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('logs/debug.log'),
-            logging.StreamHandler()
-        ]
-    )
-
-    # Create logger
-    logger = logging.getLogger('prediction_app')
-    logger.setLevel(logging.DEBUG)
-
-    return logger
\ No newline at end of file
+    return logging.getLogger('prediction_app')
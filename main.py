@@ -1,119 +1,183 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
-from flask_sqlalchemy import SQLAlchemy
-from flask_wtf.csrf import CSRFProtect
-from flask_login import LoginManager
+# imported first so startup timings cover the imports below
+from startup import startup
+with startup.phase('import flask'):
+    from flask import Flask, render_template, request, session, redirect, url_for, jsonify, g
+    from flask_sqlalchemy import SQLAlchemy
+    from flask_wtf.csrf import CSRFProtect
+    from flask_login import LoginManager
+    from flask_mail import Mail
+import time
 import logging
-from models import db, User
-from api import api
+import threading
+with startup.phase('import models'):
+    from models import db, User, upgrade_schema
 import os
 from config import Config
-from flask_mail import Mail
 from logger_config import setup_logging
 
-# Setup logging at app startup
-logger = setup_logging()
-
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.urandom(24)
-app.config.from_object(Config)
-app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
-app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production
-app.config['SESSION_TYPE'] = 'filesystem'
-
-# initialize mail
-mail = Mail()
-mail.init_app(app)
-
-# initialize CSRF protection
-csrf = CSRFProtect()
-csrf.init_app(app)
-
-# initialize LoginManager
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'
-
-# database setup
-basedir = os.path.abspath(os.path.dirname(__file__))
-os.makedirs('.databaseFiles', exist_ok=True)
-db_path = os.path.join(basedir, '.databaseFiles', 'devlog.db')
-app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# CSRF Configuration
-app.config['WTF_CSRF_CHECK_DEFAULT'] = False
-app.config['WTF_CSRF_HEADERS'] = ['X-CSRF-TOKEN']
-
-# Initialize DB
-db.init_app(app)
-
-# Register API blueprint
-app.register_blueprint(api, url_prefix='/api')
-
-print("Available routes:", [str(rule) for rule in app.url_map.iter_rules()])
-
-# Request logging
-@app.before_request
-def log_request():
-    logger.info(f"Request: {request.method} {request.path}")
-    if request.is_json:
-        try:
-            data = request.get_json()
-            logger.info(f"JSON Data: {data}")
-            # Debug field checking
-            if 'gender' in data:
-                logger.debug(f"Gender field: {data['gender']}, type: {type(data['gender'])}")
-            if 'sex' in data:
-                logger.debug(f"Sex field: {data['sex']}, type: {type(data['sex'])}")
-        except Exception as e:
-            logger.error(f"Error parsing JSON data: {str(e)}")
-
-def check_auth():
-    return 'user_id' in session
-
-@app.route('/')
-def index():
-    if not check_auth():
-        return redirect(url_for('login'))
-    return render_template('index.html')
-
-@app.route('/signup')
-def signup():
-    return render_template('signup.html', hide_nav=True)
-
-@app.route('/login')
-def login():
-    return render_template('login.html', hide_nav=True)
-
-@app.errorhandler(Exception)
-def handle_error(error):
-    logger.error(f"Error occurred: {str(error)}", exc_info=True)
-    return jsonify({'error': str(error)}), 500
-
-@login_manager.user_loader
-def load_user(user_id):
-    return db.session.get(User, int(user_id))
-
-@app.route('/privacy')
-def privacy():
-    if not check_auth():
-        return redirect(url_for('login'))
-    return render_template('privacy.html')
-
-@app.route('/home')
-def home():
-    if not check_auth():
-        return redirect(url_for('login'))
-    return render_template('home.html')
-
-@app.route('/profile')
-def profile():
-    if not check_auth():
-        return redirect(url_for('login'))
-    return render_template('profile.html')
+logger = logging.getLogger('prediction_app')
+
+def initialize_services(app, background=None):
+    """Create the database tables and load the models, in the background by default.
+
+    Until both finish, /ready answers 503 and the prediction endpoints
+    answer 503; the rest of the app serves immediately.
+    """
+    from api import predict
+
+    def init_database():
+        with app.app_context():
+            db.create_all()
+            upgrade_schema()
+
+    background = Config.STARTUP_BACKGROUND_INIT if background is None else background
+    startup.run('database', init_database, background)
+    startup.run('models', predict.init_predictor, background)
+
+def create_app(config_object=Config, background_init=None):
+    """Build the Flask app; importing this module has no side effects"""
+    # Setup logging at app startup
+    with startup.phase('logging'):
+        setup_logging()
+
+    with startup.phase('import api'):
+        from api import api
+        from api.metrics import metrics
+
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.urandom(24)
+    app.config.from_object(config_object)
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['SESSION_COOKIE_SECURE'] = False  # Set to True in production
+    app.config['SESSION_TYPE'] = 'filesystem'
+
+    # initialize extensions (configuration only; mail connects per message)
+    with startup.phase('extensions'):
+        mail = Mail()
+        mail.init_app(app)
+
+        # initialize CSRF protection
+        csrf = CSRFProtect()
+        csrf.init_app(app)
+
+        # initialize LoginManager
+        login_manager = LoginManager()
+        login_manager.init_app(app)
+        login_manager.login_view = 'login'
+
+    # database setup
+    basedir = os.path.abspath(os.path.dirname(__file__))
+    os.makedirs(os.path.join(basedir, '.databaseFiles'), exist_ok=True)
+    db_path = os.path.join(basedir, '.databaseFiles', 'devlog.db')
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{db_path}'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # CSRF Configuration
+    app.config['WTF_CSRF_CHECK_DEFAULT'] = False
+    app.config['WTF_CSRF_HEADERS'] = ['X-CSRF-TOKEN']
+
+    # Initialize DB (the engine connects on first use)
+    with startup.phase('database engine'):
+        db.init_app(app)
+
+    # Register API blueprint
+    app.register_blueprint(api, url_prefix='/api')
+
+    logger.debug(f"Available routes: {[str(rule) for rule in app.url_map.iter_rules()]}")
+
+    # Request logging
+    @app.before_request
+    def log_request():
+        g.request_start = time.perf_counter()
+        logger.info("Request: %s %s", request.method, request.path)
+        if request.is_json:
+            try:
+                # parsed once here; the routes reuse Flask's cached result
+                with metrics.stage('json_parse'):
+                    data = request.get_json()
+                # bodies are only formatted when DEBUG is on for this logger
+                logger.debug("JSON Data: %s", data)
+            except Exception as e:
+                logger.error(f"Error parsing JSON data: {str(e)}")
+
+    @app.after_request
+    def record_request_time(response):
+        start = g.get('request_start')
+        if start is not None:
+            metrics.observe('http_request_seconds', time.perf_counter() - start,
+                            (('endpoint', request.endpoint or 'unmatched'),))
+        return response
+
+    def check_auth():
+        return 'user_id' in session
+
+    @app.route('/health')
+    def health():
+        """Liveness: the process is up"""
+        return jsonify({'status': 'ok'})
+
+    @app.route('/ready')
+    def ready():
+        """Readiness: database and models are initialized"""
+        status = startup.status()
+        return jsonify(status), 200 if status['ready'] else 503
+
+    @app.route('/')
+    def index():
+        if not check_auth():
+            return redirect(url_for('login'))
+        return render_template('index.html')
+
+    @app.route('/signup')
+    def signup():
+        return render_template('signup.html', hide_nav=True)
+
+    @app.route('/login')
+    def login():
+        return render_template('login.html', hide_nav=True)
+
+    @app.errorhandler(Exception)
+    def handle_error(error):
+        logger.error(f"Error occurred: {str(error)}", exc_info=True)
+        return jsonify({'error': str(error)}), 500
+
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    @app.route('/privacy')
+    def privacy():
+        if not check_auth():
+            return redirect(url_for('login'))
+        return render_template('privacy.html')
+
+    @app.route('/home')
+    def home():
+        if not check_auth():
+            return redirect(url_for('login'))
+        return render_template('home.html')
+
+    @app.route('/profile')
+    def profile():
+        if not check_auth():
+            return redirect(url_for('login'))
+        return render_template('profile.html')
+
+    initialize_services(app, background_init)
+    if Config.STARTUP_PROFILE:
+        threading.Thread(target=report_when_ready, name='startup-report', daemon=True).start()
+    return app
+
+def report_when_ready(timeout=300):
+    """Log the startup phase timings once initialization has finished"""
+    deadline = time.monotonic() + timeout
+    while not startup.ready() and not startup.errors and time.monotonic() < deadline:
+        time.sleep(0.05)
+    startup.report()
 
 # Run the app
 if __name__ == '__main__':
-    with app.app_context():
-        db.create_all()
-    app.run(debug=True)
\ No newline at end of file
+    from api.metrics import Metrics
+    Metrics.clear_directory(Config.METRICS_DIR)
+    app = create_app()
+    app.run(debug=True)
@@ -0,0 +1,112 @@
+import os
+import sys
+import time
+import secrets
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Prediction latency during a login storm, with bcrypt on the request threads against the hashing pool
+# run from the repo root: python measure_logins.py [--threads 4] [--logins 16] [--duration 10]
+#
+# One process stands in for a gunicorn gthread worker: requests go through the Flask test
+# client on a pool of --threads threads. One client sends predictions back to back while
+# --logins clients keep logging in; prediction latency includes waiting for a free thread.
+
+PASSWORD = 'correct horse battery staple'
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+def run_phase(client, worker, sample, email, logins, duration):
+    """(prediction latencies, login status counts) over ``duration`` seconds"""
+    deadline = time.monotonic() + duration
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def predict():
+        response = client.post('/api/predict', json=sample)
+        if response.status_code != 200:
+            raise RuntimeError(f"Prediction failed: {response.status_code} {response.get_data(as_text=True)}")
+
+    def login():
+        return client.post('/api/auth/login', json={'email': email, 'password': PASSWORD}).status_code
+
+    def login_client():
+        while time.monotonic() < deadline:
+            status = worker.submit(login).result()
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+            if status == 429:
+                # what a client honouring Retry-After would do, scaled down
+                time.sleep(0.05)
+
+    clients = [threading.Thread(target=login_client) for _ in range(logins)]
+    for thread in clients:
+        thread.start()
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        worker.submit(predict).result()
+        latencies.append(time.perf_counter() - start)
+    for thread in clients:
+        thread.join()
+    return latencies, statuses
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure prediction latency while many logins run")
+    parser.add_argument('--threads', type=int, default=4, help="request threads, as WEB_THREADS")
+    parser.add_argument('--logins', type=int, default=16, help="concurrent login clients")
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    os.environ.setdefault('STARTUP_BACKGROUND_INIT', 'false')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ.setdefault('PREDICT_CACHE_SIZE', '0')
+
+    from main import create_app
+    from models import db, User
+    from api.user_manager import UserManager
+    from api.password_hasher import password_hasher
+    from measure_workers import SAMPLE_REQUEST
+
+    app = create_app(background_init=False)
+    app.config['WTF_CSRF_ENABLED'] = False
+    # a throwaway account in the app database, removed at the end
+    tag = f"storm{secrets.token_hex(4)}"
+    email = f"{tag}@example.com"
+    with app.app_context():
+        UserManager.create_user(email, PASSWORD, tag)
+        db.session.commit()
+
+    pooled = (password_hasher.processes, password_hasher.max_pending)
+    phases = [
+        ('predictions alone', 0, None),
+        ('login storm, bcrypt on request threads', args.logins, (0, sys.maxsize)),
+        (f'login storm, hashing pool ({pooled[0]} processes, {pooled[1]} pending)', args.logins, pooled),
+    ]
+    print(f"{args.threads} request threads, {args.logins} login clients, {args.duration:g}s per phase")
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as worker:
+            client = app.test_client()
+            for name, logins, hashing in phases:
+                if hashing is not None:
+                    password_hasher.close()
+                    password_hasher.processes, password_hasher.max_pending = hashing
+                    # start the pool outside the measured window
+                    password_hasher.check(PASSWORD, None)
+                latencies, statuses = run_phase(client, worker, SAMPLE_REQUEST, email, logins, args.duration)
+                logins_ok = statuses.get(200, 0)
+                print(f"{name}:\n  predictions {len(latencies) / args.duration:.0f}/s, "
+                      f"p50 {percentile(latencies, 0.5) * 1000:.1f} ms, p99 {percentile(latencies, 0.99) * 1000:.1f} ms")
+                if logins:
+                    print(f"  logins {logins_ok / args.duration:.1f}/s, responses "
+                          + ', '.join(f"{status}: {count}" for status, count in sorted(statuses.items())))
+    finally:
+        password_hasher.close()
+        with app.app_context():
+            User.query.filter_by(email=email).delete()
+            db.session.commit()
+
+if __name__ == '__main__':
+    main()
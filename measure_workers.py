@@ -0,0 +1,106 @@
+import os
+import sys
+import time
+import argparse
+import threading
+import requests
+
+# Measures per-worker memory and prediction throughput of a running server
+#   gunicorn -c gunicorn.conf.py wsgi:app &
+#   python measure_workers.py --master-pid $(pgrep -o gunicorn) --url http://127.0.0.1:8000
+
+SAMPLE_REQUEST = {
+    'subject': 'mathematics', 'gender': 'female', 'age': 16, 'studytime': 2, 'failures': 0,
+    'absences': 4, 'school': 0, 'address': 0, 'Medu': 4, 'Fedu': 3, 'famsize': 1, 'Pstatus': 0,
+    'health': 3, 'activities': 'yes', 'freetime': 3, 'goout': 2, 'romantic': 'no',
+    'schoolsup': 'no', 'famsup': 'yes', 'paid': 'no', 'nursery': 'yes', 'higher': 'yes',
+    'internet': 'yes', 'famrel': 4, 'Mjob': 'teacher', 'Fjob': 'services', 'traveltime': 1,
+    'Dalc': 1, 'Walc': 2, 'G1': 12, 'G2': 13, 'reason': 'course', 'guardian': 'mother'
+}
+
+def child_pids(pid):
+    children = []
+    for task in os.listdir(f'/proc/{pid}/task'):
+        with open(f'/proc/{pid}/task/{task}/children') as f:
+            children.extend(int(child) for child in f.read().split())
+    return children
+
+def memory_kb(pid):
+    """Rss, Pss and shared/private totals from smaps_rollup (Linux)"""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    }
+
+def report_memory(master_pid):
+    print(f"{'pid':>8} {'RSS MB':>8} {'PSS MB':>8} {'shared MB':>10} {'private MB':>11}")
+    total_pss = 0
+    for label, pid in [('master', master_pid)] + [('worker', pid) for pid in child_pids(master_pid)]:
+        usage = memory_kb(pid)
+        total_pss += usage['pss']
+        print(f"{pid:>8} {usage['rss'] / 1024:>8.1f} {usage['pss'] / 1024:>8.1f} "
+              f"{usage['shared'] / 1024:>10.1f} {usage['private'] / 1024:>11.1f}  {label}")
+    # PSS splits shared pages between the processes using them, so it sums to real usage
+    print(f"total PSS: {total_pss / 1024:.1f} MB")
+
+def load_test(url, concurrency, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                response = session.post(f'{url}/api/predict', json=SAMPLE_REQUEST, timeout=10)
+                ok = response.status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - start
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if not latencies:
+        sys.exit(f"No successful requests ({errors[0]} errors)")
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    print(f"{len(latencies) / duration:.0f} req/s over {duration}s with {concurrency} clients, "
+          f"p50 {p50:.1f} ms, p99 {p99:.1f} ms, {errors[0]} errors")
+
+def main():
+    parser = argparse.ArgumentParser(description="Report per-worker memory and requests/sec")
+    parser.add_argument('--master-pid', type=int, help="gunicorn master pid")
+    parser.add_argument('--url', help="base URL to load test, e.g. http://127.0.0.1:8000")
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    args = parser.parse_args()
+
+    if not args.master_pid and not args.url:
+        parser.error("give --master-pid, --url or both")
+    if args.url:
+        load_test(args.url.rstrip('/'), args.concurrency, args.duration)
+    if args.master_pid:
+        report_memory(args.master_pid)
+
+if __name__ == '__main__':
+    main()
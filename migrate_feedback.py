@@ -0,0 +1,37 @@
+import sys
+import argparse
+import logging
+
+from api.feedback_store import FeedbackStore
+from api.data_manager import FEEDBACK_COLUMNS
+from config import Config
+
+# One-time import of the feedback CSV into the segment store
+# run from the repo root: python migrate_feedback.py [--csv feedback_data/feedback_data.csv]
+#
+# Rows already in the store (by content hash) are skipped and a CSV that was
+# imported before is recognised by its checksum, so re-running is harmless.
+# The CSV is left in place.
+
+def main():
+    parser = argparse.ArgumentParser(description="Import the feedback CSV into the feedback store")
+    parser.add_argument('--csv', default=Config.FEEDBACK_PATH)
+    parser.add_argument('--store', default=Config.FEEDBACK_STORE_PATH)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    store = FeedbackStore(args.store, FEEDBACK_COLUMNS,
+                          segment_rows=Config.FEEDBACK_SEGMENT_ROWS,
+                          compact_segments=Config.FEEDBACK_COMPACT_SEGMENTS)
+    try:
+        read, added = store.import_csv(args.csv, args.chunk_size)
+    except (OSError, ValueError) as e:
+        sys.exit(str(e))
+    store.compact(force=True)
+    stats = store.stats()
+    print(f"Read {read} rows from {args.csv}, added {added} ({read - added} duplicates or already stored); "
+          f"{args.store} now holds {stats['rows']} rows in {stats['segments']} segments")
+
+if __name__ == '__main__':
+    main()
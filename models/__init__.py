@@ -3,6 +3,9 @@ from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
 from flask_login import UserMixin
 import secrets
+import hashlib
+from sqlalchemy import event, inspect, text, update
+from sqlalchemy.orm import Session
 
 db = SQLAlchemy()
 
@@ -13,7 +16,8 @@ class User(UserMixin, db.Model):
     developer_tag = db.Column(db.String(50), unique=True, nullable=False)
     two_fa_enabled = db.Column(db.Boolean, default=False)
     two_fa_verified = db.Column(db.Boolean, default=False)
-    api_key = db.Column(db.String(40), unique=True)
+    # SHA-256 of the key; the key itself is only shown once, when generated
+    api_key_hash = db.Column(db.String(64), unique=True, index=True)
     api_enabled = db.Column(db.Boolean, default=False)
 
     def set_password(self, password):
@@ -21,9 +25,62 @@ class User(UserMixin, db.Model):
         self.password_hash = bcrypt.hashpw(password.encode('utf-8'), salt)
 
     def generate_api_key(self):
-        self.api_key = f"dvlg_{secrets.token_hex(16)}"
+        api_key = f"dvlg_{secrets.token_hex(16)}"
+        self.api_key_hash = hash_api_key(api_key)
         self.api_enabled = True
-        return self.api_key
+        return api_key
+
+    def disable_api_key(self):
+        self.api_enabled = False
 
 def check_password(self, password):
     return bcrypt.checkpw(password.encode('utf-8'), self.password_hash)
+
+class ApiKeyState(db.Model):
+    """One row whose version goes up whenever any API key is issued, rotated, disabled or deleted"""
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+def hash_api_key(api_key):
+    # keys are 128 random bits, so a plain digest can't be brute-forced and stays an indexed lookup
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def _api_keys_changed(session):
+    for user in session.new:
+        if isinstance(user, User) and user.api_key_hash:
+            return True
+    for user in session.deleted:
+        if isinstance(user, User) and user.api_key_hash:
+            return True
+    for user in session.dirty:
+        if isinstance(user, User):
+            state = inspect(user)
+            if state.attrs.api_key_hash.history.has_changes() or state.attrs.api_enabled.history.has_changes():
+                return True
+    return False
+
+@event.listens_for(Session, 'before_flush')
+def _bump_api_key_version(session, flush_context, instances):
+    # the version is bumped in the same transaction as the change; caches compare against it
+    if not _api_keys_changed(session):
+        return
+    bumped = session.execute(update(ApiKeyState).where(ApiKeyState.id == 1)
+                             .values(version=ApiKeyState.version + 1)).rowcount
+    if not bumped:
+        session.add(ApiKeyState(id=1, version=1))
+    session.info['api_keys_changed'] = True
+
+def upgrade_schema():
+    """Bring a database created by an older version up to date (``create_all`` only adds missing tables)"""
+    columns = {column['name'] for column in inspect(db.engine).get_columns('user')}
+    with db.engine.begin() as connection:
+        if 'api_key_hash' not in columns:
+            connection.execute(text('ALTER TABLE user ADD COLUMN api_key_hash VARCHAR(64)'))
+            connection.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS ix_user_api_key_hash ON user (api_key_hash)'))
+        if 'api_key' in columns:
+            # keys were stored in plain text; keep only their hashes
+            for user_id, api_key in connection.execute(text('SELECT id, api_key FROM user WHERE api_key IS NOT NULL')).all():
+                connection.execute(text('UPDATE user SET api_key_hash = :digest, api_key = NULL WHERE id = :id'),
+                                   {'digest': hash_api_key(api_key), 'id': user_id})
+        if connection.execute(text('SELECT COUNT(*) FROM api_key_state')).scalar() == 0:
+            connection.execute(text('INSERT INTO api_key_state (id, version) VALUES (1, 0)'))
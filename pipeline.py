@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import shutil
+import inspect
+import hashlib
+import argparse
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+
+from api.feature_transformer import FeatureTransformer
+from api.model_store import ModelStore
+from dataset_store import DatasetStore, STORE_DIR, save
+from fit_transformers import SPLITS, load_arff, clean
+
+# The training notebooks (0.1 datawrngle, 0.2 feature, 0.3 train) as one cached command
+# run from the repo root: python pipeline.py [--jobs 4] [--until split] [--compiled] [--processed-data]
+#
+# Stages: ingest (data/*.arff) -> clean -> encode (fit the FeatureTransformer, engineer and
+# scale) -> split (70/30, random_state 42) -> train (12 models, in parallel) -> export (models/).
+# Every stage result is cached under .pipeline_cache/ by a hash of its inputs, its parameters
+# and its code, so only stages whose inputs changed run again; export skips models whose
+# artifact in models/ already came from the same training run (see models/pipeline.json).
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+STAGES = ['ingest', 'clean', 'encode', 'split', 'train', 'export']
+PERIODS = ['G1', 'G2', 'G3']
+MANIFEST_FILE = 'pipeline.json'
+
+DEFAULT_PARAMS = {
+    'test_size': 0.3,
+    'random_state': 42,
+    'n_estimators': 100,
+}
+
+def digest(*parts):
+    """Cache key of a stage: sha256 over its inputs' keys, parameters and code"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode('utf-8')).hexdigest()[:32]
+
+def source_of(*functions):
+    return [inspect.getsource(function) for function in functions]
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+def classify_grades_edu(grades):
+    """Grade bands the G1/G2 forests predict (as in 0.3_Task2ML_train)"""
+    binned = pd.cut(np.asarray(grades), bins=[0, 5, 10, 14, 17, 20], labels=[0, 1, 2, 3, 4], include_lowest=True)
+    return pd.to_numeric(binned)
+
+def fit_model(period, X, y, params, path):
+    """Fit one model and write it to ``path``; runs in a worker process"""
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LinearRegression
+    start = time.perf_counter()
+    if period == 'G3':
+        model = LinearRegression().fit(X, y)
+    else:
+        model = RandomForestClassifier(n_estimators=params['n_estimators'], random_state=params['random_state'])
+        model.fit(X, classify_grades_edu(y))
+    joblib.dump(model, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    return time.perf_counter() - start
+
+class StageCache:
+    """Stage results stored as ``<cache_dir>/<stage>/<key>.joblib``"""
+
+    def __init__(self, path):
+        self.path = path
+        self.hits = {}
+        self.misses = {}
+
+    def file(self, stage, key):
+        return os.path.join(self.path, stage, f"{key}.joblib")
+
+    def __contains__(self, item):
+        return os.path.exists(self.file(*item))
+
+    def get(self, stage, key, compute):
+        """Cached result for ``(stage, key)``, computing and storing it on a miss"""
+        path = self.file(stage, key)
+        if os.path.exists(path):
+            self.hits[stage] = self.hits.get(stage, 0) + 1
+            return joblib.load(path)
+        self.misses[stage] = self.misses.get(stage, 0) + 1
+        result = compute()
+        self.put(path, result)
+        return result
+
+    @staticmethod
+    def put(path, result):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        joblib.dump(result, f"{path}.tmp")
+        os.replace(f"{path}.tmp", path)
+
+class TrainingPipeline:
+    """Keys and lazily computed results of every stage.
+
+    Keys only depend on the raw file hashes, the parameters and the stage
+    code, so a run where nothing changed loads no data at all.
+    """
+
+    def __init__(self, cache, params=None, models_dir='models', jobs=None):
+        self.cache = cache
+        self.params = dict(DEFAULT_PARAMS, **(params or {}))
+        self.models_dir = models_dir
+        self.jobs = jobs or os.cpu_count()
+        self._keys = {}
+        self._results = {}
+
+    def _memo(self, name, compute):
+        if name not in self._results:
+            self._results[name] = compute()
+        return self._results[name]
+
+    def _key(self, name, compute):
+        if name not in self._keys:
+            self._keys[name] = compute()
+        return self._keys[name]
+
+    @staticmethod
+    def model_keys():
+        return [f"{split_key}_{period}" for split_key in SPLITS for period in PERIODS]
+
+    # ingest: the subject's ARFF file as a DataFrame
+
+    def ingest_key(self, path):
+        return self._key(('ingest', path), lambda: digest('ingest', path, file_digest(path), source_of(load_arff)))
+
+    def ingest(self, path):
+        return self._memo(('ingest', path), lambda: self.cache.get('ingest', self.ingest_key(path), lambda: load_arff(path)))
+
+    # clean: nulls, duplicates and IQR outliers as in 0.1_Task2ML_datawrngle
+
+    def clean_key(self, path):
+        return self._key(('clean', path), lambda: digest('clean', self.ingest_key(path), source_of(clean)))
+
+    def clean(self, path):
+        return self._memo(('clean', path), lambda: self.cache.get('clean', self.clean_key(path),
+                                                                  lambda: clean(self.ingest(path))))
+
+    # encode: fitted transformer and the encoded, engineered, scaled rows of a model split
+
+    def encode_key(self, split_key):
+        path, sex, name = SPLITS[split_key]
+        return self._key(('encode', split_key), lambda: digest(
+            'encode', self.clean_key(path), sex, name, FeatureTransformer.G3_FEATURES,
+            source_of(FeatureTransformer, TrainingPipeline._encode)))
+
+    def _encode(self, split_key):
+        path, sex, name = SPLITS[split_key]
+        subject = self.clean(path)
+        data = subject if sex is None else subject[subject['sex'] == sex].reset_index(drop=True)
+        transformer = FeatureTransformer.fit(data, numeric_data=subject, source=path, split=name)
+        enhanced = transformer.transform(data)
+        enhanced['G3'] = data['G3'].to_numpy(dtype=np.float64)
+        return transformer, enhanced
+
+    def encode(self, split_key):
+        return self._memo(('encode', split_key), lambda: self.cache.get('encode', self.encode_key(split_key),
+                                                                        lambda: self._encode(split_key)))
+
+    # split: train/test row indices (train_test_split only looks at the row count)
+
+    def split_key(self, split_key):
+        return self._key(('split', split_key), lambda: digest(
+            'split', self.encode_key(split_key), self.params['test_size'], self.params['random_state'],
+            source_of(TrainingPipeline._split)))
+
+    def _split(self, split_key):
+        from sklearn.model_selection import train_test_split
+        rows = np.arange(len(self.encode(split_key)[1]))
+        return train_test_split(rows, test_size=self.params['test_size'], random_state=self.params['random_state'])
+
+    def split(self, split_key):
+        return self._memo(('split', split_key), lambda: self.cache.get('split', self.split_key(split_key),
+                                                                       lambda: self._split(split_key)))
+
+    def training_data(self, model_key):
+        """(X, y) a model is fitted on, with the notebook's column order"""
+        split_key, period = model_key.rsplit('_', 1)
+        enhanced = self.encode(split_key)[1]
+        train = enhanced.iloc[self.split(split_key)[0]].reset_index(drop=True)
+        columns = FeatureTransformer.G3_FEATURES if period == 'G3' else FeatureTransformer.FEATURES
+        return train[columns], train[period]
+
+    # train: the G1/G2 forests and the G3 linear regression
+
+    def train_key(self, model_key):
+        split_key, period = model_key.rsplit('_', 1)
+        params = {} if period == 'G3' else self.params
+        return self._key(('train', model_key), lambda: digest(
+            'train', self.split_key(split_key), period, params, source_of(fit_model, classify_grades_edu)))
+
+    def train(self, model_keys=None):
+        """Fit every model not in the cache, in parallel; returns {model_key: cached artifact path}"""
+        model_keys = model_keys or self.model_keys()
+        paths = {key: self.cache.file('train', self.train_key(key)) for key in model_keys}
+        missing = [key for key in model_keys if ('train', self.train_key(key)) not in self.cache]
+        for key in model_keys:
+            counts = self.cache.misses if key in missing else self.cache.hits
+            counts['train'] = counts.get('train', 0) + 1
+        if not missing:
+            return paths
+
+        os.makedirs(os.path.join(self.cache.path, 'train'), exist_ok=True)
+        # the data is prepared here so workers only fit
+        tasks = [(key.rsplit('_', 1)[1], *self.training_data(key), self.params, paths[key]) for key in missing]
+        if self.jobs > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(tasks))) as pool:
+                futures = {key: pool.submit(fit_model, *task) for key, task in zip(missing, tasks)}
+                durations = {key: future.result() for key, future in futures.items()}
+        else:
+            durations = {key: fit_model(*task) for key, task in zip(missing, tasks)}
+        for key in missing:
+            print(f"  trained {key} in {durations[key]:.2f}s")
+        return paths
+
+    # export: models/<key>_model.joblib and models/<split>_features.json
+
+    def read_manifest(self):
+        path = os.path.join(self.models_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def write_manifest(self, manifest):
+        path = os.path.join(self.models_dir, MANIFEST_FILE)
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(f"{path}.tmp", path)
+
+    def up_to_date(self, manifest, name, key, path):
+        """Whether ``path`` is still the artifact a previous export wrote for ``key``"""
+        entry = manifest.get(name)
+        return (entry is not None and entry['key'] == key
+                and entry['version'] == list(ModelStore.artifact_version(path) or []))
+
+    def export(self, compiled=False, processed_data=False):
+        """Copy changed models and transformers into models_dir; returns the names written"""
+        os.makedirs(self.models_dir, exist_ok=True)
+        manifest = self.read_manifest()
+        written = []
+
+        stale = [key for key in self.model_keys()
+                 if not self.up_to_date(manifest, key, self.train_key(key),
+                                        os.path.join(self.models_dir, f"{key}_model.joblib"))]
+        trained = self.train(stale) if stale else {}
+        for key, source in trained.items():
+            target = os.path.join(self.models_dir, f"{key}_model.joblib")
+            shutil.copyfile(source, f"{target}.tmp")
+            os.replace(f"{target}.tmp", target)
+            manifest[key] = {'key': self.train_key(key), 'version': list(ModelStore.artifact_version(target))}
+            written.append(key)
+
+        if compiled:
+            from export_models import export
+            for key in self.model_keys():
+                if key in written or not os.path.exists(os.path.join(self.models_dir, 'compiled', key, 'meta.json')):
+                    export(key, self.models_dir)
+
+        for split_key in SPLITS:
+            target = FeatureTransformer.path_for(split_key, self.models_dir)
+            name = f"{split_key}_features"
+            if self.up_to_date(manifest, name, self.encode_key(split_key), target):
+                continue
+            self.encode(split_key)[0].save(target)
+            manifest[name] = {'key': self.encode_key(split_key), 'version': list(ModelStore.artifact_version(target))}
+            written.append(name)
+
+        if processed_data:
+            store_path = os.path.join('processed_data', STORE_DIR)
+            stored = DatasetStore(store_path).names() if DatasetStore.exists(store_path) else []
+            frames = {}
+            for split_key in SPLITS:
+                frames.update(self.processed_frames(split_key, manifest, stored))
+            if frames:
+                save('processed_data', frames)
+                written.extend(f"processed_data/{name}" for name in frames if name.endswith('_enhanced'))
+        self.write_manifest(manifest)
+        return written
+
+    def processed_frames(self, split_key, manifest, stored):
+        """The notebooks' *_enhanced* frames for a split, if they changed or are not in the store"""
+        name = SPLITS[split_key][2]
+        entry = f"processed_data/{name}"
+        key = self.split_key(split_key)
+        if manifest.get(entry, {}).get('key') == key and f"{name}_enhanced" in stored:
+            return {}
+        enhanced = self.encode(split_key)[1]
+        features = enhanced[FeatureTransformer.FEATURES]
+        grades = enhanced[['G1', 'G2', 'G3']]
+        # the grades sit after absences, where get_dummies left them
+        position = FeatureTransformer.FEATURES.index('absences') + 1
+        columns = FeatureTransformer.FEATURES[:position] + ['G1', 'G2', 'G3'] + FeatureTransformer.FEATURES[position:]
+        frames = {f"{name}_enhanced": enhanced[columns]}
+        for part, rows in zip(['train', 'test'], self.split(split_key)):
+            frames[f"X_{name}_enhanced_{part}"] = features.iloc[rows].reset_index(drop=True)
+            frames[f"y_{name}_enhanced_{part}"] = grades.iloc[rows].reset_index(drop=True)
+        manifest[entry] = {'key': key}
+        return frames
+
+    def run(self, until='export', compiled=False, processed_data=False):
+        """Run the stages up to ``until``; returns the names export wrote"""
+        stop = STAGES.index(until)
+        steps = {
+            'ingest': lambda: [self.ingest(SPLITS[key][0]) for key in SPLITS],
+            'clean': lambda: [self.clean(SPLITS[key][0]) for key in SPLITS],
+            'encode': lambda: [self.encode(key) for key in SPLITS],
+            'split': lambda: [self.split(key) for key in SPLITS],
+            'train': lambda: self.train(),
+            'export': lambda: self.export(compiled, processed_data),
+        }
+        if until == 'export':
+            # export pulls in only the stages it needs
+            return self.timed('export', steps['export'])
+        for stage in STAGES[:stop + 1]:
+            self.timed(stage, steps[stage])
+        return []
+
+    def timed(self, stage, step):
+        start = time.perf_counter()
+        result = step()
+        print(f"{stage}: {time.perf_counter() - start:.2f}s")
+        return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cached training pipeline (ingest, clean, encode, split, train, export)")
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--cache-dir', default='.pipeline_cache')
+    parser.add_argument('--jobs', type=int, default=os.cpu_count(), help="processes used to train models")
+    parser.add_argument('--until', choices=STAGES, default='export', help="stop after this stage")
+    parser.add_argument('--n-estimators', type=int, default=DEFAULT_PARAMS['n_estimators'])
+    parser.add_argument('--random-state', type=int, default=DEFAULT_PARAMS['random_state'])
+    parser.add_argument('--test-size', type=float, default=DEFAULT_PARAMS['test_size'])
+    parser.add_argument('--compiled', action='store_true', help="also write the sklearn-free exports (export_models.py)")
+    parser.add_argument('--processed-data', action='store_true', help="also write the *_enhanced* datasets into processed_data/store")
+    parser.add_argument('--force', action='store_true', help="ignore the cache and the export manifest")
+    args = parser.parse_args()
+
+    if args.force:
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+        manifest = os.path.join(args.models_dir, MANIFEST_FILE)
+        if os.path.exists(manifest):
+            os.remove(manifest)
+
+    params = {'n_estimators': args.n_estimators, 'random_state': args.random_state, 'test_size': args.test_size}
+    pipeline = TrainingPipeline(StageCache(args.cache_dir), params, args.models_dir, args.jobs)
+    start = time.perf_counter()
+    written = pipeline.run(args.until, args.compiled, args.processed_data)
+    stages = sorted(set(pipeline.cache.hits) | set(pipeline.cache.misses), key=STAGES.index)
+    summary = ', '.join(f"{stage} {pipeline.cache.misses.get(stage, 0)} run/{pipeline.cache.hits.get(stage, 0)} cached"
+                        for stage in stages)
+    print(f"Done in {time.perf_counter() - start:.2f}s ({summary or 'nothing to do'}); "
+          f"wrote {', '.join(written) if written else 'nothing'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+from collections import defaultdict
+
+# Reports where a cold start of the app spends its time
+# run from the repo root: python profile_startup.py [--top 20]
+#
+# Starts a fresh interpreter with -X importtime, builds the app with
+# initialization run synchronously and prints per-package and per-module
+# import times plus the startup phases recorded by startup.py.
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from main import create_app
+from startup import startup
+create_app(background_init=False)
+status = startup.status()
+status['total_ms'] = round((time.perf_counter() - start) * 1000, 1)
+print(json.dumps(status))
+"""
+
+def parse_importtime(stderr):
+    """(module, self_us, cumulative_us) rows from -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile app startup: import and init time per module")
+    parser.add_argument('--top', type=int, default=15, help="number of modules to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ, STARTUP_PROFILE='false', PYTHONPATH=os.getcwd())
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', CHILD],
+                            capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        sys.exit(result.stderr[-2000:])
+    status = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = parse_importtime(result.stderr)
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in imports:
+        by_package[name.split('.')[0]] += self_us
+    total_import_ms = sum(by_package.values()) / 1000
+
+    print(f"Cold start: {status['total_ms']:.0f} ms to a ready app; {len(imports)} modules imported in "
+          f"{total_import_ms:.0f} ms (including imports made inside the phases below)\n")
+
+    print("Import time by package (self time summed):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:<28} {self_us / 1000:>8.1f} ms")
+
+    print(f"\nSlowest modules (self / cumulative):")
+    for name, self_us, cumulative_us in sorted(imports, key=lambda row: -row[1])[:args.top]:
+        print(f"  {name:<44} {self_us / 1000:>8.1f} ms {cumulative_us / 1000:>9.1f} ms")
+
+    print("\nStartup phases:")
+    for name, ms in status['phases_ms'].items():
+        print(f"  {name:<28} {ms:>8.1f} ms")
+    if status['errors']:
+        print(f"\nFailed phases: {status['errors']}")
+
+if __name__ == '__main__':
+    main()
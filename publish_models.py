@@ -0,0 +1,42 @@
+import sys
+import argparse
+import warnings
+
+from api.model_registry import ModelRegistry
+from config import Config
+import export_models
+
+# Publishes the models in a directory as a new registry version
+# run from the repo root: python publish_models.py --note "retrained on term 2 data" --activate
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+def main():
+    parser = argparse.ArgumentParser(description="Publish models as a versioned registry entry")
+    parser.add_argument('--source', default='models', help="directory holding the .joblib models")
+    parser.add_argument('--version', help="version name (default: UTC timestamp)")
+    parser.add_argument('--note', default='', help="training notes stored in the manifest")
+    parser.add_argument('--activate', action='store_true', help="make this the served version")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(Config.MODEL_REGISTRY_PATH)
+    try:
+        version = registry.publish(args.source, args.version, metadata={
+            'note': args.note,
+            'training_notebook': 'Task2ML/0.3_Task2ML_train.ipynb'
+        })
+    except ValueError as e:
+        sys.exit(str(e))
+
+    # NumPy exports for the new version so workers can memory-map them
+    version_path = registry.version_path(version)
+    for key in export_models.model_keys(version_path):
+        export_models.export(key, version_path)
+
+    print(f"Published version {version}")
+    if args.activate:
+        registry.activate(version)
+        print(f"Activated version {version}; workers swap it in within MODEL_CHECK_INTERVAL seconds")
+
+if __name__ == '__main__':
+    main()
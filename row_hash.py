@@ -0,0 +1,12 @@
+import hashlib
+import numpy as np
+
+# Row digests shared by the feedback store (duplicate detection) and arff_reader.py
+# (--dedupe); kept free of app imports so the reader and the notebooks can use it alone
+
+def row_hashes(matrix):
+    """16-byte blake2b digest of each row's float64 values"""
+    # + 0.0 folds -0.0 into 0.0 so equal rows hash the same
+    rows = np.ascontiguousarray(matrix, dtype=np.float64) + 0.0
+    digests = b''.join(hashlib.blake2b(row.tobytes(), digest_size=16).digest() for row in rows)
+    return np.frombuffer(digests, dtype='V16')
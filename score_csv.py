@@ -0,0 +1,122 @@
+import os
+import sys
+import time
+import argparse
+import logging
+import warnings
+from collections import deque
+from multiprocessing import Pool
+import pandas as pd
+
+# Scores a CSV of student records without going through HTTP
+# run from the repo root: python score_csv.py data/dataset.csv predictions.csv --subject portuguese
+#
+# Rows use the /api/predict field names; data/dataset.csv style codes
+# (sex F/M, school GP/MS, address U/R, famsize LE3/GT3, Pstatus T/A) are
+# understood by the models' FeatureTransformer. Missing G1/G2 are
+# estimated by the cascade.
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+GENDER_CODES = {'f': 'female', 'm': 'male', 'F': 'female', 'M': 'male', 0: 'female', 1: 'male'}
+OUTPUT_COLUMNS = ['G3_predicted', 'G1_estimated', 'G2_estimated', 'error']
+
+predictor = None
+
+def init_worker(models_dir, compiled):
+    """Load the models once per worker process"""
+    global predictor
+    logging.disable(logging.INFO)
+    from api.predict import ModelPredictor
+    predictor = ModelPredictor(compiled=compiled, model_path=models_dir)
+    predictor.cache = None
+    predictor.models.load_all()
+
+def prepare_chunk(chunk, subject):
+    """Map dataset.csv conventions onto the request fields the pipeline expects"""
+    frame = chunk.copy()
+    if 'gender' not in frame.columns and 'sex' in frame.columns:
+        frame['gender'] = frame['sex'].map(lambda value: GENDER_CODES.get(value, value))
+    if subject is not None:
+        frame['subject'] = subject
+    return frame
+
+def score_chunk(chunk, subject, normalized):
+    results = predictor.score_frame(prepare_chunk(chunk, subject), normalized=normalized)
+    results = results.rename(columns={'G3': 'G3_predicted'})
+    return pd.concat([chunk, results[OUTPUT_COLUMNS]], axis=1)
+
+def read_chunks(path, chunk_size):
+    """Read a CSV, or a CSV body under an ARFF header like data/dataset.csv, in chunks"""
+    source = open(path, newline='')
+    names = []
+    while True:
+        position = source.tell()
+        line = source.readline()
+        if not line:
+            break
+        stripped = line.strip()
+        if not stripped or stripped.startswith('%'):
+            continue
+        keyword = stripped.split()[0].lower()
+        if keyword == '@attribute':
+            names.append(stripped.split()[1].strip("'\""))
+        elif keyword == '@data':
+            break
+        elif not keyword.startswith('@'):
+            # plain CSV: rewind to the header row
+            source.seek(position)
+            break
+    options = dict(chunksize=chunk_size, comment='%', skipinitialspace=True)
+    if names:
+        return pd.read_csv(source, names=names, header=None, quotechar="'", **options)
+    return pd.read_csv(source, **options)
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a CSV of student records in parallel")
+    parser.add_argument('input', help="CSV with one student record per row")
+    parser.add_argument('output', help="CSV to write: the input columns plus predictions")
+    parser.add_argument('--subject', choices=['mathematics', 'portuguese'],
+                        help="subject for every row (otherwise read from a 'subject' column)")
+    parser.add_argument('--normalized', action='store_true',
+                        help="numeric fields are already scaled to [0,1], as in the processed_data datasets")
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--no-compiled', action='store_true', help="score with the sklearn models")
+    args = parser.parse_args()
+
+    reader = read_chunks(args.input, args.chunk_size)
+    pool = Pool(args.workers, initializer=init_worker, initargs=(args.models_dir, not args.no_compiled))
+
+    start = time.perf_counter()
+    rows, errors, header = 0, 0, True
+    # keep a bounded window of chunks in flight and write them back in input order
+    pending = deque()
+    try:
+        with open(args.output, 'w', newline='') as output:
+            def write_next():
+                nonlocal rows, errors, header
+                scored = pending.popleft().get()
+                scored.to_csv(output, header=header, index=False)
+                header = False
+                rows += len(scored)
+                errors += int(scored['error'].notna().sum())
+                elapsed = time.perf_counter() - start
+                print(f"\r{rows} rows, {rows / elapsed:.0f} rows/s", end='', file=sys.stderr, flush=True)
+
+            for chunk in reader:
+                pending.append(pool.apply_async(score_chunk, (chunk, args.subject, args.normalized)))
+                if len(pending) >= 2 * args.workers:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        pool.terminate()
+
+    elapsed = time.perf_counter() - start
+    print(f"\nScored {rows} rows ({errors} errors) in {elapsed:.2f}s, "
+          f"{rows / elapsed if elapsed else 0:.0f} rows/s -> {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+logger = logging.getLogger('prediction_app')
+
+class StartupTracker:
+    """Times the startup phases of the app and tracks when it is ready to serve.
+
+    Phases registered with ``require`` must finish without error before
+    ``ready()`` is true; the readiness endpoint reports ``status()``.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.errors = {}
+        self.pending = set()
+        self.ready_after = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of startup work under ``name``"""
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            with self._lock:
+                self.errors[name] = str(e)
+            logger.error(f"Startup phase {name} failed: {str(e)}")
+            raise
+        finally:
+            with self._lock:
+                self.phases[name] = time.perf_counter() - start
+                self.pending.discard(name)
+                if not self.pending and self.ready_after is None and not self.errors:
+                    self.ready_after = time.perf_counter() - self.started
+
+    def require(self, *names):
+        """Mark phases that have to finish before the app is ready"""
+        with self._lock:
+            self.pending.update(names)
+            self.ready_after = None
+
+    def run(self, name, fn, background=True):
+        """Run ``fn`` as a required phase, in a daemon thread if ``background``"""
+        self.require(name)
+
+        def target():
+            try:
+                with self.phase(name):
+                    fn()
+            except Exception:
+                # recorded in errors; readiness stays false
+                pass
+
+        if background:
+            threading.Thread(target=target, name=f'startup-{name}', daemon=True).start()
+        else:
+            with self.phase(name):
+                fn()
+
+    def ready(self):
+        with self._lock:
+            return not self.pending and not self.errors
+
+    def status(self):
+        with self._lock:
+            return {
+                'ready': not self.pending and not self.errors,
+                'pending': sorted(self.pending),
+                'errors': dict(self.errors),
+                'phases_ms': {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+                'ready_after_ms': round(self.ready_after * 1000, 1) if self.ready_after is not None else None,
+                'uptime_s': round(time.perf_counter() - self.started, 1)
+            }
+
+    def report(self):
+        """Log phase timings, slowest first"""
+        status = self.status()
+        lines = [f"  {name:<24} {ms:>9.1f} ms"
+                 for name, ms in sorted(status['phases_ms'].items(), key=lambda item: -item[1])]
+        logger.info("Startup phases:\n" + "\n".join(lines))
+
+# one tracker per process, started when this module is first imported
+startup = StartupTracker()
@@ -84,6 +84,9 @@ class ProfileManager {
     document
       .getElementById("regenerateApiKey")
       ?.addEventListener("click", () => this.handleRegenerateKey());
+    document
+      .getElementById("disableApiKey")
+      ?.addEventListener("click", () => this.handleDisableKey());
   }
 
   bind2FAEvents() {
@@ -153,11 +156,12 @@ class ProfileManager {
         },
       });
 
+      const data = await response.json();
       if (response.ok) {
-        this.showNotification("API key generated successfully", "success");
-        location.reload();
+        // only the key's hash is stored, so this is the one time it can be shown
+        this.showApiKey(data.key);
+        this.showNotification("API key generated: copy it now, it won't be shown again", "success");
       } else {
-        const data = await response.json();
         throw new Error(data.error || "Failed to generate API key");
       }
     } catch (error) {
@@ -165,12 +169,51 @@ class ProfileManager {
     }
   }
 
+  showApiKey(key) {
+    let code = document.getElementById("apiKey");
+    if (!code) {
+      const status = document.querySelector("#apiKeySection .api-status");
+      status.insertAdjacentHTML(
+        "afterbegin",
+        '<p class="mono-text">Your API Key: </p><p><code id="apiKey"></code></p>'
+      );
+      document.getElementById("generateApiKey")?.remove();
+      code = document.getElementById("apiKey");
+    }
+    code.textContent = key;
+  }
+
   async handleRegenerateKey() {
     if (confirm("Are you sure? Current API key will be invalidated.")) {
       await this.handleGenerateKey();
     }
   }
 
+  async handleDisableKey() {
+    if (!confirm("Disable API access? Requests using the current key will be rejected.")) {
+      return;
+    }
+    try {
+      const response = await fetch("/api/user/disable-key", {
+        method: "POST",
+        headers: {
+          "X-CSRF-TOKEN": document.querySelector('meta[name="csrf-token"]')
+            .content,
+        },
+      });
+
+      if (response.ok) {
+        this.showNotification("API key disabled", "success");
+        location.reload();
+      } else {
+        const data = await response.json();
+        throw new Error(data.error || "Failed to disable API key");
+      }
+    } catch (error) {
+      this.logError(error, "API Key Disabling");
+    }
+  }
+
   async loadProfileData() {
     try {
       const response = await fetch("/api/entries/user-stats");
@@ -0,0 +1,70 @@
+import sys
+import argparse
+import warnings
+import joblib
+import numpy as np
+import pandas as pd
+
+from dataset_store import read_split
+from api.incremental_g3 import IncrementalG3Trainer, ModelVersionActive, SEED_SPLITS
+from api.model_registry import ModelRegistry
+from config import Config
+
+# Re-solves the G3 models from their incremental XᵀX/Xᵀy statistics and overwrites them in models/
+# run from the repo root: python update_g3.py [--check] [--reseed] [--force]
+#
+# The statistics live in G3_STATS_PATH and grow with every /api/new-data row when
+# G3_INCREMENTAL is on; the first run seeds them from the processed_data training splits.
+
+warnings.filterwarnings('ignore', category=UserWarning)
+
+def check(trainer, key):
+    """Largest difference between the statistics' solution and the model on disk, over the split's test rows"""
+    name = SEED_SPLITS[key]
+    X, y = read_split(trainer.seed_dir, name, 'test')
+    X = pd.concat([X, y[['G1', 'G2']]], axis=1)[trainer.feature_names]
+    model = joblib.load(f'{trainer.models_dir}/{key}_G3_model.joblib')
+    stats, _ = trainer.load_statistics(key)
+    coef, intercept = stats.solve()
+    return float(np.abs(X.to_numpy(dtype=np.float64) @ coef + intercept - model.predict(X)).max())
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-solve and publish the incrementally trained G3 models")
+    parser.add_argument('--stats-path', default=Config.G3_STATS_PATH)
+    parser.add_argument('--models-dir', default='models')
+    parser.add_argument('--backend', default=Config.MODEL_BACKEND, choices=['joblib', 'exported'])
+    parser.add_argument('--reseed', action='store_true', help="drop the statistics and seed them from processed_data again")
+    parser.add_argument('--force', action='store_true', help="publish every model even without new rows")
+    parser.add_argument('--check', action='store_true', help="only compare the statistics' solution with the models on disk")
+    args = parser.parse_args()
+
+    trainer = IncrementalG3Trainer(args.stats_path, models_dir=args.models_dir, backend=args.backend,
+                                   registry=ModelRegistry(Config.MODEL_REGISTRY_PATH))
+    if args.reseed:
+        with trainer.locked():
+            for key in SEED_SPLITS:
+                stats = trainer.seed(key)
+                stats.save(trainer.stats_file(key), feature_names=trainer.feature_names,
+                           seed_rows=stats.n, published_rows=stats.n)
+                print(f"{key}: seeded from {stats.n} training rows")
+
+    if args.check:
+        ok = True
+        for key in SEED_SPLITS:
+            difference = check(trainer, key)
+            ok = ok and difference <= 1e-9
+            print(f"{key}: max difference from {key}_G3_model.joblib {difference:.2e}")
+        if not ok:
+            sys.exit(1)
+        return
+
+    try:
+        report = trainer.update(force=args.force)
+    except ModelVersionActive as e:
+        sys.exit(str(e))
+    for key, entry in report.items():
+        status = 'published' if entry['published'] else 'unchanged'
+        print(f"{key}: {entry['rows']} rows ({entry['new_rows']} new) {status}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+import gc
+import logging
+from main import create_app
+from models import db
+
+# WSGI entry point for production servers: gunicorn -c gunicorn.conf.py wsgi:app
+
+logger = logging.getLogger('prediction_app')
+
+def prepare_for_fork(app):
+    """Do all one-time work in the master so forked workers share it copy-on-write"""
+    from api import predict
+
+    # tables and models were set up synchronously by create_app(background_init=False)
+    with app.app_context():
+        # pooled connections must not be shared between processes
+        db.engine.dispose()
+
+    memory = predict.predictor.models.memory_usage()
+    logger.info(f"Preloaded {len(memory)} models, {len(predict.predictor.compiled_models)} compiled")
+
+    # move everything allocated so far out of the GC's reach so collections
+    # in the workers don't write to (and un-share) those pages
+    gc.collect()
+    gc.freeze()
+
+# background threads don't survive the fork, so initialize before it
+app = create_app(background_init=False)
+prepare_for_fork(app)